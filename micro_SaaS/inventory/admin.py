@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Business, Product, StockTransaction
+from .models import Business, BusinessSummary, OutboxEvent, Product, StockTransaction, WebhookEndpoint
+from .services import save_product, delete_product
 
 # Register your models here.
 @admin.register(Business)
@@ -13,8 +14,34 @@ class ProductAdmin(admin.ModelAdmin):
     list_filter = ["business","category"]
     search_fields = ["name"]
 
+    def save_model(self, request, obj, form, change):
+        save_product(obj)
+
+    def delete_model(self, request, obj):
+        delete_product(obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            delete_product(obj)
+
 @admin.register(StockTransaction)
 class StockTransactionAdmin(admin.ModelAdmin):
     list_display = ["product", "type", "quantity"]
     list_filter = ["type"]
     search_fields = ["product"]
+
+@admin.register(BusinessSummary)
+class BusinessSummaryAdmin(admin.ModelAdmin):
+    list_display = ["business", "total_products", "total_units", "low_stock_count", "out_of_stock_count", "updated_at"]
+    readonly_fields = ["total_products", "total_units", "low_stock_count", "out_of_stock_count"]
+
+@admin.register(WebhookEndpoint)
+class WebhookEndpointAdmin(admin.ModelAdmin):
+    list_display = ["business", "url", "is_active", "created_at"]
+    list_filter = ["is_active"]
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ["product", "business", "attempts", "next_attempt_at", "delivered_at", "failed_at"]
+    list_filter = ["business"]
+    readonly_fields = ["payload", "attempts", "delivered_at", "failed_at", "last_error"]
@@ -1,15 +1,24 @@
-from django.urls import path, include
+from django.urls import path, re_path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
 )
 
+from . import async_views
 from .api_views import (
     RegisterView,
     BusinessViewSet,
     ProductViewSet,
     StockTransactionViewSet,
+    ExportView,
+    LowStockProductListView,
+    CategoryFacetListView,
+    BusinessStockAtView,
+    MovementTrendView,
+    ReorderForecastView,
+    BusinessSummaryViewSet,
+    FragmentCacheStatsView,
 )
 
 router = DefaultRouter()
@@ -27,19 +36,93 @@ urlpatterns = [
         ProductViewSet.as_view({'get': 'list', 'post': 'create'}),
         name='business-products-list'
     ),
+    path(
+        'businesses/<int:business_id>/products/search/',
+        ProductViewSet.as_view({'get': 'search'}),
+        name='business-products-search'
+    ),
     path(
         'businesses/<int:business_id>/products/<int:pk>/',
         ProductViewSet.as_view({'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy'}),
         name='business-products-detail'
     ),
+    path(
+        'businesses/<int:business_id>/products/<int:pk>/stock-at/',
+        ProductViewSet.as_view({'get': 'stock_at'}),
+        name='business-products-stock-at'
+    ),
+    path(
+        'businesses/<int:business_id>/stock-at/',
+        BusinessStockAtView.as_view(),
+        name='business-stock-at'
+    ),
+    path(
+        'businesses/<int:business_id>/summary/',
+        BusinessSummaryViewSet.as_view({'get': 'retrieve'}),
+        name='business-summary'
+    ),
+    path(
+        'businesses/<int:business_id>/categories/',
+        CategoryFacetListView.as_view(),
+        name='business-categories'
+    ),
+    path(
+        'businesses/<int:business_id>/low-stock/',
+        LowStockProductListView.as_view(),
+        name='business-low-stock'
+    ),
+    path(
+        'businesses/<int:business_id>/movements/',
+        MovementTrendView.as_view(),
+        name='business-movements'
+    ),
+    path(
+        'businesses/<int:business_id>/reorder-forecast/',
+        ReorderForecastView.as_view(),
+        name='business-reorder-forecast'
+    ),
     path(
         'businesses/<int:business_id>/transactions/',
         StockTransactionViewSet.as_view({'get': 'list', 'post': 'create'}),
         name='business-transactions-list'
     ),
+    path(
+        'businesses/<int:business_id>/transactions/bulk/',
+        StockTransactionViewSet.as_view({'post': 'bulk'}),
+        name='business-transactions-bulk'
+    ),
     path(
         'businesses/<int:business_id>/transactions/<int:pk>/',
         StockTransactionViewSet.as_view({'get': 'retrieve'}),
         name='business-transactions-detail'
     ),
+    re_path(
+        r'^businesses/(?P<business_id>\d+)/export/(?P<dataset>products|transactions)\.(?P<export_format>\w+)$',
+        ExportView.as_view(),
+        name='business-export'
+    ),
+
+    path('stats/fragment-cache/', FragmentCacheStatsView.as_view(), name='fragment-cache-stats'),
+
+    # Async twins of the read-heavy endpoints above, for ASGI deployments.
+    path(
+        'async/businesses/<int:business_id>/products/',
+        async_views.product_list,
+        name='async-business-products-list'
+    ),
+    path(
+        'async/businesses/<int:business_id>/products/<int:pk>/',
+        async_views.product_detail,
+        name='async-business-products-detail'
+    ),
+    path(
+        'async/businesses/<int:business_id>/transactions/',
+        async_views.transaction_list,
+        name='async-business-transactions-list'
+    ),
+    path(
+        'async/businesses/<int:business_id>/summary/',
+        async_views.business_summary,
+        name='async-business-summary'
+    ),
 ]
@@ -1,15 +1,44 @@
-from rest_framework import viewsets, generics, status
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework import viewsets, generics, status, serializers
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.views import APIView
+from rest_framework.permissions import IsAuthenticated, IsAdminUser, AllowAny
 from rest_framework.response import Response
-from django.shortcuts import get_object_or_404
+from django.http import StreamingHttpResponse, Http404
 from django.contrib.auth.models import User
 
 from .models import Business, Product, StockTransaction
+from .exports import iter_export, EXPORT_FORMATS
+from .search import filter_products, search_products
+from .facets import get_facets
+from . import fragments
+from .summary import get_summary
+from .snapshots import parse_timestamp, stock_at, business_stock_at
+from .rollups import movement_trend
+from .forecasting import reorder_forecast
+from .tenancy import BusinessScopedMixin
+from .conditional import VersionedResponseMixin
+from .fieldsets import SparseFieldsetMixin
+from .renderers import ORJSONRenderer
+from .routing import ReplicaReadMixin
+from .pagination import ProductPagination, TransactionPagination, LowStockPagination
+from .services import (
+    apply_stock_transaction,
+    apply_stock_transactions_bulk,
+    delete_product,
+    InsufficientStock,
+    StockConflict
+)
 from .serializers import (
     UserSerializer,
     BusinessSerializer,
     ProductSerializer,
-    StockTransactionSerializer
+    LowStockProductSerializer,
+    BusinessSummarySerializer,
+    StockTransactionSerializer,
+    BulkStockTransactionSerializer,
+    BulkStockTransactionItemSerializer,
+    MovementTrendQuerySerializer,
+    ReorderForecastQuerySerializer
 )
 
 
@@ -29,20 +58,19 @@ class BusinessViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Business.objects.filter(owner=self.request.user)
+        return Business.objects.filter(owner=self.request.user).select_related('owner')
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
 
-class ProductViewSet(viewsets.ModelViewSet):
-
+class ProductViewSet(BusinessScopedMixin, ReplicaReadMixin, VersionedResponseMixin, SparseFieldsetMixin,
+                     viewsets.ModelViewSet):
+    """Products of a business; ?fields=id,name,... narrows list and detail responses."""
     serializer_class = ProductSerializer
     permission_classes = [IsAuthenticated]
-
-    def get_business(self):
-        business_id = self.kwargs.get('business_id')
-        return get_object_or_404(Business, id=business_id, owner=self.request.user)
+    pagination_class = ProductPagination
+    renderer_classes = [ORJSONRenderer, BrowsableAPIRenderer]
 
     def get_queryset(self):
         business = self.get_business()
@@ -52,13 +80,7 @@ class ProductViewSet(viewsets.ModelViewSet):
         category = self.request.query_params.get('category')
 
         if search:
-            queryset = queryset.filter(
-                name__icontains=search
-            ) | queryset.filter(
-                sku__icontains=search
-            ) | queryset.filter(
-                supplier_name__icontains=search
-            )
+            queryset = filter_products(queryset, search)
 
         if category:
             queryset = queryset.filter(category=category)
@@ -69,35 +91,252 @@ class ProductViewSet(viewsets.ModelViewSet):
         business = self.get_business()
         serializer.save(business=business)
 
+    def perform_destroy(self, instance):
+        delete_product(instance)
+
+    def search(self, request, *args, **kwargs):
+        """Ranked product search: ?q=<text>&limit=<n>. An exact SKU returns just that product."""
+        business = self.get_business()
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', 20)), 100))
+        except ValueError:
+            limit = 20
+
+        products = search_products(business, request.query_params.get('q', ''), limit=limit)
+        serializer = self.get_serializer(products, many=True)
+        return Response(serializer.data)
+
+    def stock_at(self, request, *args, **kwargs):
+        """Quantity on hand at ?ts=<ISO date or timestamp>, from the nearest stock snapshot."""
+        moment = get_timestamp(request)
+        product = self.get_object()
+        quantity, snapshot = stock_at(product, moment)
+        return Response({
+            'product': product.id,
+            'ts': moment,
+            'quantity': quantity,
+            'snapshot_at': snapshot.taken_at if snapshot else None,
+        })
+
+
+def get_timestamp(request):
+    try:
+        return parse_timestamp(request.query_params.get('ts'))
+    except ValueError as error:
+        raise serializers.ValidationError({'ts': str(error)})
+
+
+class LowStockProductListView(BusinessScopedMixin, generics.ListAPIView):
+    """
+    Products at or below their reorder level, biggest shortfall first.
+    Served from the (business, reorder_shortfall) index.
+    """
+    serializer_class = LowStockProductSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = LowStockPagination
+
+    def get_queryset(self):
+        queryset = Product.objects.filter(business=self.get_business(), reorder_shortfall__gte=0)
+
+        category = self.request.query_params.get('category')
+        if category:
+            queryset = queryset.filter(category=category)
+
+        return queryset
+
+
+class BusinessSummaryViewSet(BusinessScopedMixin, VersionedResponseMixin, viewsets.GenericViewSet):
+    """Dashboard figures and the five biggest low-stock shortfalls."""
+    permission_classes = [IsAuthenticated]
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.versioned(self.summary, request, *args, **kwargs)
+
+    def summary(self, request, *args, **kwargs):
+        business = self.get_business()
+        low_stock = Product.objects.filter(
+            business=business, reorder_shortfall__gte=0
+        ).order_by('-reorder_shortfall', '-id')[:5]
+        serializer = BusinessSummarySerializer(get_summary(business), context={'low_stock': low_stock})
+        return Response(serializer.data)
+
+
+class CategoryFacetListView(BusinessScopedMixin, APIView):
+    """Categories in a business with product and low-stock counts."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, business_id):
+        return Response(get_facets(self.get_business().id))
+
+
+class BusinessStockAtView(BusinessScopedMixin, APIView):
+    """Quantity on hand of every product at ?ts=<ISO date or timestamp>."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, business_id):
+        moment = get_timestamp(request)
+        snapshot_at, quantities = business_stock_at(self.get_business(), moment)
+        return Response({
+            'ts': moment,
+            'snapshot_at': snapshot_at,
+            'results': [
+                {'product': product_id, 'quantity': quantities[product_id]}
+                for product_id in sorted(quantities)
+            ],
+        })
+
+
+class MovementTrendView(BusinessScopedMixin, APIView):
+    """
+    Units in and out per day, week or month, served from the daily rollups.
+
+    ?start=&end= (dates, inclusive) &interval=day|week|month &product= &category=
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, business_id):
+        query = MovementTrendQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = query.validated_data
 
-class StockTransactionViewSet(viewsets.ModelViewSet):
+        return Response({
+            'start': params['start'],
+            'end': params['end'],
+            'interval': params['interval'],
+            'results': movement_trend(
+                self.get_business(), params['start'], params['end'], params['interval'],
+                product_id=params.get('product'), category=params.get('category'),
+            ),
+        })
 
+
+class ReorderForecastView(BusinessScopedMixin, APIView):
+    """
+    Average daily consumption, days until stockout and a suggested reorder
+    quantity for the most urgent products, forecast over the whole catalog.
+
+    ?window_days= &lead_time_days= &cover_days= &service_level= &limit= &needs_reorder=
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, business_id):
+        query = ReorderForecastQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = dict(query.validated_data)
+
+        return Response(reorder_forecast(
+            self.get_business().id,
+            limit=params.pop('limit'),
+            needs_reorder_only=params.pop('needs_reorder'),
+            **params,
+        ))
+
+
+class StockTransactionViewSet(BusinessScopedMixin, ReplicaReadMixin, VersionedResponseMixin, SparseFieldsetMixin,
+                              viewsets.ModelViewSet):
+    """The ledger of a business; ?fields=id,type,... narrows list and detail responses."""
     serializer_class = StockTransactionSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = TransactionPagination
+    renderer_classes = [ORJSONRenderer, BrowsableAPIRenderer]
     http_method_names = ['get', 'post', 'head', 'options']  
 
-    def get_business(self):
-        business_id = self.kwargs.get('business_id')
-        return get_object_or_404(Business, id=business_id, owner=self.request.user)
-
     def get_queryset(self):
         business = self.get_business()
-        queryset = StockTransaction.objects.filter(product__business=business).select_related('product')
+        queryset = StockTransaction.objects.filter(business=business).select_related('product')
 
         transaction_type = self.request.query_params.get('type')
         if transaction_type:
             queryset = queryset.filter(type=transaction_type)
 
-        return queryset.order_by('-created_at')
+        return queryset.order_by('-created_at', '-id')
 
     def perform_create(self, serializer):
-        self.get_business()  
-        transaction = serializer.save()
-
-    
-        product = transaction.product
-        if transaction.type == 'In':
-            product.current_quantity += transaction.quantity
-        else:  
-            product.current_quantity -= transaction.quantity
-        product.save()
+        business = self.get_business()
+        transaction = StockTransaction(**serializer.validated_data)
+        if transaction.product.business_id != business.id:
+            raise serializers.ValidationError({'product': 'Product not found in this business.'})
+
+        try:
+            serializer.instance = apply_stock_transaction(transaction)
+        except InsufficientStock as error:
+            raise serializers.ValidationError({'quantity': str(error)})
+
+    def bulk(self, request, *args, **kwargs):
+        """
+        Record many transactions in one request.
+
+        Body: {"transactions": [{"product", "type", "quantity"}, ...], "atomic": true}.
+        With atomic=true nothing is written unless every item is valid, and
+        a rejected batch reports its valid items as "skipped";
+        with atomic=false valid items are written and the rest reported.
+        """
+        business = self.get_business()
+        batch = BulkStockTransactionSerializer(data=request.data)
+        batch.is_valid(raise_exception=True)
+
+        items = []
+        for raw in batch.validated_data['transactions']:
+            item = BulkStockTransactionItemSerializer(data=raw)
+            items.append(item.validated_data if item.is_valid() else {'errors': item.errors})
+
+        atomic = batch.validated_data['atomic']
+        try:
+            results, created = apply_stock_transactions_bulk(business, items, atomic=atomic)
+        except StockConflict as error:
+            return Response({'detail': str(error)}, status=status.HTTP_409_CONFLICT)
+
+        if len(created) == len(items):
+            response_status = status.HTTP_201_CREATED
+        elif atomic:
+            response_status = status.HTTP_400_BAD_REQUEST
+        else:
+            response_status = status.HTTP_207_MULTI_STATUS
+
+        statuses = [result['status'] for result in results]
+        return Response({
+            'created': len(created),
+            'rejected': statuses.count('rejected'),
+            'skipped': statuses.count('skipped'),
+            'results': results,
+        }, status=response_status)
+
+
+class ExportView(BusinessScopedMixin, APIView):
+    """
+    Stream a business's products or full transaction ledger.
+
+    /api/businesses/<id>/export/<products|transactions>.<csv|ndjson>[?gzip=1]
+    """
+    permission_classes = [IsAuthenticated]
+
+    def perform_content_negotiation(self, request, force=False):
+        # The body is CSV/NDJSON, not a DRF renderer, so never 406 on Accept.
+        return super().perform_content_negotiation(request, force=True)
+
+    def get(self, request, business_id, dataset, export_format):
+        business = self.get_business()
+        if export_format not in EXPORT_FORMATS:
+            raise Http404
+
+        gzip = request.query_params.get('gzip') in ('1', 'true')
+        filename = f'{dataset}-{business.id}.{export_format}'
+        content_type = EXPORT_FORMATS[export_format]
+        if gzip:
+            filename += '.gz'
+            content_type = 'application/gzip'
+
+        response = StreamingHttpResponse(
+            iter_export(business, dataset, export_format, gzip=gzip),
+            content_type=content_type
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class FragmentCacheStatsView(APIView):
+    """Hit/miss counts of the HTML fragment cache in this process, for staff monitoring."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(fragments.stats())
@@ -1,6 +1,41 @@
 from django.apps import AppConfig
+from django.core import checks
+from django.db.models.signals import post_migrate, post_save, post_delete, pre_delete
+
+
+def install_search_index(sender, using, **kwargs):
+    from .search import install
+    install(using=using)
+
+
+def reserve_shard_ids(sender, using, **kwargs):
+    from .sharding import reserve_id_range
+    reserve_id_range(using)
 
 
 class InventoryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'inventory'
+
+    def ready(self):
+        from django.contrib.auth.models import User
+
+        from .authentication import invalidate_user
+        from .models import Business, WebhookEndpoint
+        from .outbox import invalidate_endpoint
+        from .sharding import check_shared_cache, invalidate_shard, place_business, purge_sharded_business
+        from .tenancy import invalidate_owner
+
+        checks.register(check_shared_cache)
+        post_migrate.connect(install_search_index, sender=self)
+        post_migrate.connect(reserve_shard_ids, sender=self)
+        post_save.connect(invalidate_owner, sender=Business)
+        post_delete.connect(invalidate_owner, sender=Business)
+        post_save.connect(invalidate_shard, sender=Business)
+        post_delete.connect(invalidate_shard, sender=Business)
+        post_save.connect(place_business, sender=Business)
+        pre_delete.connect(purge_sharded_business, sender=Business)
+        post_save.connect(invalidate_endpoint, sender=WebhookEndpoint)
+        post_save.connect(invalidate_user, sender=User)
+        post_delete.connect(invalidate_user, sender=User)
+        post_delete.connect(invalidate_endpoint, sender=WebhookEndpoint)
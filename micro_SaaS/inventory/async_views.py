@@ -0,0 +1,159 @@
+"""
+Async twins of the read-heavy API endpoints, for deployments behind
+micro_SaaS.asgi. They use the async ORM, so a slow read waits on the event
+loop instead of holding a worker thread, and they answer with the same
+JSON as their DRF counterparts by reusing the same serializers, pagination
+links, JWT authentication, ETags and response cache.
+
+DRF views are synchronous, so these are plain Django async views.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from rest_framework.exceptions import APIException, MethodNotAllowed, NotAuthenticated, NotFound
+from rest_framework.request import Request
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+
+from .authentication import CachedJWTAuthentication, business_claims, cached_user
+from .conditional import aversioned_response
+from .fieldsets import FIELDS_PARAM, ValuesSerializer, requested_fields
+from .models import Product, StockTransaction
+from .pagination import ProductPagination, TransactionPagination, apaginate_keyset
+from .renderers import dumps
+from .search import filter_products
+from .sharding import use_business
+from .serializers import (
+    BusinessSummarySerializer,
+    ProductSerializer,
+    StockTransactionSerializer,
+)
+from .summary import aget_summary
+from .tenancy import aget_owned_business
+
+
+_jwt = CachedJWTAuthentication()
+
+
+def render_json(data):
+    return dumps(data)
+
+
+def error_response(error):
+    detail = error.detail if isinstance(error.detail, (dict, list)) else {'detail': error.detail}
+    response = HttpResponse(render_json(detail), status=error.status_code, content_type='application/json')
+    if isinstance(error, (NotAuthenticated, AuthenticationFailed)):
+        response['WWW-Authenticate'] = _jwt.authenticate_header(request=None)
+    return response
+
+
+async def authenticate(request):
+    """``(user, validated token)`` for the request's Bearer access token, or NotAuthenticated."""
+    header = _jwt.get_header(request)
+    raw_token = _jwt.get_raw_token(header) if header is not None else None
+    if raw_token is None:
+        raise NotAuthenticated()
+
+    token = _jwt.get_validated_token(raw_token)
+    user = cached_user(token)
+    if user is None:
+        # Loads and caches the user through the sync ORM; rare once the cache is warm.
+        user = await sync_to_async(_jwt.get_user)(token)
+    return user, token
+
+
+def business_read(view):
+    """
+    GET/HEAD only, JWT-authenticated, with ``business_id`` resolved to one
+    of the user's businesses; DRF errors become DRF-shaped JSON.
+    """
+    @wraps(view)
+    async def wrapper(request, business_id, **kwargs):
+        try:
+            if request.method not in ('GET', 'HEAD'):
+                raise MethodNotAllowed(request.method)
+            user, token = await authenticate(request)
+            business = await aget_owned_business(user, business_id, business_claims(token))
+            if business is None:
+                raise NotFound('No Business matches the given query.')
+            use_business(business)
+            return await view(request, business, **kwargs)
+        except APIException as error:
+            return error_response(error)
+    return wrapper
+
+
+async def paginated(request, queryset, pagination_class, serializer_class):
+    """One keyset page rendered like the DRF list endpoints, from values() and honouring ?fields=."""
+    pagination = pagination_class()
+    pagination.request = Request(request)
+    values = ValuesSerializer(serializer_class, requested_fields(serializer_class, request.GET.get(FIELDS_PARAM)))
+    ordering = [name.lstrip('-') for name in pagination.ordering]
+    try:
+        page = await apaginate_keyset(
+            queryset.values(*values.lookups(*ordering)),
+            pagination.ordering,
+            cursor=request.GET.get(pagination.cursor_query_param),
+            page_size=pagination.get_page_size(pagination.request),
+        )
+    except ValueError:
+        raise NotFound('Invalid cursor')
+
+    return render_json({
+        'next': pagination.get_link(page.next_cursor),
+        'previous': pagination.get_link(page.previous_cursor),
+        'results': values.rows(page.object_list),
+    })
+
+
+@business_read
+async def product_list(request, business):
+    async def render():
+        queryset = Product.objects.filter(business=business)
+        search = request.GET.get('search')
+        category = request.GET.get('category')
+        if search:
+            queryset = await sync_to_async(filter_products)(queryset, search)
+        if category:
+            queryset = queryset.filter(category=category)
+        return await paginated(request, queryset, ProductPagination, ProductSerializer)
+
+    return await aversioned_response(request, business, render)
+
+
+@business_read
+async def product_detail(request, business, pk):
+    async def render():
+        product = await Product.objects.filter(business=business, pk=pk).afirst()
+        if product is None:
+            raise NotFound('No Product matches the given query.')
+        fields = requested_fields(ProductSerializer, request.GET.get(FIELDS_PARAM))
+        return render_json(ProductSerializer(product, fields=fields).data)
+
+    return await aversioned_response(request, business, render)
+
+
+@business_read
+async def transaction_list(request, business):
+    async def render():
+        queryset = StockTransaction.objects.filter(business=business).select_related('product')
+        transaction_type = request.GET.get('type')
+        if transaction_type:
+            queryset = queryset.filter(type=transaction_type)
+        return await paginated(request, queryset, TransactionPagination, StockTransactionSerializer)
+
+    return await aversioned_response(request, business, render)
+
+
+@business_read
+async def business_summary(request, business):
+    async def render():
+        summary = await aget_summary(business)
+        low_stock = [
+            product async for product in Product.objects.filter(
+                business=business, reorder_shortfall__gte=0
+            ).order_by('-reorder_shortfall', '-id')[:5]
+        ]
+        return render_json(BusinessSummarySerializer(summary, context={'low_stock': low_stock}).data)
+
+    return await aversioned_response(request, business, render)
@@ -0,0 +1,141 @@
+"""
+JWT authentication without a user query per request.
+
+CachedJWTAuthentication validates the token as simplejwt does, then takes
+the user from a bounded in-process LRU cache instead of the database.
+Saving or deleting a user (deactivating, changing a password) evicts it
+in the process that made the change; other processes keep their copy
+for at most settings.INVENTORY_AUTH_CACHE_TTL seconds.
+
+Tokens issued through /api/auth/token/ also carry the ids of the
+businesses the user owned at the time (the ``businesses`` claim).
+BusinessScopedMixin then resolves a claimed business from its own cache
+entry, checking its owner, instead of loading every owned business.
+Claims are only a shortcut: a business created after the token was
+issued is looked up the usual way, and a deleted or transferred one fails
+the owner check.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer as BaseTokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .models import Business
+
+
+BUSINESSES_CLAIM = 'businesses'
+
+
+class LRUCache:
+    """A thread-safe mapping of at most ``maxsize`` entries, each kept for ``ttl`` seconds."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                self._entries.pop(key, None)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+users = LRUCache(
+    getattr(settings, 'INVENTORY_AUTH_CACHE_SIZE', 10000),
+    getattr(settings, 'INVENTORY_AUTH_CACHE_TTL', 60),
+)
+
+
+def invalidate_user(sender, instance, **kwargs):
+    """post_save/post_delete receiver for User."""
+    # Keyed as the token's user id claim, a string.
+    pk = str(instance.pk)
+    users.delete(pk)
+    # Again after commit, in case a request cached the old row in between.
+    transaction.on_commit(lambda: users.delete(pk))
+
+
+def cached_user(validated_token, load=None):
+    """
+    The token's user from the LRU cache, else from ``load(validated_token)``
+    (which runs simplejwt's checks), else ``None``. Each caller gets its
+    own copy.
+    """
+    try:
+        user_id = str(validated_token[jwt_settings.USER_ID_CLAIM])
+    except KeyError:
+        raise InvalidToken(_('Token contained no recognizable user identification'))
+
+    user = users.get(user_id)
+    if user is None:
+        if load is None:
+            return None
+        user = load(validated_token)
+        users.set(user_id, user)
+    elif jwt_settings.CHECK_REVOKE_TOKEN and (
+        validated_token.get(jwt_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password)
+    ):
+        raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+    return copy.copy(user)
+
+
+def business_claims(token):
+    """The business ids a token claims the user owns, or ``None`` if it has no such claim."""
+    if token is None:
+        return None
+    claimed = token.get(BUSINESSES_CLAIM)
+    return set(claimed) if isinstance(claimed, list) else None
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication with users served from the in-process cache."""
+
+    def get_user(self, validated_token):
+        return cached_user(validated_token, super().get_user)
+
+
+class TokenObtainPairSerializer(BaseTokenObtainPairSerializer):
+    """Issues token pairs carrying the user's owned business ids (SIMPLE_JWT TOKEN_OBTAIN_SERIALIZER)."""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        # The access token copies this claim from the refresh token.
+        token[BUSINESSES_CLAIM] = list(Business.objects.filter(owner=user).order_by('id').values_list('id', flat=True))
+        return token
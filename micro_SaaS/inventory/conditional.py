@@ -0,0 +1,134 @@
+"""
+Conditional GET and response caching for business-scoped API reads.
+
+Every product or stock write bumps the business version (see
+inventory.summary), so a read's representation is identified by the
+version, the full path and the negotiated media type. That gives a strong
+ETag and a Last-Modified, lets unchanged resources be answered with 304
+before the queryset or serializer runs, and keys a shared response cache
+that needs no invalidation: a write moves reads on to new keys.
+
+The version is read before the queryset, so a write committed in between
+can only make a cached body newer than its version, never older. Processes
+other than the writer see the new version once their cached copy expires,
+after settings.INVENTORY_VERSION_CACHE_TIMEOUT seconds.
+"""
+import hashlib
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .routing import replica_lags, use_primary
+from .summary import aget_version, get_version
+
+
+RESPONSE_CACHE_TIMEOUT = 10 * 60
+
+
+def representation_validators(business_id, version, updated_at, media_type, full_path):
+    """``(response cache key, {'ETag', 'Last-Modified'})`` for one representation."""
+    representation = f'{version}:{updated_at.isoformat()}:{media_type}:{full_path}'
+    digest = hashlib.sha256(representation.encode()).hexdigest()
+    return f'inventory:response:{business_id}:{digest}', {
+        'ETag': f'"{digest[:32]}"',
+        'Last-Modified': http_date(updated_at.timestamp()),
+    }
+
+
+def _with_validators(response, validators):
+    for header, value in validators.items():
+        response[header] = value
+    return response
+
+
+async def aversioned_response(request, business, render, content_type='application/json'):
+    """
+    VersionedResponseMixin for async views: ``render`` is an async callable
+    returning the body, and only runs when neither a 304 nor the response
+    cache can answer.
+    """
+    version, updated_at = await aget_version(business.id)
+    key, validators = representation_validators(
+        business.id, version, updated_at, content_type, request.get_full_path()
+    )
+
+    not_modified = get_conditional_response(
+        request, etag=validators['ETag'], last_modified=int(updated_at.timestamp())
+    )
+    if not_modified is not None:
+        return _with_validators(not_modified, validators)
+
+    cached = await cache.aget(key)
+    if cached is not None:
+        response = HttpResponse(cached[0], content_type=cached[1])
+        response['X-Response-Cache'] = 'hit'
+        return _with_validators(response, validators)
+
+    content = await render()
+    await cache.aset(key, (content, content_type), RESPONSE_CACHE_TIMEOUT)
+    response = HttpResponse(content, content_type=content_type)
+    response['X-Response-Cache'] = 'miss'
+    return _with_validators(response, validators)
+
+
+class VersionedResponseMixin:
+    """
+    For BusinessScopedMixin viewsets: ETag/Last-Modified, 304s and cached
+    bodies for the actions in ``versioned_actions``, rendered in one of
+    ``versioned_formats``. The browsable API is left out: its pages carry
+    the requesting user and their CSRF token, so they must not be shared.
+    """
+    versioned_actions = ('list', 'retrieve')
+    versioned_formats = ('json',)
+
+    def list(self, request, *args, **kwargs):
+        return self.versioned(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.versioned(super().retrieve, request, *args, **kwargs)
+
+    def versioned(self, handler, request, *args, **kwargs):
+        if self.action not in self.versioned_actions or request.accepted_renderer.format not in self.versioned_formats:
+            return handler(request, *args, **kwargs)
+
+        business = self.get_business()
+        version, updated_at = get_version(business.id)
+        self.response_cache_key, self.validators = representation_validators(
+            business.id, version, updated_at, request.accepted_media_type, request.get_full_path()
+        )
+
+        not_modified = get_conditional_response(
+            request, etag=self.validators['ETag'], last_modified=int(updated_at.timestamp())
+        )
+        if not_modified is not None:
+            return _with_validators(not_modified, self.validators)
+
+        cached = cache.get(self.response_cache_key)
+        if cached is not None:
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+            response['X-Response-Cache'] = 'hit'
+            return _with_validators(response, self.validators)
+
+        if replica_lags(business.id, version):
+            # The body is cached under this version, so it must not come from an older copy.
+            use_primary()
+        return handler(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        key = getattr(self, 'response_cache_key', None)
+        if key and response.status_code == 200 and response.streaming:
+            # Streamed bodies are never held in memory, so they are not cached either.
+            _with_validators(response, self.validators)
+            if response.has_header('Content-Encoding'):
+                # Strong ETags name exact bytes; the compressed body has other bytes.
+                response['ETag'] = f"W/{response['ETag']}"
+        elif key and response.status_code == 200 and not response.has_header('X-Response-Cache'):
+            response.render()
+            cache.set(key, (response.content, response['Content-Type']), RESPONSE_CACHE_TIMEOUT)
+            response['X-Response-Cache'] = 'miss'
+            _with_validators(response, self.validators)
+        return response
@@ -0,0 +1,127 @@
+import csv
+import io
+import zlib
+from datetime import datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Product, StockTransaction
+
+
+# (column name, ORM lookup) pairs for each exportable dataset.
+PRODUCT_COLUMNS = [
+    ('id', 'id'),
+    ('name', 'name'),
+    ('sku', 'sku'),
+    ('category', 'category'),
+    ('current_quantity', 'current_quantity'),
+    ('reorder_level', 'reorder_level'),
+    ('unit', 'unit'),
+    ('supplier_name', 'supplier_name'),
+]
+
+TRANSACTION_COLUMNS = [
+    ('id', 'id'),
+    ('created_at', 'created_at'),
+    ('product_id', 'product_id'),
+    ('product_sku', 'product__sku'),
+    ('product_name', 'product__name'),
+    ('type', 'type'),
+    ('quantity', 'quantity'),
+]
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+CHUNK_ROWS = 2000
+CHUNK_BYTES = 64 * 1024
+
+
+def export_dataset(business, dataset):
+    """Return ``(columns, rows)`` for a business's products or transaction ledger."""
+    if dataset == 'products':
+        columns = PRODUCT_COLUMNS
+        queryset = Product.objects.filter(business=business).order_by('id')
+    elif dataset == 'transactions':
+        columns = TRANSACTION_COLUMNS
+        queryset = StockTransaction.objects.filter(business=business).order_by('id')
+    else:
+        raise ValueError(f'Unknown export dataset: {dataset}')
+
+    # Pin the tenant's shard now: the rows are streamed after the view returns.
+    queryset = queryset.using(queryset.db)
+    # values_list + iterator keeps a server-side cursor open and never
+    # builds model instances or the full result list in memory.
+    rows = queryset.values_list(*[lookup for _, lookup in columns]).iterator(chunk_size=CHUNK_ROWS)
+    return [name for name, _ in columns], rows
+
+
+def _clean(row):
+    return [value.isoformat() if isinstance(value, datetime) else value for value in row]
+
+
+def iter_csv(header, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    # The header goes out on its own so the client gets a first byte at once.
+    yield buffer.getvalue().encode()
+    buffer.seek(0)
+    buffer.truncate()
+
+    for row in rows:
+        writer.writerow(_clean(row))
+        if buffer.tell() >= CHUNK_BYTES:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def iter_ndjson(header, rows):
+    encoder = DjangoJSONEncoder()
+    lines = []
+    size = 0
+    for row in rows:
+        line = encoder.encode(dict(zip(header, row)))
+        lines.append(line)
+        size += len(line) + 1
+        if size >= CHUNK_BYTES:
+            yield ('\n'.join(lines) + '\n').encode()
+            lines = []
+            size = 0
+
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode()
+
+
+def iter_gzip(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    first = True
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if first:
+            # Flush the first chunk so compression does not delay the first byte.
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+            first = False
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def iter_export(business, dataset, export_format='csv', gzip=False):
+    """Yield the encoded bytes of an export, chunk by chunk."""
+    header, rows = export_dataset(business, dataset)
+
+    if export_format == 'csv':
+        chunks = iter_csv(header, rows)
+    elif export_format == 'ndjson':
+        chunks = iter_ndjson(header, rows)
+    else:
+        raise ValueError(f'Unknown export format: {export_format}')
+
+    return iter_gzip(chunks) if gzip else chunks
@@ -0,0 +1,99 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from .models import CategoryFacet, Product
+from .sharding import tenant_db
+from .summary import get_version
+
+
+CACHE_TIMEOUT = 60 * 60
+
+
+def cache_key(business_id, version):
+    return f'inventory:category-facets:{business_id}:{version}'
+
+
+def facet_delta(before, after):
+    """
+    Per-category ``(product_count, low_stock_count)`` changes for a product
+    moving between (quantity, reorder_level, category) states.
+    """
+    deltas = {}
+    for state, sign in ((before, -1), (after, 1)):
+        if state is None:
+            continue
+        quantity, reorder_level, category = state
+        products, low = deltas.get(category, (0, 0))
+        deltas[category] = (products + sign, low + sign * int(quantity <= reorder_level))
+    return {category: counts for category, counts in deltas.items() if any(counts)}
+
+
+def apply_facet_delta(business_id, deltas):
+    """Apply facet_delta() output inside the transaction that made the product change."""
+    if not deltas:
+        return
+
+    for category, (products, low) in deltas.items():
+        facets = CategoryFacet.objects.filter(business_id=business_id, category=category)
+        updated = facets.update(
+            product_count=F('product_count') + products,
+            low_stock_count=F('low_stock_count') + low,
+        )
+        if not updated:
+            _rebuild_category(business_id, category)
+        elif products < 0:
+            facets.filter(product_count__lte=0).delete()
+
+
+def invalidate(business_id):
+    # Product writes move the business to a new version, and so to a new
+    # key; a rebuild does not, so drop the current entry now and again
+    # after commit, so a read that cached the pre-commit state in between
+    # does not outlive the transaction.
+    def delete():
+        cache.delete(cache_key(business_id, get_version(business_id)[0]))
+
+    delete()
+    transaction.on_commit(delete, using=tenant_db())
+
+
+def _rebuild_category(business_id, category):
+    totals = Product.objects.filter(business_id=business_id, category=category).aggregate(
+        product_count=Count('id'),
+        low_stock_count=Count('id', filter=Q(reorder_shortfall__gte=0)),
+    )
+    if totals['product_count']:
+        CategoryFacet.objects.update_or_create(business_id=business_id, category=category, defaults=totals)
+    else:
+        CategoryFacet.objects.filter(business_id=business_id, category=category).delete()
+
+
+def rebuild_facets(business_id):
+    """Recompute every category facet of a business from its products."""
+    rows = Product.objects.filter(business_id=business_id).values('category').annotate(
+        product_count=Count('id'),
+        low_stock_count=Count('id', filter=Q(reorder_shortfall__gte=0)),
+    )
+    with transaction.atomic(using=tenant_db()):
+        CategoryFacet.objects.filter(business_id=business_id).delete()
+        CategoryFacet.objects.bulk_create([CategoryFacet(business_id=business_id, **row) for row in rows])
+        invalidate(business_id)
+
+
+def get_facets(business_id):
+    """
+    The business's categories with counts, sorted by name, cached per
+    business version (inventory.summary): other processes see a product
+    write once their cached version expires.
+    """
+    key = cache_key(business_id, get_version(business_id)[0])
+    facets = cache.get(key)
+    if facets is None:
+        facets = list(
+            CategoryFacet.objects.filter(business_id=business_id)
+            .order_by('category')
+            .values('category', 'product_count', 'low_stock_count')
+        )
+        cache.set(key, facets, CACHE_TIMEOUT)
+    return facets
@@ -0,0 +1,124 @@
+"""
+Sparse fieldsets and values()-based serialization for list endpoints.
+
+``?fields=id,name`` picks which serializer fields a response carries.
+Serializers that support it declare ``value_fields``: each output field
+and the ORM lookup holding its value. A list then selects only those
+columns with values() and builds each row's dict directly, without model
+instances or per-field serializer machinery. Only fields whose
+representation differs from the stored value (dates, decimals) go
+through their serializer field.
+"""
+from datetime import timedelta
+
+from rest_framework import ISO_8601, serializers
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+
+from .streaming import streaming_json_response, wants_stream
+
+
+FIELDS_PARAM = 'fields'
+
+# Stored values of these fields need their serializer field to render them.
+CONVERTED = (serializers.DateTimeField, serializers.DateField, serializers.TimeField, serializers.DecimalField)
+
+
+def _converter(field):
+    """``field.to_representation``, or ``None`` where the stored value already renders the same."""
+    if not isinstance(field, CONVERTED):
+        return None
+    if isinstance(field, serializers.DateTimeField):
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        zone = getattr(field, 'timezone', field.default_timezone())
+        if output_format and output_format.lower() == ISO_8601 and zone and zone.utcoffset(None) == timedelta(0):
+            # inventory.renderers writes aware UTC datetimes as DRF does: ISO 8601 ending in Z.
+            return None
+    return field.to_representation
+
+
+def requested_fields(serializer_class, value):
+    """The serializer fields named in a ``?fields=`` value, in declaration order; all when empty."""
+    available = list(serializer_class.Meta.fields)
+    names = {name.strip() for name in (value or '').split(',') if name.strip()}
+    if not names:
+        return available
+    unknown = names - set(available)
+    if unknown:
+        raise ValidationError({FIELDS_PARAM: [
+            f"Unknown field(s): {', '.join(sorted(unknown))}. Choose from: {', '.join(available)}."
+        ]})
+    return [name for name in available if name in names]
+
+
+class SparseFieldsMixin:
+    """For serializers: ``fields=[...]`` keeps only those fields."""
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class ValuesSerializer:
+    """Render values() rows as ``serializer_class`` would render the instances."""
+
+    def __init__(self, serializer_class, fields):
+        declared = serializer_class().fields
+        self.columns = []
+        for name in fields:
+            self.columns.append((name, serializer_class.value_fields[name], _converter(declared[name])))
+
+    def lookups(self, *required):
+        """Lookups for values(): the requested columns plus ``required`` (e.g. pagination ordering)."""
+        return list(dict.fromkeys([lookup for _, lookup, _ in self.columns] + list(required)))
+
+    def rows(self, values):
+        columns = self.columns
+        return [
+            {
+                name: (convert(row[lookup]) if convert is not None and row[lookup] is not None else row[lookup])
+                for name, lookup, convert in columns
+            }
+            for row in values
+        ]
+
+
+class SparseFieldsetMixin:
+    """
+    For viewsets whose serializer declares ``value_fields``: ?fields= on
+    list and retrieve, and list pages serialized from values(); ?stream=1
+    lists every row instead of a page.
+    """
+    sparse_actions = ('list', 'retrieve')
+
+    def requested_fields(self):
+        return requested_fields(self.get_serializer_class(), self.request.query_params.get(FIELDS_PARAM))
+
+    def get_serializer(self, *args, **kwargs):
+        if self.action in self.sparse_actions:
+            kwargs.setdefault('fields', self.requested_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action == 'retrieve':
+            value_fields = self.get_serializer_class().value_fields
+            lookups = [value_fields[name] for name in self.requested_fields()]
+            # A relation left out of only() cannot stay in select_related().
+            related = {lookup.split('__')[0] for lookup in lookups if '__' in lookup}
+            queryset = queryset.select_related(None).only('pk', *lookups)
+            if related:
+                queryset = queryset.select_related(*related)
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        values = ValuesSerializer(self.get_serializer_class(), self.requested_fields())
+        ordering = [name.lstrip('-') for name in self.paginator.ordering]
+        queryset = self.filter_queryset(self.get_queryset()).values(*values.lookups(*ordering))
+        if wants_stream(request):
+            # Every row, in page order, as one JSON array (see inventory.streaming).
+            return streaming_json_response(request, queryset.order_by(*self.paginator.ordering), values.rows)
+        page = self.paginate_queryset(queryset)
+        return self.get_paginated_response(values.rows(page))
@@ -0,0 +1,96 @@
+"""
+Template fragments cached per business data version.
+
+``{% versioned_cache 'name' business vary... %}`` (templatetags
+inventory_fragments) caches the HTML it encloses under a key made of the
+fragment name, the business, its current version (inventory.summary) and
+any ``vary`` values such as the search query or cursor. Every product or
+stock write bumps the version of its business, and other businesses keep
+their fragments. The process that wrote renders the business's fragments
+afresh on its next page view; other processes read versions through
+their own cache and may serve the old fragments for up to
+settings.INVENTORY_VERSION_CACHE_TIMEOUT seconds. Superseded entries are
+never read again and age out of the 'fragments' cache.
+
+Hits and misses are counted per fragment name in this process; see
+stats() and the fragment cache stats API view.
+"""
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+
+from .summary import get_version
+
+
+CACHE_ALIAS = 'fragments'
+
+
+class FragmentStats:
+    """Thread-safe hit/miss counts per fragment name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = Counter()
+        self.misses = Counter()
+
+    def record(self, name, hit):
+        with self._lock:
+            (self.hits if hit else self.misses)[name] += 1
+
+    def snapshot(self):
+        with self._lock:
+            names = sorted(set(self.hits) | set(self.misses))
+            return {
+                name: {
+                    'hits': self.hits[name],
+                    'misses': self.misses[name],
+                    'hit_rate': round(self.hits[name] / (self.hits[name] + self.misses[name]), 4),
+                }
+                for name in names
+            }
+
+    def clear(self):
+        with self._lock:
+            self.hits.clear()
+            self.misses.clear()
+
+
+counters = FragmentStats()
+
+
+def fragment_cache():
+    return caches[CACHE_ALIAS]
+
+
+def fragment_key(name, business_id, vary_on=()):
+    """The cache key of fragment ``name`` of a business at its current version."""
+    version, _ = get_version(business_id)
+    return make_template_fragment_key(name, [business_id, version, *vary_on])
+
+
+def cached_fragment(name, business_id, vary_on, render):
+    """The fragment's cached HTML, else ``render()`` stored for the current version."""
+    key = fragment_key(name, business_id, vary_on)
+    cache = fragment_cache()
+    content = cache.get(key)
+    counters.record(name, hit=content is not None)
+    if content is None:
+        content = render()
+        cache.set(key, content, getattr(settings, 'INVENTORY_FRAGMENT_CACHE_TIMEOUT', 600))
+    return content
+
+
+def stats():
+    """Hit/miss counts per fragment, plus the totals."""
+    fragments = counters.snapshot()
+    hits = sum(row['hits'] for row in fragments.values())
+    misses = sum(row['misses'] for row in fragments.values())
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / (hits + misses), 4) if hits + misses else None,
+        'fragments': fragments,
+    }
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_date
+
+from inventory.models import Business
+from inventory.rollups import rebuild_movements
+from inventory.sharding import tenant
+
+
+class Command(BaseCommand):
+    help = "Rebuild daily movement rollups from the stock transaction ledger."
+
+    def add_arguments(self, parser):
+        parser.add_argument('business_ids', nargs='*', type=int, help="Defaults to every business.")
+        parser.add_argument('--start', type=parse_date, help="First day to rebuild (YYYY-MM-DD).")
+        parser.add_argument('--end', type=parse_date, help="Last day to rebuild (YYYY-MM-DD).")
+
+    def handle(self, *args, **options):
+        businesses = Business.objects.order_by('id')
+        if options['business_ids']:
+            businesses = businesses.filter(id__in=options['business_ids'])
+
+        for business_id in businesses.values_list('id', flat=True).iterator():
+            with tenant(business_id):
+                written = rebuild_movements(business_id, options['start'], options['end'])
+            self.stdout.write(f'business {business_id}: {written} daily rows')
@@ -0,0 +1,186 @@
+import asyncio
+import json
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.authentication import TokenObtainPairSerializer
+from inventory.management.commands.bench_routes import largest_businesses
+from inventory.models import Business, Product
+from inventory.sharding import tenant
+
+
+# name: (path under /api/ for the sync DRF view, served by WSGI;
+#        path for its async twin, served by ASGI)
+ENDPOINTS = {
+    'products': ('businesses/{business}/products/', 'async/businesses/{business}/products/'),
+    'product': ('businesses/{business}/products/{product}/', 'async/businesses/{business}/products/{product}/'),
+    'transactions': ('businesses/{business}/transactions/', 'async/businesses/{business}/transactions/'),
+    'summary': ('businesses/{business}/summary/', 'async/businesses/{business}/summary/'),
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def fetch(reader, writer, path, token):
+    writer.write((
+        f'GET {path} HTTP/1.1\r\nHost: localhost\r\nAuthorization: Bearer {token}\r\n'
+        f'Accept: application/json\r\n\r\n'
+    ).encode())
+    await writer.drain()
+
+    head = await reader.readuntil(b'\r\n\r\n')
+    status = int(head.split(b' ', 2)[1])
+    length = 0
+    for line in head.split(b'\r\n'):
+        if line.lower().startswith(b'content-length:'):
+            length = int(line.split(b':', 1)[1])
+    await reader.readexactly(length)
+    return status
+
+
+async def client(port, paths, token, deadline, latencies, errors, counter):
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        while time.perf_counter() < deadline:
+            counter[0] += 1
+            path = paths[counter[0] % len(paths)]
+            # A unique query string per request keeps the response cache out of the measurement.
+            separator = '&' if '?' in path else '?'
+            started = time.perf_counter()
+            try:
+                status = await fetch(reader, writer, f'{path}{separator}_={counter[0]}', token)
+            except (asyncio.IncompleteReadError, ConnectionError):
+                errors.append('connection')
+                writer.close()
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+            if status != 200:
+                errors.append(status)
+    finally:
+        writer.close()
+
+
+async def load(port, paths, token, clients, duration):
+    latencies, errors, counter = [], [], [0]
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        client(port, paths, token, deadline, latencies, errors, counter) for _ in range(clients)
+    ])
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(statistics.median(latencies), 2) if latencies else None,
+        'p99_ms': round(latencies[int(len(latencies) * 0.99)], 2) if latencies else None,
+        'errors': len(errors),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare requests/sec of the async read endpoints under uvicorn (ASGI) with "
+        "their sync DRF twins under gunicorn (WSGI) at increasing client counts. "
+        "Needs uvicorn and gunicorn installed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', type=int, help="Defaults to the business with the most products.")
+        parser.add_argument('--clients', default='10,100,400', help="Comma-separated client counts.")
+        parser.add_argument('--duration', type=float, default=10.0, help="Seconds per run.")
+        parser.add_argument('--endpoints', default=','.join(ENDPOINTS))
+        parser.add_argument('--workers', type=int, default=1, help="Server processes for both servers.")
+        parser.add_argument('--threads', type=int, default=16, help="gunicorn threads per worker.")
+        parser.add_argument('--output', '-o', help="Write results JSON here.")
+
+    def handle(self, *args, **options):
+        for binary in ('uvicorn', 'gunicorn'):
+            if shutil.which(binary) is None:
+                raise CommandError(f'{binary} is not installed.')
+
+        businesses = Business.objects.select_related('owner')
+        if options['business']:
+            businesses = businesses.filter(id=options['business'])
+        business = next(iter(largest_businesses(businesses)), None)
+        if business is None:
+            raise CommandError("No business to benchmark; run seed_inventory first.")
+        with tenant(business.id):
+            product = Product.objects.filter(business=business).order_by('id').first()
+        token = str(TokenObtainPairSerializer.get_token(business.owner).access_token)
+
+        names = options['endpoints'].split(',')
+        unknown = set(names) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+        fields = {'business': business.id, 'product': product.id if product else 0}
+        paths = {
+            mode: [f'/api/{ENDPOINTS[name][index].format(**fields)}' for name in names]
+            for index, mode in enumerate(('wsgi', 'asgi'))
+        }
+
+        port = free_port()
+        servers = {
+            'wsgi': [
+                'gunicorn', 'micro_SaaS.wsgi:application', '--bind', f'127.0.0.1:{port}',
+                '--workers', str(options['workers']), '--threads', str(options['threads']),
+                '--worker-class', 'gthread', '--backlog', '2048', '--log-level', 'warning',
+            ],
+            'asgi': [
+                'uvicorn', 'micro_SaaS.asgi:application', '--port', str(port),
+                '--workers', str(options['workers']), '--backlog', '2048', '--log-level', 'warning',
+            ],
+        }
+
+        results = {}
+        for mode, command in servers.items():
+            server = subprocess.Popen(
+                command, cwd=Path(settings.BASE_DIR), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            try:
+                self.wait_for(port)
+                asyncio.run(load(port, paths[mode], token, 4, 2))  # warm up
+                for clients in [int(count) for count in options['clients'].split(',')]:
+                    row = asyncio.run(load(port, paths[mode], token, clients, options['duration']))
+                    results.setdefault(mode, {})[clients] = row
+                    self.stdout.write(
+                        f"{mode} {clients:>5} clients: {row['rps']:>8} req/s  p50 {row['p50_ms']}ms  "
+                        f"p99 {row['p99_ms']}ms  errors {row['errors']}"
+                    )
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({
+                    'business_id': business.id,
+                    'endpoints': names,
+                    'workers': options['workers'],
+                    'threads': options['threads'],
+                    'python': sys.version.split()[0],
+                    'results': results,
+                }, output, indent=2)
+
+    def wait_for(self, port, timeout=30):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                with socket.create_connection(('127.0.0.1', port), timeout=1):
+                    return
+            except OSError:
+                time.sleep(0.2)
+        raise CommandError(f'Server did not start on port {port}.')
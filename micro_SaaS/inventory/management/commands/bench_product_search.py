@@ -0,0 +1,72 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from inventory.models import Business, Product
+from inventory.search import filter_products, search_products
+
+
+WORDS = [
+    'steel', 'copper', 'bolt', 'washer', 'bracket', 'hinge', 'valve', 'filter',
+    'cable', 'relay', 'switch', 'sensor', 'panel', 'gasket', 'spring', 'clamp',
+]
+SUPPLIERS = ['Acme', 'Globex', 'Initech', 'Umbrella', 'Hooli', 'Vandelay']
+
+
+def legacy_search(products, query):
+    """The icontains OR scan ProductViewSet used before the search index."""
+    return products.filter(name__icontains=query) | products.filter(
+        sku__icontains=query
+    ) | products.filter(supplier_name__icontains=query)
+
+
+class Command(BaseCommand):
+    help = "Compare indexed product search with the old icontains scan on a seeded business."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--limit', type=int, default=50)
+
+    def handle(self, *args, **options):
+        rng = random.Random(7)
+        user, _ = User.objects.get_or_create(username='bench_product_search')
+        business, _ = Business.objects.get_or_create(name='Search benchmark', owner=user)
+
+        try:
+            self.stdout.write(f"Seeding {options['products']} products...")
+            batch = []
+            for n in range(options['products']):
+                name = f"{rng.choice(WORDS)} {rng.choice(WORDS)} {n}"
+                batch.append(Product(
+                    business=business, name=name, sku=f'SKU{n:07d}', category='bench',
+                    unit='pcs', supplier_name=rng.choice(SUPPLIERS), reorder_shortfall=0,
+                ))
+                if len(batch) == 5000:
+                    Product.objects.bulk_create(batch)
+                    batch = []
+            Product.objects.bulk_create(batch)
+
+            products = Product.objects.filter(business=business)
+            queries = ['copper val', 'SKU0042', 'Initech', f"SKU{options['products'] // 2:07d}", 'xyzzy']
+            for query in queries:
+                legacy = self.time(lambda: list(legacy_search(products, query).order_by('id')[:options['limit']]), options)
+                indexed = self.time(lambda: list(filter_products(products, query).order_by('id')[:options['limit']]), options)
+                ranked = self.time(lambda: search_products(business, query, limit=options['limit']), options)
+                self.stdout.write(
+                    f'{query!r:>14}: icontains {legacy:7.2f}ms  indexed {indexed:7.2f}ms  ranked {ranked:7.2f}ms'
+                )
+        finally:
+            business.delete()
+            user.delete()
+
+    def time(self, run, options):
+        timings = []
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
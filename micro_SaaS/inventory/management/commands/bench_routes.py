@@ -0,0 +1,232 @@
+import json
+import logging
+import platform
+import statistics
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from inventory import api_urls, urls
+from inventory.authentication import TokenObtainPairSerializer
+from inventory.models import Business, Product, StockTransaction
+from inventory.querybudget import record_queries
+from inventory.sharding import tenant
+
+
+# (URL name, method, URL kwargs, query string). A URL kwarg naming a
+# fixture (business, product or transaction) takes that fixture's pk.
+ROUTES = [
+    ('dashboard', 'get', {}, {}),
+    ('business_list', 'get', {}, {}),
+    ('business_create', 'get', {}, {}),
+    ('business-switch', 'get', {'business_id': 'business'}, {}),
+    ('product_list', 'get', {}, {}),
+    ('product_list', 'get', {}, {'search_query': 'valve'}),
+    ('product_list', 'get', {}, {'category_query': 'Hardware'}),
+    ('product_add', 'get', {}, {}),
+    ('product_update', 'get', {'product_id': 'product'}, {}),
+    ('product_delete', 'get', {'product_id': 'product'}, {}),
+    ('transaction_add', 'get', {}, {}),
+    ('transaction_list', 'get', {}, {}),
+    ('transaction_list', 'get', {}, {'type': 'Out'}),
+    ('signup', 'get', {}, {}),
+    ('login', 'get', {}, {}),
+    ('api-root', 'get', {}, {}),
+    ('business-list', 'get', {}, {}),
+    ('business-detail', 'get', {'pk': 'business'}, {}),
+    ('business-products-list', 'get', {'business_id': 'business'}, {}),
+    ('business-products-list', 'get', {'business_id': 'business'}, {'search': 'valve'}),
+    ('business-products-list', 'get', {'business_id': 'business'}, {'stream': 1}),
+    ('business-products-search', 'get', {'business_id': 'business'}, {'q': 'copper valve'}),
+    ('business-products-detail', 'get', {'business_id': 'business', 'pk': 'product'}, {}),
+    ('business-products-stock-at', 'get', {'business_id': 'business', 'pk': 'product'}, {'ts': '2026-03-31'}),
+    ('business-stock-at', 'get', {'business_id': 'business'}, {'ts': '2026-03-31'}),
+    ('business-movements', 'get', {'business_id': 'business'}, {'start': '2025-10-01', 'end': '2026-09-30'}),
+    ('business-movements', 'get', {'business_id': 'business'}, {'start': '2025-10-01', 'end': '2026-09-30', 'interval': 'month'}),
+    ('business-reorder-forecast', 'get', {'business_id': 'business'}, {}),
+    ('business-categories', 'get', {'business_id': 'business'}, {}),
+    ('business-low-stock', 'get', {'business_id': 'business'}, {}),
+    ('business-transactions-list', 'get', {'business_id': 'business'}, {}),
+    ('business-transactions-list', 'get', {'business_id': 'business'}, {'type': 'Out'}),
+    ('business-transactions-list', 'get', {'business_id': 'business'}, {'fields': 'id,quantity,created_at'}),
+    ('business-transactions-detail', 'get', {'business_id': 'business', 'pk': 'transaction'}, {}),
+    ('business-export', 'get', {'business_id': 'business', 'dataset': 'products', 'export_format': 'csv'}, {}),
+    ('business-summary', 'get', {'business_id': 'business'}, {}),
+    ('fragment-cache-stats', 'get', {}, {}),
+    ('async-business-products-list', 'get', {'business_id': 'business'}, {}),
+    ('async-business-products-detail', 'get', {'business_id': 'business', 'pk': 'product'}, {}),
+    ('async-business-transactions-list', 'get', {'business_id': 'business'}, {}),
+    ('async-business-summary', 'get', {'business_id': 'business'}, {}),
+]
+
+# Routes that only accept writes or end the session; they are not timed.
+SKIPPED = {'logout', 'api-register', 'token-obtain-pair', 'token-refresh', 'business-transactions-bulk'}
+
+
+def largest_businesses(businesses, count=1):
+    """
+    ``businesses`` with the most products first, at most ``count``. Each is
+    counted on its own shard; an annotation would only see ``default``.
+    """
+    sizes = {}
+    for business in businesses:
+        with tenant(business.id):
+            sizes[business] = Product.objects.filter(business=business).count()
+    return sorted(sizes, key=sizes.get, reverse=True)[:count]
+
+
+def percentile(timings, fraction):
+    ordered = sorted(timings)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+class Command(BaseCommand):
+    help = (
+        "Time every inventory HTML and API route against the current (seeded) database "
+        "and write latency percentiles and query counts as JSON. Use --compare to flag "
+        "regressions against an earlier run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owner', default='bench', help="Owner of the seeded businesses (see seed_inventory).")
+        parser.add_argument('--business', type=int, help="Business id; defaults to the owner's largest.")
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--output', '-o', help="Write results JSON here.")
+        parser.add_argument('--compare', help="Earlier results JSON to compare against.")
+        parser.add_argument('--threshold', type=float, default=0.2, help="Allowed p95 slowdown, as a fraction.")
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        try:
+            owner = User.objects.get(username=options['owner'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user {options['owner']!r}; run seed_inventory first.")
+
+        businesses = Business.objects.filter(owner=owner)
+        if options['business']:
+            business = businesses.get(id=options['business'])
+        else:
+            business = next(iter(largest_businesses(businesses)), None)
+        if business is None:
+            raise CommandError("The owner has no businesses; run seed_inventory first.")
+
+        with tenant(business.id):
+            fixtures = {
+                'business': business,
+                'product': Product.objects.filter(business=business).annotate(
+                    moves=Count('transactions')
+                ).order_by('-moves').first(),
+                'transaction': StockTransaction.objects.filter(business=business).order_by('-id').first(),
+            }
+        self.check_coverage()
+        # The per-request query log would drown out the results.
+        logging.getLogger('inventory.queries').setLevel(logging.WARNING)
+
+        html = Client(SERVER_NAME='localhost')
+        html.force_login(owner)
+        session = html.session
+        session['current_business_id'] = business.id
+        session.save()
+        api = APIClient(SERVER_NAME='localhost')
+        # Issued like /api/auth/token/ tokens, with the owned business claim.
+        api.credentials(HTTP_AUTHORIZATION=f'Bearer {TokenObtainPairSerializer.get_token(owner).access_token}')
+
+        results = {}
+        for name, method, kwargs, query in ROUTES:
+            url = reverse(name, kwargs={
+                key: fixtures[value].pk if value in fixtures else value for key, value in kwargs.items()
+            })
+            client = api if url.startswith('/api/') else html
+            key = name + (f'?{"&".join(f"{k}={v}" for k, v in query.items())}' if query else '')
+            results[key] = self.measure(client, method, url, query, options)
+            row = results[key]
+            self.stdout.write(
+                f"{key:<60} {row['status']}  p50 {row['p50_ms']:8.2f}ms  "
+                f"p95 {row['p95_ms']:8.2f}ms  p99 {row['p99_ms']:8.2f}ms  queries {row['queries']}"
+            )
+
+        with tenant(business.id) as shard:
+            report = {
+                'meta': {
+                    'timestamp': timezone.now().isoformat(),
+                    'python': platform.python_version(),
+                    'database': settings.DATABASES['default']['ENGINE'],
+                    'business_id': business.id,
+                    'shard': shard,
+                    'products': Product.objects.filter(business=business).count(),
+                    'transactions': StockTransaction.objects.filter(business=business).count(),
+                    'iterations': options['iterations'],
+                },
+                'routes': results,
+            }
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(report, output, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if options['compare']:
+            with open(options['compare']) as baseline:
+                regressions = self.compare(json.load(baseline)['routes'], results, options['threshold'])
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f'{len(regressions)} route(s) regressed')
+
+    def check_coverage(self):
+        patterns = urls.urlpatterns + api_urls.urlpatterns + api_urls.router.urls
+        named = {pattern.name for pattern in patterns if getattr(pattern, 'name', None)}
+        missing = named - {route[0] for route in ROUTES} - SKIPPED
+        if missing:
+            self.stderr.write(f"Routes without a benchmark: {', '.join(sorted(missing))}")
+
+    def measure(self, client, method, url, query, options):
+        request = getattr(client, method)
+        for _ in range(options['warmup']):
+            request(url, query)
+
+        timings = []
+        queries = []
+        for _ in range(options['iterations']):
+            with record_queries() as recorder:
+                started = time.perf_counter()
+                response = request(url, query)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                timings.append((time.perf_counter() - started) * 1000)
+            queries.append(recorder.count)
+
+        return {
+            'method': method.upper(),
+            'url': url,
+            'status': response.status_code,
+            'p50_ms': round(percentile(timings, 0.50), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+            'mean_ms': round(statistics.mean(timings), 3),
+            'queries': max(queries),
+        }
+
+    def compare(self, baseline, current, threshold):
+        regressions = []
+        self.stdout.write('\nComparison with baseline (p95 / queries):')
+        for key, row in current.items():
+            old = baseline.get(key)
+            if old is None:
+                continue
+            slower = row['p95_ms'] > old['p95_ms'] * (1 + threshold)
+            more_queries = row['queries'] > old['queries']
+            flag = 'REGRESSION' if slower or more_queries else 'ok'
+            if flag != 'ok':
+                regressions.append(key)
+            self.stdout.write(
+                f"{key:<60} {old['p95_ms']:8.2f} -> {row['p95_ms']:8.2f}ms  "
+                f"{old['queries']} -> {row['queries']} queries  {flag}"
+            )
+        return regressions
@@ -0,0 +1,89 @@
+import json
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from inventory.fieldsets import ValuesSerializer, requested_fields
+from inventory.management.commands.bench_routes import largest_businesses
+from inventory.models import Business, Product, StockTransaction
+from inventory.renderers import dumps
+from inventory.serializers import ProductSerializer, StockTransactionSerializer
+from inventory.sharding import tenant
+
+
+DATASETS = {
+    'products': (ProductSerializer, lambda business: Product.objects.filter(business=business).order_by('id')),
+    'transactions': (StockTransactionSerializer, lambda business: StockTransaction.objects.filter(
+        business=business
+    ).select_related('product').order_by('-created_at', '-id')),
+}
+
+
+def serializer_path(queryset, serializer_class, fields):
+    """Model instances through the ModelSerializer and DRF's JSONRenderer: the list endpoints before."""
+    return JSONRenderer().render(serializer_class(list(queryset), many=True, fields=fields).data)
+
+
+def values_path(queryset, serializer_class, fields):
+    """values() rows built into dicts and encoded with orjson: the list endpoints now."""
+    values = ValuesSerializer(serializer_class, fields)
+    return dumps(values.rows(queryset.values(*values.lookups())))
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure rows/sec of the list endpoints' serialization, from query to JSON bytes: "
+        "model instances through ModelSerializer and JSONRenderer versus values() rows "
+        "and orjson, for all fields and for a ?fields= subset."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--business', type=int, help="Defaults to the business with the most products.")
+        parser.add_argument('--rows', type=int, default=5000, help="Rows per run.")
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--fields', default='id,quantity,created_at',
+                            help="The sparse fieldset for transactions; products use id,name,current_quantity.")
+        parser.add_argument('--output', '-o', help="Write results JSON here.")
+
+    def handle(self, *args, **options):
+        businesses = Business.objects.all()
+        if options['business']:
+            businesses = businesses.filter(id=options['business'])
+        business = next(iter(largest_businesses(businesses)), None)
+        if business is None:
+            raise CommandError("No business to benchmark; run seed_inventory first.")
+
+        sparse = {'products': 'id,name,current_quantity', 'transactions': options['fields']}
+        results = {}
+        with tenant(business.id):
+            for dataset, (serializer_class, query) in DATASETS.items():
+                queryset = query(business)[:options['rows']]
+                for label, value in (('all fields', ''), (f'fields={sparse[dataset]}', sparse[dataset])):
+                    fields = requested_fields(serializer_class, value)
+                    for path in (serializer_path, values_path):
+                        row = self.measure(path, queryset, serializer_class, fields, options['repeat'])
+                        results.setdefault(dataset, {}).setdefault(label, {})[path.__name__] = row
+                        self.stdout.write(
+                            f"{dataset:<13} {label:<40} {path.__name__:<16} {row['rows']:>6} rows  "
+                            f"{row['rows_per_sec']:>10,.0f} rows/s  {row['bytes']:>9} bytes"
+                        )
+                    before, after = (results[dataset][label][name]['rows_per_sec']
+                                     for name in ('serializer_path', 'values_path'))
+                    self.stdout.write(f"{'':<13} {label:<40} speedup {after / before:.1f}x")
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({'business_id': business.id, 'rows': options['rows'], 'results': results}, output, indent=2)
+
+    def measure(self, path, queryset, serializer_class, fields, repeat):
+        content = path(queryset.all(), serializer_class, fields)  # warm up
+        rows = len(json.loads(content))
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            path(queryset.all(), serializer_class, fields)
+            timings.append(time.perf_counter() - started)
+        best = statistics.median(timings)
+        return {'rows': rows, 'seconds': round(best, 4), 'rows_per_sec': round(rows / best), 'bytes': len(content)}
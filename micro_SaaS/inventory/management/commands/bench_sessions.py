@@ -0,0 +1,148 @@
+import json
+import logging
+import statistics
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from inventory.management.commands.bench_routes import largest_businesses, percentile
+from inventory.models import Business
+
+
+ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+
+PAGES = ['dashboard', 'product_list', 'transaction_list', 'business_list']
+
+
+class SessionQueries:
+    """execute_wrapper counting statements on django_session, split into reads and writes."""
+
+    def __init__(self):
+        self.reads = self.writes = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if 'django_session' in sql:
+            if sql.lstrip().upper().startswith('SELECT'):
+                self.reads += 1
+            else:
+                self.writes += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare session engines under concurrent HTML users: each thread logs in, "
+        "browses the dashboard and lists and now and then switches business. Reports "
+        "per-request latency percentiles, throughput and django_session reads/writes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owner', default='bench', help="Owner of the seeded businesses (see seed_inventory).")
+        parser.add_argument('--engines', default='db,cached_db,signed_cookies',
+                            help=f"Comma-separated, from: {', '.join(ENGINES)}.")
+        parser.add_argument('--users', type=int, default=8, help="Concurrent users (threads).")
+        parser.add_argument('--requests', type=int, default=60, help="Page views per user.")
+        parser.add_argument('--switch-every', type=int, default=10,
+                            help="Every Nth page view is a business switch; 0 for none.")
+        parser.add_argument('--output', '-o', help="Write results JSON here.")
+
+    def handle(self, *args, **options):
+        unknown = set(options['engines'].split(',')) - set(ENGINES)
+        if unknown:
+            raise CommandError(f"Unknown engine(s): {', '.join(sorted(unknown))}")
+        try:
+            owner = User.objects.get(username=options['owner'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user {options['owner']!r}; run seed_inventory first.")
+        businesses = [business.id for business in largest_businesses(Business.objects.filter(owner=owner), 2)]
+        if not businesses:
+            raise CommandError("The owner has no businesses; run seed_inventory first.")
+        logging.getLogger('inventory.queries').setLevel(logging.WARNING)
+
+        results = {}
+        for name in options['engines'].split(','):
+            with override_settings(SESSION_ENGINE=ENGINES[name]):
+                row = results[name] = self.run(owner, businesses, options)
+            self.stdout.write(
+                f"{name:<15} p50 {row['p50_ms']:7.2f}ms  p95 {row['p95_ms']:7.2f}ms  "
+                f"p99 {row['p99_ms']:7.2f}ms  {row['requests_per_sec']:8.1f} req/s  "
+                f"session reads {row['session_reads']:>5}  writes {row['session_writes']:>4}  "
+                f"errors {row['errors']}"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump({'users': options['users'], 'requests': options['requests'], 'engines': results},
+                          output, indent=2)
+
+    def run(self, owner, businesses, options):
+        timings = []
+        counters = []
+        errors = []
+        lock = threading.Lock()
+        start = threading.Barrier(options['users'])
+
+        def user(index):
+            client = Client(SERVER_NAME='localhost')
+            queries = SessionQueries()
+            own = []
+            try:
+                client.force_login(owner)
+                client.get(reverse('business-switch', args=[businesses[index % len(businesses)]]))
+                for page in PAGES:
+                    client.get(reverse(page))  # warm up
+                start.wait()
+                with connection.execute_wrapper(queries):
+                    for n in range(options['requests']):
+                        every = options['switch_every']
+                        if every and n % every == every - 1:
+                            # Alternates between the owner's two largest businesses.
+                            target = businesses[(index + 1 + n // every) % len(businesses)]
+                            url = reverse('business-switch', args=[target])
+                        else:
+                            url = reverse(PAGES[n % len(PAGES)])
+                        started = time.perf_counter()
+                        response = client.get(url)
+                        own.append((time.perf_counter() - started) * 1000)
+                        if response.status_code not in (200, 302):
+                            errors.append(f'{url}: {response.status_code}')
+                client.logout()
+            except Exception as error:
+                errors.append(repr(error))
+                start.abort()
+            finally:
+                connection.close()
+                with lock:
+                    timings.extend(own)
+                    counters.append(queries)
+
+        threads = [threading.Thread(target=user, args=(i,)) for i in range(options['users'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        if not timings:
+            raise CommandError(f"No requests completed: {errors[:3]}")
+
+        return {
+            'p50_ms': round(percentile(timings, 0.50), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+            'mean_ms': round(statistics.mean(timings), 3),
+            'requests_per_sec': round(len(timings) / elapsed, 1),
+            'session_reads': sum(counter.reads for counter in counters),
+            'session_writes': sum(counter.writes for counter in counters),
+            'errors': len(errors),
+        }
@@ -0,0 +1,96 @@
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from inventory.models import Business, Product, StockTransaction
+from inventory.services import apply_stock_transaction, InsufficientStock
+
+
+def legacy_write(product_id, transaction_type, quantity):
+    """The read-modify-write path the views used before the stock service."""
+    product = Product.objects.get(pk=product_id)
+    if transaction_type == 'In':
+        product.current_quantity += quantity
+    else:
+        product.current_quantity -= quantity
+    product.save()
+    StockTransaction.objects.create(product=product, type=transaction_type, quantity=quantity)
+
+
+def service_write(product_id, transaction_type, quantity):
+    product = Product.objects.get(pk=product_id)
+    apply_stock_transaction(
+        StockTransaction(product=product, type=transaction_type, quantity=quantity)
+    )
+
+
+class Command(BaseCommand):
+    help = "Benchmark concurrent stock writers: legacy read-modify-write vs. the atomic stock service."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--writes', type=int, default=200, help="Writes per thread.")
+        parser.add_argument('--start-quantity', type=int, default=1000000)
+
+    def handle(self, *args, **options):
+        user, _ = User.objects.get_or_create(username='bench_stock_writes')
+        business, _ = Business.objects.get_or_create(name='Stock write benchmark', owner=user)
+
+        try:
+            for label, writer in (('legacy', legacy_write), ('service', service_write)):
+                self.run(label, writer, business, options)
+        finally:
+            business.delete()
+            user.delete()
+
+    def run(self, label, writer, business, options):
+        start_quantity = options['start_quantity']
+        product = Product.objects.create(
+            business=business,
+            name=f'bench-{label}',
+            sku=f'BENCH{label.upper()}',
+            category='bench',
+            unit='pcs',
+            current_quantity=start_quantity,
+        )
+        errors = []
+
+        def worker(index):
+            try:
+                for n in range(options['writes']):
+                    transaction_type = 'In' if (index + n) % 2 else 'Out'
+                    try:
+                        writer(product.id, transaction_type, 1 + n % 3)
+                    except InsufficientStock:
+                        pass
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        product.refresh_from_db()
+        transactions = StockTransaction.objects.filter(product=product)
+        expected = start_quantity
+        for transaction_type, quantity in transactions.values_list('type', 'quantity'):
+            expected += quantity if transaction_type == 'In' else -quantity
+
+        count = transactions.count()
+        self.stdout.write(
+            f'{label:>8}: {count} writes in {elapsed:.2f}s '
+            f'({count / elapsed:.0f}/s), final={product.current_quantity} '
+            f'expected={expected} lost={expected - product.current_quantity} '
+            f'errors={len(errors)}'
+        )
+        for error in errors[:3]:
+            self.stderr.write(f'  {type(error).__name__}: {error}')
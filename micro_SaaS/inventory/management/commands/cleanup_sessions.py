@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from inventory.sessions import clear_expired, sweep_cache, uses_cache, uses_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired sessions from the configured session store: django_session rows "
+        "in batches, and expired entries of a file-based session cache. Schedule it "
+        "(e.g. daily from cron) in place of clearsessions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows deleted per statement.")
+        parser.add_argument(
+            '--all-stores', action='store_true',
+            help="Also clean stores the current engine does not use, e.g. rows left by a previous engine."
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Session engine: {settings.SESSION_ENGINE}')
+        if options['all_stores'] or uses_database():
+            deleted = clear_expired(options['batch_size'])
+            self.stdout.write(f'{deleted} expired session rows deleted')
+        if options['all_stores'] or uses_cache():
+            removed = sweep_cache()
+            self.stdout.write(f'{removed} expired session cache entries removed')
+        if not (options['all_stores'] or uses_database() or uses_cache()):
+            self.stdout.write('Nothing to clean: sessions are kept in signed cookies.')
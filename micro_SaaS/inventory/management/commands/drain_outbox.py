@@ -0,0 +1,93 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from inventory import outbox
+from inventory.sharding import shards
+from inventory.webhooks import ConnectionPool, deliver
+
+
+class Command(BaseCommand):
+    help = (
+        "Deliver queued stock events to each business's webhook, one coalesced call "
+        "per business per batch, retrying failures with backoff. Runs until stopped "
+        "unless --once is given; run a single instance."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain what is due now, then exit.")
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--interval', type=float, default=2.0, help="Seconds to sleep when idle.")
+        parser.add_argument('--concurrency', type=int, default=8, help="Webhook calls in flight.")
+        parser.add_argument('--timeout', type=float, default=5.0, help="Per-request timeout in seconds.")
+        parser.add_argument('--retries', type=int, default=2, help="Immediate retries per call before backing off.")
+        parser.add_argument('--max-attempts', type=int, default=outbox.MAX_ATTEMPTS)
+        parser.add_argument(
+            '--database', action='append', dest='databases',
+            help="Drain only this database; repeatable. Defaults to every shard."
+        )
+        parser.add_argument('--keep-days', type=int, help="Also delete events delivered more than this many days ago.")
+
+    def handle(self, *args, **options):
+        self.options = options
+        databases = options['databases'] or shards()
+        pool = ConnectionPool(size=options['concurrency'], timeout=options['timeout'])
+        try:
+            with ThreadPoolExecutor(options['concurrency']) as executor:
+                while True:
+                    handled = sum(self.drain(alias, pool, executor) for alias in databases)
+                    if options['once']:
+                        break
+                    if not handled:
+                        time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        finally:
+            pool.close()
+
+        if options['keep_days'] is not None:
+            cutoff = timezone.now() - timedelta(days=options['keep_days'])
+            pruned = sum(outbox.prune_delivered(alias, cutoff) for alias in databases)
+            self.stdout.write(f'{pruned} delivered events pruned')
+
+    def drain(self, alias, pool, executor):
+        """Deliver every due event on ``alias``, a batch at a time; returns how many were handled."""
+        handled = 0
+        while True:
+            events = outbox.claim(alias, self.options['batch_size'])
+            if not events:
+                return handled
+
+            by_business = {}
+            for event in events:
+                by_business.setdefault(event.business_id, []).append(event)
+
+            calls = {}
+            endpoints = outbox.active_endpoints(by_business)
+            for business_id, business_events in by_business.items():
+                endpoint = endpoints.get(business_id)
+                if endpoint is None:
+                    outbox.mark_failed(alias, business_events, 'No active webhook endpoint.', max_attempts=0)
+                    continue
+                delivery_id, body = outbox.build_delivery(business_id, business_events)
+                calls[business_id] = executor.submit(
+                    deliver, pool, endpoint.url, endpoint.secret, body, delivery_id, retries=self.options['retries']
+                )
+
+            # Only the HTTP calls run in threads; the outbox is updated from here.
+            delivered = failed = 0
+            for business_id, call in calls.items():
+                error = call.result()
+                if error is None:
+                    outbox.mark_delivered(alias, by_business[business_id])
+                    delivered += len(by_business[business_id])
+                else:
+                    outbox.mark_failed(alias, by_business[business_id], error, self.options['max_attempts'])
+                    failed += len(by_business[business_id])
+                    self.stderr.write(f'business {business_id}: {error}')
+
+            self.stdout.write(f'{alias}: {delivered} events delivered, {failed} to retry, {len(by_business)} businesses')
+            handled += len(events)
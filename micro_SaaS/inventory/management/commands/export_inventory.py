@@ -0,0 +1,36 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.exports import iter_export, EXPORT_FORMATS
+from inventory.models import Business
+from inventory.sharding import tenant
+
+
+class Command(BaseCommand):
+    help = "Stream a business's products or transaction ledger to a CSV/NDJSON file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('business_id', type=int)
+        parser.add_argument('dataset', choices=['products', 'transactions'])
+        parser.add_argument('--format', dest='export_format', choices=sorted(EXPORT_FORMATS), default='csv')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--output', '-o', help="File to write to. Defaults to stdout.")
+
+    def handle(self, *args, **options):
+        try:
+            business = Business.objects.get(id=options['business_id'])
+        except Business.DoesNotExist:
+            raise CommandError(f"Business {options['business_id']} does not exist")
+
+        with tenant(business.id):
+            chunks = iter_export(business, options['dataset'], options['export_format'], gzip=options['gzip'])
+
+        if options['output']:
+            with open(options['output'], 'wb') as output:
+                for chunk in chunks:
+                    output.write(chunk)
+        else:
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.forecasting import DEFAULTS, reorder_forecast
+from inventory.models import Business
+from inventory.sharding import tenant
+
+
+class Command(BaseCommand):
+    help = (
+        "Forecast daily consumption, days until stockout and reorder quantities for "
+        "every product of a business, and print the most urgent ones with timings."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('business_id', type=int)
+        parser.add_argument('--window-days', type=int, default=DEFAULTS['window_days'])
+        parser.add_argument('--lead-time-days', type=int, default=DEFAULTS['lead_time_days'])
+        parser.add_argument('--cover-days', type=int, default=DEFAULTS['cover_days'])
+        parser.add_argument('--service-level', type=float, default=DEFAULTS['service_level'])
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--needs-reorder', action='store_true', help="Only list products at their reorder point.")
+
+    def handle(self, *args, **options):
+        if not Business.objects.filter(id=options['business_id']).exists():
+            raise CommandError(f"Business {options['business_id']} does not exist.")
+
+        with tenant(options['business_id']):
+            report = reorder_forecast(
+                options['business_id'],
+                limit=options['limit'],
+                needs_reorder_only=options['needs_reorder'],
+                window_days=options['window_days'],
+                lead_time_days=options['lead_time_days'],
+                cover_days=options['cover_days'],
+                service_level=options['service_level'],
+            )
+
+        for row in report['results']:
+            days = '-' if row['days_until_stockout'] is None else f"{row['days_until_stockout']:.1f}"
+            self.stdout.write(
+                f"{row['sku']:<16} {row['name'][:30]:<30} on hand {row['current_quantity']:>7}  "
+                f"avg/day {row['avg_daily_out']:>8.2f}  days left {days:>7}  "
+                f"reorder point {row['reorder_point']:>8.1f}  order {row['suggested_quantity']:>6}"
+            )
+        timings = report['timings']
+        self.stdout.write(
+            f"{report['products']} products, {report['needs_reorder']} at or below their reorder point; "
+            f"extract {timings['extract_ms']:.1f}ms, compute {timings['compute_ms']:.1f}ms"
+        )
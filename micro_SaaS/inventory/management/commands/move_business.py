@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.models import Business
+from inventory.sharding import move_business, shards
+
+
+class Command(BaseCommand):
+    help = (
+        "Move a business's products, ledger and derived tables to another shard "
+        "(settings.INVENTORY_SHARDS or 'default'). Writes to its current shard "
+        "wait until the move finishes. Rows created on a shard later in the list get "
+        "new ids when moved to an earlier one. Other processes see the move through "
+        "the shared cache (INVENTORY_CACHE_DIR); with a per-process cache, restart them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('business_id', type=int)
+        parser.add_argument('shard', help="Target database alias.")
+
+    def handle(self, *args, **options):
+        try:
+            business = Business.objects.get(id=options['business_id'])
+        except Business.DoesNotExist:
+            raise CommandError(f"Business {options['business_id']} does not exist.")
+        if options['shard'] not in shards():
+            raise CommandError(f"Unknown shard {options['shard']!r}; expected one of {', '.join(shards())}.")
+        if options['shard'] == business.shard:
+            self.stdout.write(f'business {business.id} is already on {business.shard}')
+            return
+
+        source = business.shard
+        started = time.perf_counter()
+        copied = move_business(business, options['shard'], stdout=self.stdout)
+        self.stdout.write(
+            f'business {business.id}: moved {sum(copied.values())} rows from {source} to '
+            f'{business.shard} in {time.perf_counter() - started:.1f}s'
+        )
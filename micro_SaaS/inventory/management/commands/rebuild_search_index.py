@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.search import install
+
+
+class Command(BaseCommand):
+    help = "Recreate the product full-text search index and repopulate it from inventory_product."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        if not install(using=options['database'], rebuild=True):
+            raise CommandError("Full-text search needs SQLite with FTS5; searches will use icontains.")
+        self.stdout.write("Product search index rebuilt.")
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from inventory.models import Business
+from inventory.facets import rebuild_facets
+from inventory.sharding import tenant
+from inventory.summary import rebuild_summary
+
+
+class Command(BaseCommand):
+    help = "Recompute business dashboard summaries and category facets from their products."
+
+    def add_arguments(self, parser):
+        parser.add_argument('business_ids', nargs='*', type=int, help="Defaults to every business.")
+
+    def handle(self, *args, **options):
+        businesses = Business.objects.order_by('id')
+        if options['business_ids']:
+            businesses = businesses.filter(id__in=options['business_ids'])
+
+        for business_id in businesses.values_list('id', flat=True).iterator():
+            with tenant(business_id) as using, transaction.atomic(using=using):
+                summary = rebuild_summary(business_id)
+                rebuild_facets(business_id)
+            self.stdout.write(
+                f'business {business_id}: {summary.total_products} products, '
+                f'{summary.total_units} units, {summary.low_stock_count} low, '
+                f'{summary.out_of_stock_count} out of stock'
+            )
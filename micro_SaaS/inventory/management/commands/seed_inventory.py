@@ -0,0 +1,179 @@
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from inventory.facets import rebuild_facets
+from inventory.models import Business, Product, StockSnapshot, StockTransaction
+from inventory.rollups import rebuild_movements
+from inventory.sharding import tenant
+from inventory.snapshots import take_snapshots
+from inventory.summary import rebuild_summary
+
+
+CATEGORIES = [
+    'Electronics', 'Furniture', 'Hardware', 'Plumbing', 'Electrical', 'Office',
+    'Cleaning', 'Packaging', 'Safety', 'Garden', 'Automotive', 'Kitchen',
+]
+WORDS = [
+    'steel', 'copper', 'bolt', 'washer', 'bracket', 'hinge', 'valve', 'filter',
+    'cable', 'relay', 'switch', 'sensor', 'panel', 'gasket', 'spring', 'clamp',
+    'chair', 'desk', 'shelf', 'lamp', 'tape', 'glove', 'drill', 'blade',
+]
+SUPPLIERS = ['Acme', 'Globex', 'Initech', 'Umbrella', 'Hooli', 'Vandelay', 'Stark', 'Wayne', '']
+UNITS = ['pcs', 'box', 'kg', 'm', 'pack']
+
+BATCH_SIZE = 5000
+
+
+@contextmanager
+def keep_created_at():
+    """Let bulk_create store our historical created_at instead of now()."""
+    field = StockTransaction._meta.get_field('created_at')
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+def skewed_split(rng, total, parts, alpha):
+    """Split ``total`` into ``parts`` Pareto-weighted shares (a few large, many small)."""
+    weights = [rng.paretovariate(alpha) for _ in range(parts)]
+    scale = total / sum(weights)
+    shares = [int(weight * scale) for weight in weights]
+    shares[0] += total - sum(shares)
+    return shares
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed businesses, products and a transaction history with realistic skew: "
+        "a few large tenants, a Zipf-like hot set of products and a growing ledger. "
+        "Also builds the summaries, facets, daily rollups and stock snapshots the "
+        "read endpoints serve from."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--businesses', type=int, default=5)
+        parser.add_argument('--products', type=int, default=10000, help="Total across all businesses.")
+        parser.add_argument('--transactions', type=int, default=200000, help="Total across all businesses.")
+        parser.add_argument('--days', type=int, default=365, help="History length.")
+        parser.add_argument('--snapshot-days', type=int, default=30,
+                            help="Snapshot every product this often through the history; 0 for only today.")
+        parser.add_argument('--owner', default='bench', help="Username that owns the seeded businesses.")
+        parser.add_argument('--password', default='bench-pass-123')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        owner, created = User.objects.get_or_create(username=options['owner'])
+        if created:
+            owner.set_password(options['password'])
+            owner.save()
+
+        business_count = options['businesses']
+        product_shares = skewed_split(rng, options['products'], business_count, 1.2)
+        transaction_shares = skewed_split(rng, options['transactions'], business_count, 1.2)
+
+        for index in range(business_count):
+            business = Business.objects.create(
+                name=f'Seeded business {Business.objects.filter(owner=owner).count() + 1}',
+                address=f'{rng.randint(1, 999)} Market St',
+                owner=owner,
+            )
+            with tenant(business.id) as using:
+                products = self.seed_products(rng, business, max(1, product_shares[index]))
+                snapshots = self.seed_transactions(
+                    rng, business, products, transaction_shares[index], options['days'], options['snapshot_days']
+                )
+                with transaction.atomic(using=using):
+                    rebuild_summary(business.id)
+                    rebuild_facets(business.id)
+                rollups = rebuild_movements(business.id)
+                snapshots += take_snapshots(business.id)
+            self.stdout.write(
+                f'business {business.id}: {len(products)} products, '
+                f'{transaction_shares[index]} transactions, {rollups} daily rollups, {snapshots} snapshots'
+            )
+
+    def seed_products(self, rng, business, count):
+        batch = []
+        for n in range(count):
+            reorder_level = rng.choice([0, 5, 10, 20, 50])
+            batch.append(Product(
+                business=business,
+                name=f'{rng.choice(WORDS).title()} {rng.choice(WORDS)} {n}',
+                sku=f'B{business.id}P{n:07d}',
+                category=rng.choice(CATEGORIES),
+                reorder_level=reorder_level,
+                reorder_shortfall=reorder_level,
+                unit=rng.choice(UNITS),
+                supplier_name=rng.choice(SUPPLIERS),
+            ))
+        return Product.objects.bulk_create(batch, batch_size=BATCH_SIZE)
+
+    def seed_transactions(self, rng, business, products, count, days, snapshot_days):
+        """Write the ledger and return how many historical snapshot rows were taken along the way."""
+        # Zipf-like popularity: product k is picked with weight 1 / (k + 1).
+        order = list(products)
+        rng.shuffle(order)
+        weights = [1 / (rank + 1) for rank in range(len(order))]
+        balances = {product.pk: 0 for product in products}
+
+        start = timezone.now() - timedelta(days=days)
+        step = timedelta(days=days) / max(count, 1)
+        picks = rng.choices(order, weights=weights, k=count)
+
+        snapshot_step = timedelta(days=snapshot_days) if snapshot_days > 0 else None
+        next_snapshot = start + snapshot_step if snapshot_step else None
+        last_id = 0
+        snapshots = 0
+
+        batch = []
+        with keep_created_at():
+            for n, product in enumerate(picks):
+                created_at = start + step * n
+                while next_snapshot is not None and created_at >= next_snapshot:
+                    # Balances so far are the quantities on hand at next_snapshot.
+                    if batch:
+                        last_id = StockTransaction.objects.bulk_create(batch)[-1].id
+                        batch = []
+                    snapshots += self.snapshot(business, balances, next_snapshot, last_id)
+                    next_snapshot += snapshot_step
+                balance = balances[product.pk]
+                # Mostly outbound movements, restocked in larger lots.
+                if balance < 5 or rng.random() < 0.25:
+                    transaction_type, quantity = 'In', rng.randint(10, 200)
+                    balances[product.pk] = balance + quantity
+                else:
+                    transaction_type, quantity = 'Out', rng.randint(1, min(balance, 20))
+                    balances[product.pk] = balance - quantity
+                batch.append(StockTransaction(
+                    product=product, business_id=product.business_id, type=transaction_type,
+                    quantity=quantity, created_at=created_at
+                ))
+                if len(batch) == BATCH_SIZE:
+                    last_id = StockTransaction.objects.bulk_create(batch)[-1].id
+                    batch = []
+            StockTransaction.objects.bulk_create(batch)
+
+        for product in products:
+            product.current_quantity = balances[product.pk]
+            product.reorder_shortfall = product.reorder_level - product.current_quantity
+        Product.objects.bulk_update(products, ['current_quantity', 'reorder_shortfall'], batch_size=BATCH_SIZE)
+        return snapshots
+
+    def snapshot(self, business, balances, taken_at, last_transaction_id):
+        StockSnapshot.objects.bulk_create([
+            StockSnapshot(
+                business=business, product_id=product_id, taken_at=taken_at,
+                last_transaction_id=last_transaction_id, quantity=quantity,
+            )
+            for product_id, quantity in balances.items()
+        ], batch_size=BATCH_SIZE)
+        return len(balances)
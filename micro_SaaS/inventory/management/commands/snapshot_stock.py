@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from inventory.models import Business
+from inventory.sharding import tenant
+from inventory.snapshots import prune_snapshots, take_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        "Snapshot every product's quantity on hand, so point-in-time stock only "
+        "replays the ledger since the last snapshot. Run periodically, e.g. daily."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('business_ids', nargs='*', type=int, help="Defaults to every business.")
+        parser.add_argument(
+            '--keep-days', type=int,
+            help="Also delete snapshots older than this many days (the latest is always kept)."
+        )
+
+    def handle(self, *args, **options):
+        businesses = Business.objects.order_by('id')
+        if options['business_ids']:
+            businesses = businesses.filter(id__in=options['business_ids'])
+
+        for business_id in businesses.values_list('id', flat=True).iterator():
+            with tenant(business_id):
+                written = take_snapshots(business_id)
+                message = f'business {business_id}: {written} products snapshotted'
+                if options['keep_days'] is not None:
+                    cutoff = timezone.now() - timedelta(days=options['keep_days'])
+                    message += f', {prune_snapshots(business_id, cutoff)} old snapshots pruned'
+            self.stdout.write(message)
@@ -0,0 +1,34 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.routing import copy_database
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary database over the read replica file "
+        "(settings.INVENTORY_REPLICA_PATH). Run with --interval to keep it in sync."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', help="Replica file; defaults to settings.INVENTORY_REPLICA_PATH.")
+        parser.add_argument(
+            '--interval', type=float,
+            help="Keep copying, waiting this many seconds between copies. "
+                 "Keep it below INVENTORY_REPLICA_PIN_SECONDS."
+        )
+
+    def handle(self, *args, **options):
+        target = options['target'] or settings.INVENTORY_REPLICA_PATH
+        if not target:
+            raise CommandError("No replica configured; set INVENTORY_REPLICA_DB or pass --target.")
+
+        while True:
+            started = time.perf_counter()
+            copy_database(target)
+            self.stdout.write(f'replica {target} synced in {(time.perf_counter() - started) * 1000:.0f}ms')
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
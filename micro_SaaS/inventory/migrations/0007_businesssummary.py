@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_stocktransaction_created_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BusinessSummary',
+            fields=[
+                ('business', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='inventory.business')),
+                ('total_products', models.IntegerField(default=0)),
+                ('total_units', models.BigIntegerField(default=0)),
+                ('low_stock_count', models.IntegerField(default=0)),
+                ('out_of_stock_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
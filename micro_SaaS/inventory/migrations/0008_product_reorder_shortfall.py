@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:39
+
+from django.db import migrations, models
+import django.db.models.expressions
+
+
+def backfill_reorder_shortfall(apps, schema_editor):
+    Product = apps.get_model('inventory', 'Product')
+    Product.objects.using(schema_editor.connection.alias).update(reorder_shortfall=models.F('reorder_level') - models.F('current_quantity'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_businesssummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='reorder_shortfall',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_reorder_shortfall, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['business', 'reorder_shortfall'], name='product_business_shortfall_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='product',
+            constraint=models.CheckConstraint(check=models.Q(('reorder_shortfall', django.db.models.expressions.CombinedExpression(models.F('reorder_level'), '-', models.F('current_quantity')))), name='product_reorder_shortfall_in_sync'),
+        ),
+    ]
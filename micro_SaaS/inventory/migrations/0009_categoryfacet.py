@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_category_facets(apps, schema_editor):
+    Product = apps.get_model('inventory', 'Product')
+    CategoryFacet = apps.get_model('inventory', 'CategoryFacet')
+    db_alias = schema_editor.connection.alias
+    rows = Product.objects.using(db_alias).values('business_id', 'category').annotate(
+        product_count=models.Count('id'),
+        low_stock_count=models.Count('id', filter=models.Q(reorder_shortfall__gte=0)),
+    )
+    CategoryFacet.objects.using(db_alias).bulk_create([CategoryFacet(**row) for row in rows], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_product_reorder_shortfall'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CategoryFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('category', models.CharField(max_length=100)),
+                ('product_count', models.IntegerField(default=0)),
+                ('low_stock_count', models.IntegerField(default=0)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='category_facets', to='inventory.business')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='categoryfacet',
+            constraint=models.UniqueConstraint(fields=('business', 'category'), name='unique_category_facet_per_business'),
+        ),
+        migrations.RunPython(backfill_category_facets, migrations.RunPython.noop),
+    ]
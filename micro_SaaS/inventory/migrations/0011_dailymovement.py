@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 16:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0010_stocksnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('units_in', models.BigIntegerField(default=0)),
+                ('units_out', models.BigIntegerField(default=0)),
+                ('transaction_count', models.IntegerField(default=0)),
+                ('business', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_movements', to='inventory.business')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_movements', to='inventory.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['business', 'day'], name='movement_business_day_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailymovement',
+            constraint=models.UniqueConstraint(fields=('product', 'day'), name='unique_daily_movement_per_product'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0011_dailymovement'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='dailymovement',
+            name='movement_business_day_idx',
+        ),
+        migrations.AddIndex(
+            model_name='dailymovement',
+            index=models.Index(fields=['business', 'day', 'product', 'units_in', 'units_out', 'transaction_count'], name='movement_business_cover_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0012_dailymovement_covering_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='businesssummary',
+            name='version',
+            field=models.BigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0013_businesssummary_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='business',
+            name='shard',
+            field=models.CharField(default='default', max_length=50),
+        ),
+    ]
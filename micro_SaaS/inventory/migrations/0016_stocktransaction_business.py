@@ -0,0 +1,56 @@
+# Generated by Django 4.2.30 on 2026-10-18 19:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+BATCH_SIZE = 5000
+
+
+def backfill_business(apps, schema_editor):
+    """Copy product.business into the ledger in id-ordered chunks, each committed on its own."""
+    Product = apps.get_model('inventory', 'Product')
+    StockTransaction = apps.get_model('inventory', 'StockTransaction')
+    ledger = StockTransaction.objects.using(schema_editor.connection.alias)
+    business = models.Subquery(
+        Product.objects.filter(pk=models.OuterRef('product_id')).values('business_id')[:1]
+    )
+
+    last = 0
+    while True:
+        ids = list(ledger.filter(id__gt=last).order_by('id').values_list('id', flat=True)[:BATCH_SIZE])
+        if not ids:
+            break
+        ledger.filter(id__gte=ids[0], id__lte=ids[-1], business__isnull=True).update(business_id=business)
+        last = ids[-1]
+
+
+class Migration(migrations.Migration):
+    # Not atomic, so the backfill holds the write lock one chunk at a time.
+    atomic = False
+
+    dependencies = [
+        ('inventory', '0015_webhook_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stocktransaction',
+            name='business',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='transactions', to='inventory.business'),
+        ),
+        migrations.RunPython(backfill_business, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='stocktransaction',
+            name='business',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='transactions', to='inventory.business'),
+        ),
+        migrations.AddIndex(
+            model_name='stocktransaction',
+            index=models.Index(fields=['business', 'created_at', 'id'], name='stocktxn_business_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='stocktransaction',
+            index=models.Index(fields=['business', 'type', 'created_at', 'id'], name='stocktxn_business_type_idx'),
+        ),
+    ]
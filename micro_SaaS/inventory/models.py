@@ -1,6 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.core.validators import RegexValidator
+from django.utils import timezone
 
 
 # Create your models here.
@@ -14,6 +15,8 @@ class Business(models.Model):
         on_delete=models.CASCADE,
         related_name="business"
     )
+    # Database alias holding this business's products and ledger (inventory.sharding).
+    shard = models.CharField(max_length=50, default='default')
 
     class Meta: 
         constraints = [
@@ -26,6 +29,25 @@ class Business(models.Model):
     def __str__(self):
         return f"name: {self.name} created at: {self.created_at}"
 
+class BusinessSummary(models.Model):
+    """Dashboard totals for a business, kept current by inventory.services."""
+    business = models.OneToOneField(
+        Business,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="summary"
+    )
+    total_products = models.IntegerField(default=0)
+    total_units = models.BigIntegerField(default=0)
+    low_stock_count = models.IntegerField(default=0)
+    out_of_stock_count = models.IntegerField(default=0)
+    # Bumped with every product or stock write; drives API ETags (see inventory.conditional).
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"business: {self.business_id} products: {self.total_products} units: {self.total_units}"
+
 alphaNumericValidator = RegexValidator(
     r'^[a-zA-Z0-9]+$',
     message="Only letters and numbers allowed"
@@ -47,11 +69,27 @@ class Product(models.Model):
     reorder_level = models.PositiveIntegerField(default=0)
     unit = models.CharField(max_length=100)
     supplier_name = models.CharField(max_length=100, blank=True)
+    # reorder_level - current_quantity, stored so low stock (>= 0) can be
+    # found and ranked through an index. Bulk updates must adjust it too.
+    reorder_shortfall = models.IntegerField(default=0, editable=False)
 
     def __str__(self):
         return f"name: {self.name} current quantity: {self.current_quantity} category: {self.category}"
+
+    def save(self, *args, **kwargs):
+        self.reorder_shortfall = self.reorder_level - self.current_quantity
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and {"current_quantity", "reorder_level"} & set(update_fields):
+            kwargs["update_fields"] = {*update_fields, "reorder_shortfall"}
+        super().save(*args, **kwargs)
     
     class Meta:
+        indexes = [
+            models.Index(
+                fields=["business", "reorder_shortfall"],
+                name="product_business_shortfall_idx"
+            )
+        ]
         constraints = [
             models.UniqueConstraint(
                 fields= ["business", "name"],
@@ -61,15 +99,50 @@ class Product(models.Model):
             models.UniqueConstraint(
                 fields= ["business", "sku"],
                 name = "unique_sku_per_business"
+            ),
+
+            models.CheckConstraint(
+                check=models.Q(reorder_shortfall=models.F("reorder_level") - models.F("current_quantity")),
+                name="product_reorder_shortfall_in_sync"
+            )
+        ]
+
+class CategoryFacet(models.Model):
+    """Product counts per category for a business, kept current by inventory.services."""
+    business = models.ForeignKey(
+        Business,
+        on_delete=models.CASCADE,
+        related_name="category_facets"
+    )
+    category = models.CharField(max_length=100)
+    product_count = models.IntegerField(default=0)
+    low_stock_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["business", "category"],
+                name="unique_category_facet_per_business"
             )
         ]
 
+    def __str__(self):
+        return f"business: {self.business_id} category: {self.category} products: {self.product_count}"
+
 class StockTransaction(models.Model):
     product = models.ForeignKey(
         Product,
         on_delete=models.CASCADE,
         related_name="transactions"
     )
+    # Copied from product.business on save, so ledger queries filter on
+    # an index instead of joining products. bulk_create callers set it.
+    business = models.ForeignKey(
+        Business,
+        on_delete=models.CASCADE,
+        related_name="transactions",
+        editable=False
+    )
 
     class InOutChoices(models.TextChoices):
         IN = "In"
@@ -82,8 +155,153 @@ class StockTransaction(models.Model):
     quantity = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["created_at", "id"],
+                name="stocktxn_created_id_idx"
+            ),
+            models.Index(
+                fields=["product", "created_at"],
+                name="stocktxn_product_created_idx"
+            ),
+            models.Index(
+                fields=["business", "created_at", "id"],
+                name="stocktxn_business_created_idx"
+            ),
+            models.Index(
+                fields=["business", "type", "created_at", "id"],
+                name="stocktxn_business_type_idx"
+            )
+        ]
+
     def __str__(self):
         return f"product: {self.product} type: {self.type} quantity: {self.quantity}"
 
+    def save(self, *args, **kwargs):
+        if self.business_id is None:
+            self.business_id = self.product.business_id
+        super().save(*args, **kwargs)
+
+class DailyMovement(models.Model):
+    """Units moved in and out of a product per day, kept current by inventory.services."""
+    business = models.ForeignKey(
+        Business,
+        on_delete=models.CASCADE,
+        related_name="daily_movements"
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="daily_movements"
+    )
+    day = models.DateField()
+    units_in = models.BigIntegerField(default=0)
+    units_out = models.BigIntegerField(default=0)
+    transaction_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "day"],
+                name="unique_daily_movement_per_product"
+            )
+        ]
+        indexes = [
+            # Covers the trend and forecast reads, which then never touch the table.
+            models.Index(
+                fields=["business", "day", "product", "units_in", "units_out", "transaction_count"],
+                name="movement_business_cover_idx"
+            )
+        ]
+
+    def __str__(self):
+        return f"product: {self.product_id} day: {self.day} in: {self.units_in} out: {self.units_out}"
+
+class StockSnapshot(models.Model):
+    """
+    A product's quantity on hand when a snapshot batch was taken; see
+    inventory.snapshots. Every transaction of the business with an id up to
+    last_transaction_id is already counted in quantity.
+    """
+    business = models.ForeignKey(
+        Business,
+        on_delete=models.CASCADE,
+        related_name="stock_snapshots"
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="snapshots"
+    )
+    taken_at = models.DateTimeField()
+    last_transaction_id = models.BigIntegerField(default=0)
+    quantity = models.PositiveIntegerField(default=0)
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["product", "taken_at"],
+                name="snapshot_product_taken_idx"
+            ),
+            models.Index(
+                fields=["business", "taken_at"],
+                name="snapshot_business_taken_idx"
+            )
+        ]
 
+    def __str__(self):
+        return f"product: {self.product_id} quantity: {self.quantity} at: {self.taken_at}"
+
+class WebhookEndpoint(models.Model):
+    """Where a business's stock events are delivered; see inventory.outbox."""
+    business = models.OneToOneField(
+        Business,
+        on_delete=models.CASCADE,
+        related_name="webhook"
+    )
+    url = models.URLField()
+    # Signs each delivery: X-Inventory-Signature is sha256=<HMAC of the body>.
+    secret = models.CharField(max_length=100)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"business: {self.business_id} url: {self.url}"
+
+class OutboxEvent(models.Model):
+    """
+    A stock event awaiting webhook delivery, written in the same transaction
+    as the StockTransaction it describes and drained by the drain_outbox
+    command.
+    """
+    business = models.ForeignKey(
+        Business,
+        on_delete=models.CASCADE,
+        related_name="outbox_events"
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name="outbox_events"
+    )
+    payload = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    failed_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            # Only undelivered events are indexed, so the queue stays small however long history grows.
+            models.Index(
+                fields=["next_attempt_at", "id"],
+                name="outbox_pending_idx",
+                condition=models.Q(delivered_at__isnull=True, failed_at__isnull=True)
+            )
+        ]
+
+    def __str__(self):
+        return f"product: {self.product_id} attempts: {self.attempts} delivered: {self.delivered_at}"
@@ -0,0 +1,187 @@
+"""
+Transactional outbox for stock events.
+
+Each stock transaction of a business with an active WebhookEndpoint writes
+an OutboxEvent in the same database transaction, so an event exists
+exactly when its transaction committed and requests never wait on the
+receiver. The drain_outbox command delivers them in the background:
+
+* claim() takes a batch of due events and leases them by pushing
+  next_attempt_at forward, so a worker that dies mid-batch only delays
+  them; run a single worker per database.
+* coalesce() folds a business's events into one entry per product, and
+  each business gets a single signed webhook call per batch.
+* A failed call is retried with exponential backoff and jitter, until
+  MAX_ATTEMPTS marks the events failed.
+"""
+import hashlib
+import json
+import random
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import OutboxEvent, StockTransaction, WebhookEndpoint
+
+
+# Seconds another process may go on using a business's endpoint, or its
+# lack of one, after it is added, edited or deactivated. The drain worker
+# does not use the cache at all (see active_endpoints()).
+CACHE_TIMEOUT = 5
+LEASE = timedelta(minutes=5)
+BACKOFF_BASE = timedelta(seconds=30)
+BACKOFF_CAP = timedelta(hours=1)
+MAX_ATTEMPTS = 8
+
+
+def endpoint_key(business_id):
+    return f'inventory:webhook:{business_id}'
+
+
+def endpoint_for(business_id):
+    """
+    The business's active WebhookEndpoint or ``None``, cached either way
+    for CACHE_TIMEOUT seconds; saving an endpoint invalidates it at once
+    in this process.
+    """
+    endpoint = cache.get(endpoint_key(business_id))
+    if endpoint is None:
+        endpoint = WebhookEndpoint.objects.filter(business_id=business_id, is_active=True).first() or False
+        cache.set(endpoint_key(business_id), endpoint, CACHE_TIMEOUT)
+    return endpoint or None
+
+
+def active_endpoints(business_ids):
+    """
+    ``{business id: active WebhookEndpoint}``, read from the database so a
+    delivery always uses the current URL and secret.
+    """
+    return {
+        endpoint.business_id: endpoint
+        for endpoint in WebhookEndpoint.objects.filter(business_id__in=business_ids, is_active=True)
+    }
+
+
+def invalidate_endpoint(sender, instance, **kwargs):
+    """post_save/post_delete receiver for WebhookEndpoint."""
+    key = endpoint_key(instance.business_id)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
+
+
+def enqueue_stock_events(business_id, events):
+    """
+    Queue one event per saved StockTransaction, inside the transaction that
+    wrote them. ``events`` is a list of ``(stock_transaction,
+    quantity_after, reorder_level)``. Nothing is written for a business
+    without an active endpoint.
+    """
+    if not events or endpoint_for(business_id) is None:
+        return []
+    return OutboxEvent.objects.bulk_create([
+        OutboxEvent(business_id=business_id, product_id=stock_transaction.product_id, payload={
+            'transaction': stock_transaction.id,
+            'type': stock_transaction.type,
+            'quantity': stock_transaction.quantity,
+            'created_at': stock_transaction.created_at.isoformat(),
+            'quantity_after': quantity_after,
+            'reorder_level': reorder_level,
+        })
+        for stock_transaction, quantity_after, reorder_level in events
+    ])
+
+
+def claim(using, batch_size, now=None):
+    """Lease and return up to ``batch_size`` due events from database ``using``, oldest first."""
+    now = now or timezone.now()
+    with transaction.atomic(using=using):
+        events = list(OutboxEvent.objects.using(using).filter(
+            delivered_at__isnull=True, failed_at__isnull=True, next_attempt_at__lte=now
+        ).order_by('next_attempt_at', 'id')[:batch_size])
+        OutboxEvent.objects.using(using).filter(id__in=[event.id for event in events]).update(
+            next_attempt_at=now + LEASE
+        )
+    return events
+
+
+def coalesce(events):
+    """
+    One entry per product from a business's events: net units in and out,
+    the first and last transaction, and the stock level after the last.
+    """
+    products = {}
+    for event in sorted(events, key=lambda event: event.payload['transaction']):
+        payload = event.payload
+        entry = products.get(event.product_id)
+        if entry is None:
+            entry = products[event.product_id] = {
+                'product': event.product_id,
+                'units_in': 0,
+                'units_out': 0,
+                'transactions': 0,
+                'first_transaction': payload['transaction'],
+                'first_at': payload['created_at'],
+                'quantity_before': payload['quantity_after'] + (
+                    payload['quantity'] if payload['type'] == StockTransaction.InOutChoices.OUT else -payload['quantity']
+                ),
+            }
+        if payload['type'] == StockTransaction.InOutChoices.IN:
+            entry['units_in'] += payload['quantity']
+        else:
+            entry['units_out'] += payload['quantity']
+        entry['transactions'] += 1
+        entry['last_transaction'] = payload['transaction']
+        entry['last_at'] = payload['created_at']
+        entry['quantity'] = payload['quantity_after']
+        entry['reorder_level'] = payload['reorder_level']
+
+    for entry in products.values():
+        before = entry.pop('quantity_before')
+        entry['low_stock'] = entry['quantity'] <= entry['reorder_level']
+        entry['crossed_reorder_level'] = entry['low_stock'] and before > entry['reorder_level']
+        entry['event'] = 'stock.low' if entry['crossed_reorder_level'] else 'stock.movement'
+    return list(products.values())
+
+
+def build_delivery(business_id, events):
+    """``(delivery id, JSON body)`` for one business's events; retries of the same events reuse the id."""
+    ids = sorted(event.id for event in events)
+    delivery_id = hashlib.sha256(','.join(map(str, ids)).encode()).hexdigest()[:32]
+    body = json.dumps({
+        'delivery': delivery_id,
+        'business': business_id,
+        'products': coalesce(events),
+    }, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+    return delivery_id, body
+
+
+def backoff(attempts):
+    """The wait before retry number ``attempts``, with up to 50% jitter."""
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_CAP)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def mark_delivered(using, events, now=None):
+    OutboxEvent.objects.using(using).filter(id__in=[event.id for event in events]).update(
+        delivered_at=now or timezone.now(), last_error=''
+    )
+
+
+def mark_failed(using, events, error, max_attempts=MAX_ATTEMPTS, now=None):
+    """Schedule a retry for ``events``; those out of attempts are marked failed instead."""
+    now = now or timezone.now()
+    attempts = max(event.attempts for event in events) + 1
+    rows = OutboxEvent.objects.using(using).filter(id__in=[event.id for event in events])
+    with transaction.atomic(using=using):
+        rows.update(attempts=F('attempts') + 1, next_attempt_at=now + backoff(attempts), last_error=error)
+        rows.filter(attempts__gte=max_attempts).update(failed_at=now)
+
+
+def prune_delivered(using, before):
+    """Delete events delivered before ``before``; returns how many."""
+    deleted, _ = OutboxEvent.objects.using(using).filter(delivered_at__lt=before).delete()
+    return deleted
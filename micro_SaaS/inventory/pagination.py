@@ -0,0 +1,196 @@
+import base64
+import json
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+from django.utils.functional import SimpleLazyObject
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_cursor(values, reverse=False):
+    payload = json.dumps({'v': values, 'r': int(reverse)}, default=str)
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """Return ``(values, reverse)`` or raise ValueError for a malformed cursor."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return list(payload['v']), bool(payload['r'])
+    except (TypeError, KeyError, ValueError) as error:
+        raise ValueError('Invalid cursor') from error
+
+
+class KeysetPage:
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def paginate_keyset(queryset, ordering, cursor=None, page_size=50):
+    """
+    Return one KeysetPage of ``queryset`` ordered by ``ordering``.
+
+    ``ordering`` is a tuple of field names that together are unique and
+    share one direction, e.g. ('-created_at', '-id'). Pages seek past the
+    last row seen with a WHERE clause instead of an OFFSET, so every page
+    costs the same as the first as long as an index covers the ordering.
+    """
+    window, fields, reverse = _keyset_window(queryset, ordering, cursor, page_size)
+    return _keyset_page(list(window), fields, cursor, reverse, page_size)
+
+
+def lazy_keyset(queryset, ordering, cursor=None, page_size=50):
+    """
+    paginate_keyset() that checks the cursor now but runs the page query
+    only once the page is used, e.g. not at all when a cached fragment
+    stands in for it.
+    """
+    window, fields, reverse = _keyset_window(queryset, ordering, cursor, page_size)
+    return SimpleLazyObject(lambda: _keyset_page(list(window), fields, cursor, reverse, page_size))
+
+
+async def apaginate_keyset(queryset, ordering, cursor=None, page_size=50):
+    """paginate_keyset() for async views."""
+    window, fields, reverse = _keyset_window(queryset, ordering, cursor, page_size)
+    return _keyset_page([row async for row in window], fields, cursor, reverse, page_size)
+
+
+def _keyset_window(queryset, ordering, cursor, page_size):
+    """The unevaluated page query (one row extra, to detect more), its fields and direction."""
+    descending = ordering[0].startswith('-')
+    fields = [name.lstrip('-') for name in ordering]
+    model_fields = [queryset.model._meta.get_field(name) for name in fields]
+
+    values, reverse = None, False
+    if cursor:
+        values, reverse = decode_cursor(cursor)
+        if len(values) != len(fields):
+            raise ValueError('Invalid cursor')
+        try:
+            values = [field.to_python(value) for field, value in zip(model_fields, values)]
+        except Exception as error:
+            raise ValueError('Invalid cursor') from error
+
+    # Walking backwards flips both the comparison and the sort.
+    ascending = descending == reverse
+    if values is not None:
+        lookup = 'gt' if ascending else 'lt'
+        # (a, b) < (x, y)  <=>  a < x OR (a = x AND b < y)
+        seek = reduce(or_, [
+            Q(**{name: value for name, value in zip(fields[:i], values[:i])},
+              **{f'{fields[i]}__{lookup}': values[i]})
+            for i in range(len(fields))
+        ])
+        queryset = queryset.filter(seek)
+
+    order = [name if ascending else f'-{name}' for name in fields]
+    return queryset.order_by(*order)[:page_size + 1], fields, reverse
+
+
+def _keyset_page(rows, fields, cursor, reverse, page_size):
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if reverse:
+        rows.reverse()
+
+    def position(row):
+        # values() pages hold dicts.
+        if isinstance(row, dict):
+            return [row[name] for name in fields]
+        return [getattr(row, name) for name in fields]
+
+    next_cursor = previous_cursor = None
+    if rows:
+        if has_more or reverse:
+            next_cursor = encode_cursor(position(rows[-1]))
+        if (has_more and reverse) or (cursor and not reverse):
+            previous_cursor = encode_cursor(position(rows[0]), reverse=True)
+
+    return KeysetPage(rows, next_cursor, previous_cursor)
+
+
+def page_links(request, page, param='cursor'):
+    """Absolute-path next/previous links that keep the other query parameters."""
+    url = request.get_full_path()
+    return {
+        'next_url': replace_query_param(url, param, page.next_cursor) if page.next_cursor else None,
+        'previous_url': replace_query_param(url, param, page.previous_cursor) if page.previous_cursor else None,
+    }
+
+
+class KeysetPagination(BasePagination):
+    """DRF pagination over paginate_keyset, ordered by ``ordering``."""
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    max_page_size = 500
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        try:
+            self.page = paginate_keyset(
+                queryset,
+                self.ordering,
+                cursor=request.query_params.get(self.cursor_query_param),
+                page_size=self.get_page_size(request),
+            )
+        except ValueError:
+            raise NotFound('Invalid cursor')
+        return self.page.object_list
+
+    def get_link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_link(self.page.next_cursor),
+            'previous': self.get_link(self.page.previous_cursor),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class TransactionPagination(KeysetPagination):
+    ordering = ('-created_at', '-id')
+
+
+class ProductPagination(KeysetPagination):
+    ordering = ('id',)
+
+
+class LowStockPagination(KeysetPagination):
+    ordering = ('-reorder_shortfall', '-id')
@@ -0,0 +1,131 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+
+logger = logging.getLogger('inventory.queries')
+
+# Queries with the same shape this many times in one request look like N+1.
+REPEAT_THRESHOLD = 5
+
+_IN_LIST = re.compile(r'\((?:%s|\?)(?:,\s*(?:%s|\?))*\)')
+
+
+def query_shape(sql):
+    """SQL with IN-lists collapsed, so batches of different sizes compare equal."""
+    return _IN_LIST.sub('(...)', sql)
+
+
+class QueryRecorder:
+    """Execute wrapper that counts and times every query on the wrapped connections."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            self.shapes[query_shape(sql)] += 1
+
+    def repeated(self, threshold=REPEAT_THRESHOLD):
+        """``[(shape, times)]`` for shapes run at least ``threshold`` times."""
+        return [(shape, times) for shape, times in self.shapes.most_common() if times >= threshold]
+
+    def report(self):
+        lines = [f'{self.count} queries in {self.duration * 1000:.1f}ms']
+        lines += [f'  {times}x {shape}' for shape, times in self.shapes.most_common()]
+        return '\n'.join(lines)
+
+
+@contextmanager
+def record_queries(using=None):
+    """Record queries on ``using`` (default: every configured database)."""
+    recorder = QueryRecorder()
+    aliases = [using] if using else list(connections)
+    with ExitStack() as stack:
+        for alias in aliases:
+            stack.enter_context(connections[alias].execute_wrapper(recorder))
+        yield recorder
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+@contextmanager
+def query_budget(max_queries, max_repeats=REPEAT_THRESHOLD - 1, using=None):
+    """
+    Fail when the block runs more than ``max_queries`` queries, or any one
+    query shape more than ``max_repeats`` times::
+
+        with query_budget(6):
+            self.client.get('/business/transaction/list')
+    """
+    with record_queries(using) as recorder:
+        yield recorder
+
+    problems = []
+    if recorder.count > max_queries:
+        problems.append(f'{recorder.count} queries, budget is {max_queries}')
+    repeated = recorder.repeated(max_repeats + 1)
+    if repeated:
+        problems.append(f'{len(repeated)} query shape(s) repeated more than {max_repeats} times')
+    if problems:
+        raise QueryBudgetExceeded('; '.join(problems) + '\n' + recorder.report())
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Report per-request query count and DB time in X-DB-Query-Count and
+    X-DB-Time-Ms, and log a warning for repeated query shapes (likely N+1).
+    The per-request totals are logged at DEBUG.
+
+    Enabled by INVENTORY_QUERY_INSTRUMENTATION, which defaults to DEBUG.
+    Queries run while a streaming response is consumed are not counted.
+    Under ASGI requests pass through uninstrumented: async views run their
+    queries on connections of other threads, shared between requests.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'INVENTORY_QUERY_INSTRUMENTATION', settings.DEBUG)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if not self.enabled or iscoroutinefunction(self):
+            return self.get_response(request)
+
+        with record_queries() as recorder:
+            response = self.get_response(request)
+
+        response['X-DB-Query-Count'] = str(recorder.count)
+        response['X-DB-Time-Ms'] = f'{recorder.duration * 1000:.1f}'
+
+        repeated = recorder.repeated()
+        if repeated:
+            response['X-DB-Repeated-Queries'] = str(len(repeated))
+            logger.warning(
+                '%s %s: possible N+1, %s',
+                request.method, request.path,
+                '; '.join(f'{times}x {shape[:200]}' for shape, times in repeated),
+            )
+        logger.debug(
+            '%s %s: %d queries in %.1fms',
+            request.method, request.path, recorder.count, recorder.duration * 1000,
+        )
+        return response
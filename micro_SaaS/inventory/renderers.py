@@ -0,0 +1,34 @@
+"""
+JSON rendering with orjson.
+
+ORJSONRenderer is a drop-in for DRF's JSONRenderer on the list endpoints:
+the same compact JSON, encoded by orjson in C. Values orjson does not know
+(Decimal, lazy translations, ...) fall back to DRF's encoder.
+"""
+import orjson
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+_fallback = JSONEncoder()
+
+OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+def dumps(data):
+    content = orjson.dumps(data, default=_fallback.default, option=OPTIONS)
+    # Like JSONRenderer, escape the two line terminators JavaScript does not allow in strings.
+    if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+        content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+    return content
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer output for ``application/json``; indented requests keep DRF's encoder."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if self.get_indent(accepted_media_type or '', renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
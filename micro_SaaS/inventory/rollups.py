@@ -0,0 +1,119 @@
+"""
+Daily per-product movement rollups (DailyMovement).
+
+record_movements() adds newly written transactions to their product's row
+for the day, in the same database transaction, so reports never read the
+raw ledger. rebuild_movements() recomputes rows from the ledger for the
+backfill command. Days are calendar days in the current time zone.
+"""
+from collections import defaultdict
+
+from django.db import connections, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce, TruncDate, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from .models import DailyMovement, StockTransaction
+from .sharding import tenant_db
+
+
+INTERVALS = {
+    'day': None,
+    'week': TruncWeek,
+    'month': TruncMonth,
+}
+
+BATCH_SIZE = 2000
+
+
+def _upsert_sql(connection):
+    table = connection.ops.quote_name(DailyMovement._meta.db_table)
+    return (
+        f'INSERT INTO {table} (business_id, product_id, day, units_in, units_out, transaction_count) '
+        f'VALUES (%s, %s, %s, %s, %s, %s) '
+        f'ON CONFLICT (product_id, day) DO UPDATE SET '
+        f'units_in = {table}.units_in + excluded.units_in, '
+        f'units_out = {table}.units_out + excluded.units_out, '
+        f'transaction_count = {table}.transaction_count + excluded.transaction_count'
+    )
+
+
+def record_movements(business_id, transactions):
+    """
+    Add saved StockTransactions of one business to the rollups, with one
+    upsert statement however many product-days they touch. Call inside the
+    transaction that wrote them.
+    """
+    totals = defaultdict(lambda: [0, 0, 0])
+    for stock_transaction in transactions:
+        row = totals[(stock_transaction.product_id, timezone.localdate(stock_transaction.created_at))]
+        row[0 if stock_transaction.type == StockTransaction.InOutChoices.IN else 1] += stock_transaction.quantity
+        row[2] += 1
+
+    if not totals:
+        return
+    connection = connections[tenant_db()]
+    with connection.cursor() as cursor:
+        cursor.executemany(_upsert_sql(connection), [
+            (business_id, product_id, day, units_in, units_out, count)
+            for (product_id, day), (units_in, units_out, count) in totals.items()
+        ])
+
+
+def rebuild_movements(business_id, start=None, end=None):
+    """
+    Recompute a business's rollups from the ledger, optionally only for
+    days ``start`` to ``end`` inclusive. Returns the number of rows written.
+    """
+    ledger = StockTransaction.objects.filter(business_id=business_id)
+    rollups = DailyMovement.objects.filter(business_id=business_id)
+    if start:
+        ledger = ledger.filter(created_at__date__gte=start)
+        rollups = rollups.filter(day__gte=start)
+    if end:
+        ledger = ledger.filter(created_at__date__lte=end)
+        rollups = rollups.filter(day__lte=end)
+
+    rows = ledger.order_by().values('product_id', day=TruncDate('created_at')).annotate(
+        units_in=Coalesce(Sum('quantity', filter=Q(type=StockTransaction.InOutChoices.IN)), 0),
+        units_out=Coalesce(Sum('quantity', filter=Q(type=StockTransaction.InOutChoices.OUT)), 0),
+        transaction_count=Count('id'),
+    )
+
+    with transaction.atomic(using=tenant_db()):
+        rollups.delete()
+        batch = []
+        written = 0
+        for row in rows.iterator(chunk_size=BATCH_SIZE):
+            batch.append(DailyMovement(business_id=business_id, **row))
+            if len(batch) == BATCH_SIZE:
+                DailyMovement.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        DailyMovement.objects.bulk_create(batch)
+        return written + len(batch)
+
+
+def movement_trend(business, start, end, interval='day', product_id=None, category=None):
+    """
+    Units in and out of a business per ``interval`` between ``start`` and
+    ``end`` (dates, inclusive). Periods without movement are omitted.
+    """
+    rollups = DailyMovement.objects.filter(business=business, day__gte=start, day__lte=end)
+    if product_id:
+        rollups = rollups.filter(product_id=product_id)
+    if category:
+        rollups = rollups.filter(product__category=category)
+
+    trunc = INTERVALS[interval]
+    period = trunc('day') if trunc else F('day')
+    rows = rollups.order_by().values(period=period).annotate(
+        units_in=Sum('units_in'),
+        units_out=Sum('units_out'),
+        transactions=Sum('transaction_count'),
+    ).order_by('period')
+
+    return [
+        {**row, 'net': row['units_in'] - row['units_out']}
+        for row in rows
+    ]
@@ -0,0 +1,210 @@
+"""
+Read replica routing.
+
+Writes and almost every read go to ``default``. Views opt in to replica
+reads with ReplicaReadMixin (DRF) or @replica_reads (HTML): for safe
+requests, reads of the product and ledger tables then go to the alias in
+settings.INVENTORY_READ_REPLICA. Everything else - sessions, users,
+businesses, summaries, facets - keeps reading the primary, because those
+reads fill shared caches that would outlive the replica's lag.
+
+Read-your-writes: a user whose request changed data is pinned to the
+primary for settings.INVENTORY_REPLICA_PIN_SECONDS, which should exceed
+the replica's sync interval (see the sync_replica command). The pin is a
+signed cookie, so whichever worker process serves the next request sees
+it; API clients get read-your-writes by sending cookies back.
+"""
+import os
+import sqlite3
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+from .models import BusinessSummary
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Only these models are read from the replica inside replica_reads.
+REPLICA_MODELS = {'inventory.product', 'inventory.stocktransaction'}
+
+PIN_COOKIE = 'inventory_primary_pin'
+
+_read_alias = ContextVar('inventory_read_alias', default=None)
+
+
+def replica_alias():
+    """The configured replica alias, or ``None`` when reads all go to the primary."""
+    alias = getattr(settings, 'INVENTORY_READ_REPLICA', None)
+    return alias if alias and alias != 'default' else None
+
+
+def is_pinned(request):
+    """Whether the request's user wrote within the last INVENTORY_REPLICA_PIN_SECONDS."""
+    user = request.user
+    if not user.is_authenticated:
+        return False
+    pinned = request.get_signed_cookie(
+        PIN_COOKIE, default=None, salt=PIN_COOKIE, max_age=settings.INVENTORY_REPLICA_PIN_SECONDS
+    )
+    return pinned == str(user.pk)
+
+
+def pin(request, response, user):
+    response.set_signed_cookie(
+        PIN_COOKIE, str(user.pk), salt=PIN_COOKIE, max_age=settings.INVENTORY_REPLICA_PIN_SECONDS,
+        secure=request.is_secure(), httponly=True, samesite='Lax',
+    )
+
+
+def can_read_replica(request):
+    return (
+        replica_alias() is not None
+        and request.method in SAFE_METHODS
+        and not is_pinned(request)
+    )
+
+
+@contextmanager
+def reads_from(alias):
+    """Route REPLICA_MODELS reads to ``alias`` (``None``: the primary) in this block."""
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def use_primary():
+    """Send the rest of the current replica_reads block to the primary."""
+    _read_alias.set(None)
+
+
+def replica_lags(business_id, version):
+    """
+    Whether the replica in use has not yet seen business version
+    ``version``; always False when reading from the primary.
+    """
+    alias = _read_alias.get()
+    if alias is None:
+        return False
+    replica_version = BusinessSummary.objects.using(alias).filter(
+        business_id=business_id
+    ).values_list('version', flat=True).first()
+    return replica_version is None or replica_version < version
+
+
+def copy_database(path, using='default'):
+    """
+    Replace the SQLite file at ``path`` with a consistent copy of ``using``.
+
+    The copy is taken in one step of SQLite's backup API, so it is a single
+    snapshot; writers wait for it as they would for any long read. It is
+    written beside ``path`` and renamed over it, so readers see either the
+    old copy or the new one.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        raise ValueError(f'{using} is not a SQLite database.')
+    if connection.in_atomic_block:
+        # The backup would wait forever on this connection's own transaction.
+        raise RuntimeError('Cannot copy a database inside a transaction.')
+
+    path = Path(path)
+    temporary = path.with_name(f'.{path.name}.tmp')
+    connection.ensure_connection()
+    target = sqlite3.connect(temporary)
+    try:
+        connection.connection.backup(target)
+    finally:
+        target.close()
+    os.replace(temporary, path)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is not None and model._meta.label_lower in REPLICA_MODELS:
+            return alias
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica is a copy of the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is never migrated; the copy job brings the schema along.
+        return db != replica_alias()
+
+
+class ReplicaReadMixin:
+    """For viewsets: safe requests read REPLICA_MODELS from the replica."""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # After authentication, so pinned users are known.
+        if can_read_replica(request):
+            self._replica_token = _read_alias.set(replica_alias())
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = self.__dict__.pop('_replica_token', None)
+        try:
+            return super().finalize_response(request, response, *args, **kwargs)
+        finally:
+            if token is not None:
+                _read_alias.reset(token)
+
+
+def replica_reads(view):
+    """ReplicaReadMixin for function views; apply under @login_required."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not can_read_replica(request):
+            return view(request, *args, **kwargs)
+        with reads_from(replica_alias()):
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaPinMiddleware:
+    """Pin users to the primary after a successful unsafe request."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        user = self.writer(request, response)
+        if user is not None:
+            pin(request, response, user)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        user = self.writer(request, response)
+        if user is not None:
+            pin(request, response, user)
+        return response
+
+    def writer(self, request, response):
+        """The user to pin after this request, if any."""
+        if replica_alias() is None or request.method in SAFE_METHODS or response.status_code >= 400:
+            return None
+        # DRF stores the token-authenticated user back on the HttpRequest.
+        user = getattr(request, 'user', None)
+        return user if user is not None and user.is_authenticated else None
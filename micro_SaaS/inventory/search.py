@@ -0,0 +1,144 @@
+from django.db import connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Product
+
+
+FTS_TABLE = 'inventory_product_fts'
+
+# The trigram tokenizer matches any substring of three or more characters,
+# which keeps the old icontains semantics while going through an index.
+MIN_QUERY_LENGTH = 3
+
+# bm25 column weights: name, sku, supplier_name.
+RANK = f'bm25({FTS_TABLE}, 10.0, 5.0, 1.0)'
+
+INSTALL_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, sku, supplier_name,
+        content='inventory_product', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON inventory_product BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, sku, supplier_name)
+        VALUES (new.id, new.name, new.sku, new.supplier_name);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON inventory_product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, sku, supplier_name)
+        VALUES ('delete', old.id, old.name, old.sku, old.supplier_name);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+    AFTER UPDATE OF name, sku, supplier_name ON inventory_product BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, sku, supplier_name)
+        VALUES ('delete', old.id, old.name, old.sku, old.supplier_name);
+        INSERT INTO {FTS_TABLE}(rowid, name, sku, supplier_name)
+        VALUES (new.id, new.name, new.sku, new.supplier_name);
+    END
+    """,
+]
+
+TRIGGERS = {f'{FTS_TABLE}_ai', f'{FTS_TABLE}_ad', f'{FTS_TABLE}_au'}
+
+_available = {}
+
+
+def install(using='default', rebuild=False):
+    """
+    Create the product search index and its sync triggers if missing.
+
+    Django rebuilds SQLite tables on many schema changes, which drops
+    their triggers, so this runs after every migrate and repopulates the
+    index whenever a trigger had to be recreated.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        _available[using] = False
+        return False
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")
+        missing = TRIGGERS - {row[0] for row in cursor.fetchall()}
+        try:
+            for statement in INSTALL_SQL:
+                cursor.execute(statement)
+        except Exception:
+            # SQLite built without FTS5: searches fall back to icontains.
+            _available[using] = False
+            return False
+        if missing or rebuild:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+    _available[using] = True
+    return True
+
+
+def is_available(using='default'):
+    if using not in _available:
+        connection = connections[using]
+        _available[using] = (
+            connection.vendor == 'sqlite'
+            and FTS_TABLE in connection.introspection.table_names()
+        )
+    return _available[using]
+
+
+def match_expression(query):
+    # One quoted phrase: the whole query must appear as a substring.
+    return '"' + query.replace('"', '""') + '"'
+
+
+def _icontains(queryset, query):
+    return queryset.filter(
+        Q(name__icontains=query) |
+        Q(sku__icontains=query) |
+        Q(supplier_name__icontains=query)
+    )
+
+
+def filter_products(queryset, query):
+    """Narrow ``queryset`` to products whose name, SKU or supplier contains ``query``."""
+    query = query.strip()
+    if len(query) < MIN_QUERY_LENGTH or not is_available(queryset.db):
+        return _icontains(queryset, query)
+
+    return queryset.filter(id__in=RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        [match_expression(query)]
+    ))
+
+
+def search_products(business, query, limit=20):
+    """
+    Best matches for ``query`` in a business, most relevant first.
+
+    An exact SKU is answered from the unique (business, sku) index alone.
+    """
+    query = query.strip()
+    if not query:
+        return []
+
+    products = Product.objects.filter(business=business)
+    exact = products.filter(sku=query).first()
+    if exact is not None:
+        results = [exact]
+    elif len(query) < MIN_QUERY_LENGTH or not is_available(products.db):
+        results = list(_icontains(products, query).order_by('name')[:limit])
+    else:
+        results = list(Product.objects.raw(
+            f'SELECT inventory_product.* FROM {FTS_TABLE} '
+            f'JOIN inventory_product ON inventory_product.id = {FTS_TABLE}.rowid '
+            f'WHERE {FTS_TABLE} MATCH %s AND inventory_product.business_id = %s '
+            f'ORDER BY {RANK} LIMIT %s',
+            [match_expression(query), business.id, limit]
+        ))
+
+    for product in results:
+        product.business = business
+    return results
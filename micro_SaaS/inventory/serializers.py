@@ -1,6 +1,13 @@
+from datetime import timedelta
+
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import Business, Product, StockTransaction
+from django.utils import timezone
+from .models import Business, BusinessSummary, Product, StockTransaction
+from .fieldsets import SparseFieldsMixin
+from .forecasting import DEFAULTS
+from .rollups import INTERVALS
+from .services import save_product
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -31,8 +38,15 @@ class BusinessSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at', 'owner']
 
 
-class ProductSerializer(serializers.ModelSerializer):
-    business = serializers.ReadOnlyField(source='business.id')
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    business = serializers.ReadOnlyField(source='business_id')
+
+    # Output field: the values() lookup holding it (see inventory.fieldsets).
+    value_fields = {
+        'id': 'id', 'business': 'business_id', 'name': 'name', 'sku': 'sku', 'category': 'category',
+        'current_quantity': 'current_quantity', 'reorder_level': 'reorder_level', 'unit': 'unit',
+        'supplier_name': 'supplier_name',
+    }
 
     class Meta:
         model = Product
@@ -42,10 +56,48 @@ class ProductSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'business', 'current_quantity']
 
+    def create(self, validated_data):
+        return save_product(Product(**validated_data))
+
+    def update(self, instance, validated_data):
+        for attr, value in validated_data.items():
+            setattr(instance, attr, value)
+        return save_product(instance)
+
+
+class LowStockProductSerializer(ProductSerializer):
+    shortfall = serializers.ReadOnlyField(source='reorder_shortfall')
+
+    value_fields = {**ProductSerializer.value_fields, 'shortfall': 'reorder_shortfall'}
+
+    class Meta(ProductSerializer.Meta):
+        fields = ProductSerializer.Meta.fields + ['shortfall']
+
+
+class BusinessSummarySerializer(serializers.ModelSerializer):
+    """Dashboard figures; pass the top low-stock products as context['low_stock']."""
+    business = serializers.ReadOnlyField(source='business_id')
+    low_stock = serializers.SerializerMethodField()
+
+    class Meta:
+        model = BusinessSummary
+        fields = [
+            'business', 'total_products', 'total_units', 'low_stock_count',
+            'out_of_stock_count', 'updated_at', 'low_stock'
+        ]
+
+    def get_low_stock(self, summary):
+        return LowStockProductSerializer(self.context['low_stock'], many=True).data
+
 
-class StockTransactionSerializer(serializers.ModelSerializer):
+class StockTransactionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     product_name = serializers.ReadOnlyField(source='product.name')
-    business = serializers.ReadOnlyField(source='product.business.id')
+    business = serializers.ReadOnlyField(source='business_id')
+
+    value_fields = {
+        'id': 'id', 'product': 'product_id', 'product_name': 'product__name', 'business': 'business_id',
+        'type': 'type', 'quantity': 'quantity', 'created_at': 'created_at',
+    }
 
     class Meta:
         model = StockTransaction
@@ -62,3 +114,44 @@ class StockTransactionSerializer(serializers.ModelSerializer):
                 'quantity': f'Insufficient stock. Current quantity is {product.current_quantity}.'
             })
         return data
+
+
+class BulkStockTransactionItemSerializer(serializers.Serializer):
+    """Shape check for one bulk item; products are resolved in a single query later."""
+    product = serializers.IntegerField()
+    type = serializers.ChoiceField(choices=StockTransaction.InOutChoices.choices)
+    quantity = serializers.IntegerField(min_value=0)
+
+
+class BulkStockTransactionSerializer(serializers.Serializer):
+    transactions = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=5000
+    )
+    atomic = serializers.BooleanField(default=True)
+
+
+class MovementTrendQuerySerializer(serializers.Serializer):
+    """Query parameters of the movement report; the range defaults to the last 30 days."""
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    interval = serializers.ChoiceField(choices=list(INTERVALS), default='day')
+    product = serializers.IntegerField(required=False)
+    category = serializers.CharField(required=False)
+
+    def validate(self, data):
+        data.setdefault('end', timezone.localdate())
+        data.setdefault('start', data['end'] - timedelta(days=29))
+        if data['start'] > data['end']:
+            raise serializers.ValidationError({'start': 'Must not be after end.'})
+        return data
+
+
+class ReorderForecastQuerySerializer(serializers.Serializer):
+    window_days = serializers.IntegerField(min_value=7, max_value=365, default=DEFAULTS['window_days'])
+    lead_time_days = serializers.IntegerField(min_value=0, max_value=365, default=DEFAULTS['lead_time_days'])
+    cover_days = serializers.IntegerField(min_value=0, max_value=365, default=DEFAULTS['cover_days'])
+    service_level = serializers.FloatField(min_value=0.5, max_value=0.999, default=DEFAULTS['service_level'])
+    limit = serializers.IntegerField(min_value=1, max_value=1000, default=100)
+    needs_reorder = serializers.BooleanField(default=False)
@@ -0,0 +1,232 @@
+from django.db import transaction as db_transaction
+from django.db.models import F
+
+from .models import Product, StockTransaction
+from .facets import apply_facet_delta, facet_delta
+from .outbox import enqueue_stock_events
+from .rollups import record_movements
+from .sharding import tenant, tenant_db
+from .summary import apply_summary_delta, summary_delta
+
+
+class InsufficientStock(Exception):
+    """Raised when an "Out" transaction would take a product below zero."""
+
+    def __init__(self, product, available):
+        self.product = product
+        self.available = available
+        super().__init__(f'Insufficient stock. Current quantity is {available}.')
+
+
+def apply_stock_transaction(stock_transaction):
+    """
+    Apply an unsaved StockTransaction to its product and save it.
+
+    The quantity change is a single conditional UPDATE, so concurrent
+    writers can neither lose updates nor oversell a product. Only the
+    current_quantity column is written.
+    """
+    product = stock_transaction.product
+    quantity = stock_transaction.quantity
+
+    with tenant(product.business_id) as using, db_transaction.atomic(using=using):
+        products = Product.objects.filter(pk=product.pk)
+
+        if stock_transaction.type == StockTransaction.InOutChoices.IN:
+            updated = products.update(
+                current_quantity=F('current_quantity') + quantity,
+                reorder_shortfall=F('reorder_shortfall') - quantity
+            )
+        else:
+            updated = products.filter(current_quantity__gte=quantity).update(
+                current_quantity=F('current_quantity') - quantity,
+                reorder_shortfall=F('reorder_shortfall') + quantity
+            )
+
+        product.refresh_from_db(fields=['current_quantity', 'reorder_level', 'reorder_shortfall'])
+        if not updated:
+            raise InsufficientStock(product, product.current_quantity)
+
+        stock_transaction.save()
+        record_movements(product.business_id, [stock_transaction])
+        enqueue_stock_events(product.business_id, [
+            (stock_transaction, product.current_quantity, product.reorder_level)
+        ])
+
+        change = quantity if stock_transaction.type == StockTransaction.InOutChoices.IN else -quantity
+        after = (product.current_quantity, product.reorder_level, product.category)
+        before = (product.current_quantity - change, product.reorder_level, product.category)
+        record_product_changes(product.business_id, [(before, after)])
+
+    return stock_transaction
+
+
+class StockConflict(Exception):
+    """Raised when stock changed underneath a batch between validation and write."""
+
+
+def apply_stock_transactions_bulk(business, items, atomic=True):
+    """
+    Validate and write a batch of already shape-checked transactions.
+
+    ``items`` is a list of dicts with ``product`` (id), ``type`` and
+    ``quantity``; entries that failed shape validation are passed as
+    ``{'errors': ...}`` so they keep their position in the results.
+    Products are fetched once, stock is checked against a running balance
+    in request order, accepted rows are written with one bulk_create and
+    each product gets a single net quantity UPDATE.
+
+    Returns ``(results, created)`` where ``results`` has one entry per
+    item. With ``atomic=True`` nothing is written if any item is rejected,
+    and the valid items are reported as ``skipped``.
+    """
+    with tenant(business.id):
+        return _apply_bulk(business, items, atomic)
+
+
+def _apply_bulk(business, items, atomic):
+    product_ids = {item['product'] for item in items if 'errors' not in item}
+    products = Product.objects.filter(business=business).in_bulk(product_ids)
+    balances = {pk: product.current_quantity for pk, product in products.items()}
+
+    results = []
+    accepted = []
+    for index, item in enumerate(items):
+        if 'errors' in item:
+            results.append({'index': index, 'status': 'rejected', 'errors': item['errors']})
+            continue
+
+        product = products.get(item['product'])
+        if product is None:
+            results.append({
+                'index': index,
+                'status': 'rejected',
+                'errors': {'product': ['Product not found in this business.']},
+            })
+            continue
+
+        quantity = item['quantity']
+        if item['type'] == StockTransaction.InOutChoices.IN:
+            balances[product.pk] += quantity
+        elif balances[product.pk] >= quantity:
+            balances[product.pk] -= quantity
+        else:
+            results.append({
+                'index': index,
+                'status': 'rejected',
+                'errors': {'quantity': [f'Insufficient stock. Current quantity is {balances[product.pk]}.']},
+            })
+            continue
+
+        accepted.append(StockTransaction(
+            product=product, business_id=business.id, type=item['type'], quantity=quantity
+        ))
+        results.append({'index': index, 'status': 'created'})
+
+    if atomic and len(accepted) != len(items):
+        # Valid items were not written either; say so instead of 'created'.
+        for result in results:
+            if result['status'] == 'created':
+                result['status'] = 'skipped'
+        return results, []
+
+    with db_transaction.atomic(using=tenant_db()):
+        changes = {}
+        for pk, balance in balances.items():
+            delta = balance - products[pk].current_quantity
+            if not delta:
+                continue
+            rows = Product.objects.filter(pk=pk)
+            if delta < 0:
+                rows = rows.filter(current_quantity__gte=-delta)
+            if not rows.update(
+                current_quantity=F('current_quantity') + delta,
+                reorder_shortfall=F('reorder_shortfall') - delta
+            ):
+                raise StockConflict(f'Stock for product {pk} changed during the batch.')
+            changes[pk] = delta
+
+        created = StockTransaction.objects.bulk_create(accepted)
+        record_movements(business.id, created)
+
+        if created:
+            states = list(Product.objects.filter(pk__in=changes).values_list(
+                'pk', 'current_quantity', 'reorder_level', 'category'
+            )) if changes else []
+            record_product_changes(business.id, [
+                ((quantity - changes[pk], reorder_level, category), (quantity, reorder_level, category))
+                for pk, quantity, reorder_level, category in states
+            ])
+            enqueue_stock_events(business.id, _levels_after(created, states, products))
+
+    created_iter = iter(created)
+    for result in results:
+        if result['status'] == 'created':
+            result['id'] = next(created_iter).id
+
+    return results, created
+
+
+def _levels_after(created, states, products):
+    """
+    ``(stock_transaction, quantity_after, reorder_level)`` for each created
+    row, walking back from the products' final quantities in ``states``.
+    """
+    levels = {pk: (quantity, reorder_level) for pk, quantity, reorder_level, _ in states}
+    running = {pk: quantity for pk, (quantity, _) in levels.items()}
+    events = []
+    for stock_transaction in reversed(created):
+        pk = stock_transaction.product_id
+        if pk not in running:
+            # The product's transactions netted to zero; its quantity did not change.
+            running[pk] = products[pk].current_quantity
+            levels[pk] = (running[pk], products[pk].reorder_level)
+        events.append((stock_transaction, running[pk], levels[pk][1]))
+        change = stock_transaction.quantity
+        running[pk] -= change if stock_transaction.type == StockTransaction.InOutChoices.IN else -change
+    events.reverse()
+    return events
+
+
+def record_product_changes(business_id, changes):
+    """
+    Fold product state changes into the business's derived tables.
+
+    ``changes`` is a list of ``(before, after)`` pairs of
+    (quantity, reorder_level, category) tuples, ``None`` for a product
+    that did not exist on that side. Call inside the writing transaction,
+    after every product or stock write: it also bumps the business version.
+    """
+    summary = {}
+    facets = {}
+    for before, after in changes:
+        for name, value in summary_delta(before, after).items():
+            summary[name] = summary.get(name, 0) + value
+        for category, (products, low) in facet_delta(before, after).items():
+            old_products, old_low = facets.get(category, (0, 0))
+            facets[category] = (old_products + products, old_low + low)
+
+    apply_summary_delta(business_id, summary)
+    apply_facet_delta(business_id, {key: value for key, value in facets.items() if any(value)})
+
+
+def _product_state(pk):
+    return Product.objects.filter(pk=pk).values_list('current_quantity', 'reorder_level', 'category').first()
+
+
+def save_product(product):
+    """Create or update a product and keep its business's derived tables in step."""
+    with tenant(product.business_id) as using, db_transaction.atomic(using=using):
+        before = _product_state(product.pk) if product.pk else None
+        product.save()
+        after = (product.current_quantity, product.reorder_level, product.category)
+        record_product_changes(product.business_id, [(before, after)])
+
+    return product
+
+
+def delete_product(product):
+    with tenant(product.business_id) as using, db_transaction.atomic(using=using):
+        before = _product_state(product.pk)
+        product.delete()
+        record_product_changes(product.business_id, [(before, None)])
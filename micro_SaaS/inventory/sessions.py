@@ -0,0 +1,62 @@
+"""
+Session storage upkeep for the HTML app.
+
+settings.INVENTORY_SESSION_BACKEND chooses the session engine. The HTML
+views only keep the login and the selected business in the session, so
+cached_db serves page views from the 'sessions' cache without reading
+django_session, and signed_cookies needs no server-side state at all.
+Both still leave expired state behind: database rows that Django only
+deletes on request, and, for a file cache, entries no one reads again.
+clear_expired() and sweep_cache() remove them (``manage.py cleanup_sessions``).
+"""
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.cache.backends.filebased import FileBasedCache
+from django.utils import timezone
+
+
+DB_ENGINES = ('django.contrib.sessions.backends.db', 'django.contrib.sessions.backends.cached_db')
+CACHE_ENGINES = ('django.contrib.sessions.backends.cache', 'django.contrib.sessions.backends.cached_db')
+
+
+def uses_database():
+    return settings.SESSION_ENGINE in DB_ENGINES
+
+
+def uses_cache():
+    return settings.SESSION_ENGINE in CACHE_ENGINES
+
+
+def clear_expired(batch_size=1000):
+    """
+    Delete expired django_session rows ``batch_size`` at a time, so page
+    views and stock writes sharing the SQLite file are not locked out for
+    the whole sweep. Returns the number deleted.
+    """
+    expired = Session.objects.filter(expire_date__lt=timezone.now())
+    deleted = 0
+    while True:
+        keys = list(expired.values_list('session_key', flat=True)[:batch_size])
+        if not keys:
+            return deleted
+        deleted += Session.objects.filter(session_key__in=keys).delete()[0]
+
+
+def sweep_cache(alias=None):
+    """
+    Remove expired entries from a file-based session cache and return how
+    many; other caches evict expired entries themselves and return 0.
+    """
+    cache = caches[alias or settings.SESSION_CACHE_ALIAS]
+    if not isinstance(cache, FileBasedCache):
+        return 0
+    removed = 0
+    for path in cache._list_cache_files():
+        try:
+            with open(path, 'rb') as entry:
+                # Deletes the file when its expiry has passed.
+                removed += cache._is_expired(entry)
+        except FileNotFoundError:
+            pass
+    return removed
@@ -0,0 +1,411 @@
+"""
+Tenant sharding by Business.
+
+A business's products, ledger and the tables derived from them (summary,
+facets, daily movements, snapshots) live together in one database, its
+shard, named by ``Business.shard``. Users, sessions and businesses
+themselves stay in ``default``, the directory; each shard keeps only a stub
+of its businesses and their owners so its foreign keys hold.
+
+Views do not pick databases. Resolving the request's business (see
+inventory.tenancy) calls use_business(), and ShardRouter sends queries on
+tenant models to that business's shard for the rest of the request. Code
+outside a request wraps per-business work in ``with tenant(business_id):``.
+
+Shards are settings.INVENTORY_SHARDS, in a fixed order: position ``n``
+allocates tenant primary keys from ``n * ID_RANGE``, so ids stay unique
+across databases. move_business() copies rows with their ids, except rows
+from above the target's range: SQLite would carry on allocating after
+them, inside the range of the shard they came from, so they are given
+new ids from the target's own sequence instead. With no
+shards configured everything stays on ``default`` and ShardRouter steps
+aside.
+
+Each business's shard is cached in the 'default' cache, as are the
+Business rows inventory.tenancy routes by. move_business() invalidates
+them there, so every process only learns of a move if that cache is
+shared (settings.INVENTORY_CACHE_DIR); with a per-process cache, other
+workers keep reading the old shard for up to an hour. The
+``inventory.W001`` system check warns about that combination.
+"""
+from bisect import bisect_right
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import checks
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connections, router, transaction
+from django.db.models import F, Max
+
+from .models import (
+    Business,
+    BusinessSummary,
+    CategoryFacet,
+    DailyMovement,
+    OutboxEvent,
+    Product,
+    StockSnapshot,
+    StockTransaction,
+)
+
+
+DEFAULT_SHARD = 'default'
+
+# Parents before children; each with the filter selecting one business's rows.
+TENANT_TABLES = [
+    (BusinessSummary, 'business_id'),
+    (CategoryFacet, 'business_id'),
+    (Product, 'business_id'),
+    (StockTransaction, 'business_id'),
+    (OutboxEvent, 'business_id'),
+    (DailyMovement, 'business_id'),
+    (StockSnapshot, 'business_id'),
+]
+TENANT_MODELS = {model._meta.label_lower for model, _ in TENANT_TABLES}
+DIRECTORY_MODELS = {'inventory.business', 'auth.user'}
+
+ID_RANGE = 10 ** 12
+BATCH_SIZE = 2000
+CACHE_TIMEOUT = 60 * 60
+
+_shard = ContextVar('inventory_shard', default=None)
+
+
+def shards():
+    return [DEFAULT_SHARD, *getattr(settings, 'INVENTORY_SHARDS', [])]
+
+
+def sharding_enabled():
+    return bool(getattr(settings, 'INVENTORY_SHARDS', []))
+
+
+def cache_key(business_id):
+    return f'inventory:business-shard:{business_id}'
+
+
+def shard_for(business_id):
+    """The database alias holding a business's tenant data, served from cache."""
+    if not sharding_enabled():
+        return DEFAULT_SHARD
+    shard = cache.get(cache_key(business_id))
+    if shard is None:
+        shard = Business.objects.filter(id=business_id).values_list('shard', flat=True).first() or DEFAULT_SHARD
+        cache.set(cache_key(business_id), shard, CACHE_TIMEOUT)
+    return shard
+
+
+def invalidate_shard(sender, instance, **kwargs):
+    """post_save/post_delete receiver for Business."""
+    cache.delete(cache_key(instance.pk))
+
+
+def use_business(business):
+    """Route tenant queries to ``business``'s shard for the rest of the current context."""
+    _shard.set(business.shard)
+
+
+@contextmanager
+def tenant(business_id):
+    """Route tenant queries to the business's shard in this block; yields the alias."""
+    shard = shard_for(business_id)
+    token = _shard.set(shard)
+    try:
+        yield shard
+    finally:
+        _shard.reset(token)
+
+
+def tenant_db():
+    """The alias tenant writes go to here, for transaction.atomic() and raw SQL."""
+    return router.db_for_write(Product)
+
+
+def _business_id(instance):
+    if isinstance(instance, Business):
+        return instance.pk
+    if getattr(instance, 'business_id', None) is not None:
+        return instance.business_id
+    if isinstance(instance, StockTransaction) and StockTransaction.product.is_cached(instance):
+        # Not saved yet; save() fills business in from the product.
+        return instance.product.business_id
+    return None
+
+
+class ShardRouter:
+    """
+    Tenant models go to the shard of the business in context, or of the
+    business an instance belongs to. ``None`` lets later routers (the read
+    replica) handle businesses on ``default``, and every query when no
+    shards are configured.
+    """
+
+    def db_for_read(self, model, **hints):
+        if not sharding_enabled():
+            return None
+        label = model._meta.label_lower
+        if label in DIRECTORY_MODELS:
+            return DEFAULT_SHARD
+        if label not in TENANT_MODELS:
+            return None
+        shard = _shard.get()
+        if shard is None and isinstance(hints.get('instance'), Business):
+            shard = shard_for(hints['instance'].pk)
+        return shard if shard != DEFAULT_SHARD else None
+
+    def db_for_write(self, model, **hints):
+        if not sharding_enabled():
+            return None
+        label = model._meta.label_lower
+        if label in DIRECTORY_MODELS:
+            return DEFAULT_SHARD
+        if label not in TENANT_MODELS:
+            return None
+        business_id = _business_id(hints['instance']) if 'instance' in hints else None
+        shard = shard_for(business_id) if business_id is not None else _shard.get()
+        return shard if shard != DEFAULT_SHARD else None
+
+
+def check_shared_cache(app_configs, **kwargs):
+    """System check: with shards, the 'default' cache must be shared by every process."""
+    if not sharding_enabled() or not isinstance(caches['default'], LocMemCache):
+        return []
+    return [checks.Warning(
+        "INVENTORY_SHARDS is set but the 'default' cache is per process.",
+        hint="Set INVENTORY_CACHE_DIR or configure a shared cache, or other workers keep "
+             "serving a moved business from its old shard.",
+        id='inventory.W001',
+    )]
+
+
+class TenantContextMiddleware:
+    """Run each sync request in its own context, so use_business() never leaks between requests."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            # Each ASGI request already runs in its own task and context.
+            return self.get_response(request)
+        return copy_context().run(self.get_response, request)
+
+
+def reserve_id_range(using):
+    """Start a shard's tenant primary keys at its ID_RANGE offset (post_migrate)."""
+    if using == DEFAULT_SHARD or using not in shards() or connections[using].vendor != 'sqlite':
+        return
+    offset = shards().index(using) * ID_RANGE
+    with connections[using].cursor() as cursor:
+        for model, _ in TENANT_TABLES:
+            if model._meta.pk.name != 'id':
+                continue
+            table = model._meta.db_table
+            cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = %s', [table])
+            row = cursor.fetchone()
+            if row is None:
+                cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)', [table, offset])
+            elif row[0] < offset:
+                cursor.execute('UPDATE sqlite_sequence SET seq = %s WHERE name = %s', [offset, table])
+
+
+def id_range(using):
+    """``(floor, ceiling)`` of the tenant primary keys shard ``using`` allocates."""
+    floor = shards().index(using) * ID_RANGE
+    return floor, floor + ID_RANGE
+
+
+def last_id(model, using):
+    """
+    The last primary key shard ``using`` allocated for ``model``: its
+    sqlite_sequence entry, or the highest id in its own range if that entry
+    is missing or was pushed past the range by an earlier move.
+    """
+    floor, ceiling = id_range(using)
+    with connections[using].cursor() as cursor:
+        cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = %s', [model._meta.db_table])
+        row = cursor.fetchone()
+    if row is not None and floor <= row[0] < ceiling:
+        return row[0]
+    highest = model.objects.db_manager(using).filter(pk__gte=floor, pk__lt=ceiling).aggregate(last=Max('pk'))['last']
+    return max(floor, highest or 0)
+
+
+def set_last_id(model, using, value):
+    """Continue ``model``'s primary keys on shard ``using`` after ``value``."""
+    table = model._meta.db_table
+    with connections[using].cursor() as cursor:
+        cursor.execute('UPDATE sqlite_sequence SET seq = %s WHERE name = %s', [value, table])
+        if not cursor.rowcount:
+            cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)', [table, value])
+
+
+class Renumbering:
+    """
+    The new ids move_business() gave rows from above the target's range,
+    per model, and the references to them in rows copied later.
+    """
+
+    def __init__(self, ceiling):
+        self.ceiling = ceiling
+        self.new_ids = {}
+        self.first_ids = {}
+        self._renumbered_transactions = None
+
+    def assign(self, model, row, next_id):
+        """Give ``row`` ``next_id`` if its own id is out of range; returns the next free id."""
+        if row.pk < self.ceiling:
+            return next_id
+        ids = self.new_ids.setdefault(model, {})
+        self.first_ids.setdefault(model, next_id)
+        ids[row.pk] = row.pk = next_id
+        return next_id + 1
+
+    def remap(self, row):
+        products = self.new_ids.get(Product, {})
+        if getattr(row, 'product_id', None) in products:
+            row.product_id = products[row.product_id]
+        if isinstance(row, OutboxEvent):
+            transaction_id = row.payload.get('transaction')
+            row.payload['transaction'] = self.new_ids.get(StockTransaction, {}).get(transaction_id, transaction_id)
+        if isinstance(row, StockSnapshot):
+            row.last_transaction_id = self.watermark(row.last_transaction_id)
+
+    def watermark(self, transaction_id):
+        """
+        A snapshot's last_transaction_id after renumbering. Rows are
+        renumbered in id order above every id kept, so the order of the
+        ledger, and what a snapshot counts, is unchanged.
+        """
+        ids = self.new_ids.get(StockTransaction)
+        if transaction_id < self.ceiling or not ids:
+            return transaction_id
+        if self._renumbered_transactions is None:
+            # Filled in id order, once every transaction is copied.
+            self._renumbered_transactions = list(ids)
+        old_ids = self._renumbered_transactions
+        position = bisect_right(old_ids, transaction_id)
+        return ids[old_ids[position - 1]] if position else self.first_ids[StockTransaction] - 1
+
+
+def write_stubs(business, using):
+    """Create ``business`` and its owner on shard ``using`` as foreign key targets."""
+    if using == DEFAULT_SHARD:
+        return
+    User.objects.db_manager(using).update_or_create(
+        id=business.owner_id, defaults={'username': f'owner-{business.owner_id}', 'password': '!'}
+    )
+    Business.objects.db_manager(using).update_or_create(id=business.id, defaults={
+        'name': business.name, 'address': business.address,
+        'owner_id': business.owner_id, 'shard': using,
+    })
+
+
+def place_business(sender, instance, created, raw=False, using=DEFAULT_SHARD, **kwargs):
+    """
+    post_save receiver for Business: with INVENTORY_SHARD_NEW_BUSINESSES,
+    spread new businesses over INVENTORY_SHARDS by id.
+    """
+    shard_names = getattr(settings, 'INVENTORY_SHARDS', [])
+    if not created or raw or using != DEFAULT_SHARD or not shard_names:
+        return
+    if not getattr(settings, 'INVENTORY_SHARD_NEW_BUSINESSES', False):
+        return
+    instance.shard = shard_names[instance.id % len(shard_names)]
+    write_stubs(instance, instance.shard)
+    Business.objects.filter(pk=instance.pk).update(shard=instance.shard)
+    cache.delete(cache_key(instance.pk))
+
+
+def purge_business(business_id, using):
+    """Delete a business's tenant rows (and its stub) from shard ``using``."""
+    with transaction.atomic(using=using):
+        for model, field in reversed(TENANT_TABLES):
+            model.objects.db_manager(using).filter(**{field: business_id}).delete()
+        if using != DEFAULT_SHARD:
+            Business.objects.db_manager(using).filter(id=business_id).delete()
+
+
+def purge_sharded_business(sender, instance, using=DEFAULT_SHARD, **kwargs):
+    """pre_delete receiver for Business: deleting it also deletes its shard's rows."""
+    if using == DEFAULT_SHARD and instance.shard != DEFAULT_SHARD:
+        purge_business(instance.id, instance.shard)
+
+
+@contextmanager
+def stored_timestamps(model):
+    """Let bulk_create keep copied auto_now/auto_now_add values instead of now()."""
+    fields = [
+        field for field in model._meta.concrete_fields
+        if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)
+    ]
+    flags = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, flags):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def move_business(business, target, stdout=None):
+    """
+    Copy a business's tenant rows to shard ``target`` with their ids,
+    switch the business over and delete the rows from its old shard.
+    Rows with ids above the target's range get new ones from it, and the
+    rows referring to them follow (see Renumbering).
+
+    The old shard's write lock is held throughout, so no write to it can
+    land mid-copy; on SQLite that pauses every tenant of that shard.
+    Returns ``{model label: rows copied}``.
+    """
+    source = business.shard
+    if target not in shards():
+        raise ValueError(f"Unknown shard {target!r}; expected one of {', '.join(shards())}.")
+    if target == source:
+        return {}
+
+    copied = {}
+    renumbering = Renumbering(id_range(target)[1])
+    with transaction.atomic(using=source):
+        # Any write takes SQLite's RESERVED lock until this transaction ends.
+        BusinessSummary.objects.db_manager(source).filter(business_id=business.id).update(version=F('version'))
+        purge_business(business.id, target)
+        with transaction.atomic(using=target):
+            write_stubs(business, target)
+            for model, field in TENANT_TABLES:
+                rows = model.objects.db_manager(source).filter(**{field: business.id}).order_by('pk')
+                numbered = model._meta.pk.name == 'id'
+                next_id = last_id(model, target) + 1 if numbered else None
+                copied[model._meta.label] = 0
+                batch = []
+                with stored_timestamps(model):
+                    for row in rows.iterator(chunk_size=BATCH_SIZE):
+                        if numbered:
+                            next_id = renumbering.assign(model, row, next_id)
+                        renumbering.remap(row)
+                        batch.append(row)
+                        if len(batch) == BATCH_SIZE:
+                            model.objects.db_manager(target).bulk_create(batch)
+                            copied[model._meta.label] += len(batch)
+                            batch = []
+                    model.objects.db_manager(target).bulk_create(batch)
+                copied[model._meta.label] += len(batch)
+                if numbered:
+                    set_last_id(model, target, next_id - 1)
+                if stdout:
+                    stdout.write(f'{model._meta.label}: {copied[model._meta.label]} rows')
+
+        business.shard = target
+        business.save(update_fields=['shard'])
+        purge_business(business.id, source)
+    return copied
@@ -0,0 +1,161 @@
+"""
+Point-in-time stock.
+
+take_snapshots() stores every product's quantity in one batch (run it
+periodically, e.g. daily from cron via the snapshot_stock command). A
+historical quantity is then the nearest earlier snapshot plus the
+transactions after it, so only the tail of the ledger is read. Before the
+first snapshot, the ledger is unwound backwards from the next snapshot (or
+from the current quantity) instead.
+
+Which transactions a snapshot already counts is decided by id (see
+StockSnapshot.last_transaction_id), not by time, so a transaction still
+being committed while the snapshot is taken is neither lost nor counted
+twice. The created_at bounds below only keep the ledger reads on an index
+range; they assume no stock write stays open longer than IN_FLIGHT_GRACE.
+
+Quantities changed by editing a product rather than through a transaction
+are only picked up by the next snapshot.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Case, F, Max, Sum, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Product, StockSnapshot, StockTransaction
+from .sharding import tenant_db
+
+
+BATCH_SIZE = 2000
+IN_FLIGHT_GRACE = timedelta(minutes=5)
+
+NET_QUANTITY = Coalesce(
+    Sum(Case(When(type='In', then=F('quantity')), default=-F('quantity'))), 0
+)
+
+
+def parse_timestamp(value):
+    """
+    An aware datetime from an ISO timestamp or date. A bare date means the
+    end of that day, so "on hand on March 31" includes March 31. Raises
+    ValueError for anything else.
+    """
+    moment = parse_datetime(value or '')
+    if moment is None:
+        day = parse_date(value or '')
+        if day is None:
+            raise ValueError('Expected an ISO 8601 date or timestamp.')
+        moment = datetime.combine(day, time.max)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def take_snapshots(business_id):
+    """Snapshot every product of a business; returns the number of rows written."""
+    with transaction.atomic(using=tenant_db()):
+        watermark = StockTransaction.objects.filter(
+            business_id=business_id
+        ).aggregate(last=Max('id'))['last'] or 0
+        taken_at = timezone.now()
+
+        rows = Product.objects.filter(business_id=business_id).values_list('id', 'current_quantity')
+        batch = []
+        written = 0
+        for product_id, quantity in rows.iterator(chunk_size=BATCH_SIZE):
+            batch.append(StockSnapshot(
+                business_id=business_id, product_id=product_id, taken_at=taken_at,
+                last_transaction_id=watermark, quantity=quantity,
+            ))
+            if len(batch) == BATCH_SIZE:
+                StockSnapshot.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        StockSnapshot.objects.bulk_create(batch)
+        return written + len(batch)
+
+
+def prune_snapshots(business_id, before):
+    """Delete snapshot batches taken before ``before``, always keeping the latest one."""
+    latest = StockSnapshot.objects.filter(business_id=business_id).aggregate(at=Max('taken_at'))['at']
+    if latest is None:
+        return 0
+    deleted, _ = StockSnapshot.objects.filter(
+        business_id=business_id, taken_at__lt=min(before, latest)
+    ).delete()
+    return deleted
+
+
+def stock_at(product, moment):
+    """``(quantity, snapshot)`` for a product at ``moment``; snapshot may be ``None``."""
+    snapshots = StockSnapshot.objects.filter(product=product)
+    ledger = StockTransaction.objects.filter(product=product)
+
+    snapshot = snapshots.filter(taken_at__lte=moment).order_by('-taken_at').first()
+    if snapshot is not None:
+        tail = ledger.filter(
+            id__gt=snapshot.last_transaction_id,
+            created_at__gt=snapshot.taken_at - IN_FLIGHT_GRACE,
+            created_at__lte=moment,
+        )
+        return snapshot.quantity + tail.aggregate(net=NET_QUANTITY)['net'], snapshot
+
+    snapshot = snapshots.filter(taken_at__gt=moment).order_by('taken_at').first()
+    if snapshot is not None:
+        quantity = snapshot.quantity
+        ledger = ledger.filter(id__lte=snapshot.last_transaction_id, created_at__lte=snapshot.taken_at)
+    else:
+        quantity = product.current_quantity
+    undone = ledger.filter(created_at__gt=moment).aggregate(net=NET_QUANTITY)['net']
+    return quantity - undone, snapshot
+
+
+def business_stock_at(business, moment):
+    """
+    ``(snapshot_at, {product_id: quantity})`` for every current product of
+    a business at ``moment``. Products added after the snapshot batch used
+    are unwound from their current quantity.
+    """
+    snapshots = StockSnapshot.objects.filter(business=business)
+    ledger = StockTransaction.objects.filter(business=business)
+
+    earlier = snapshots.filter(taken_at__lte=moment).aggregate(at=Max('taken_at'))['at']
+    later = None
+    if earlier is None:
+        later = snapshots.filter(taken_at__gt=moment).order_by('taken_at').values_list('taken_at', flat=True).first()
+
+    taken_at = earlier or later
+    quantities = {}
+    if taken_at:
+        batch = snapshots.filter(taken_at=taken_at).values_list('product_id', 'quantity', 'last_transaction_id')
+        for product_id, quantity, watermark in batch.iterator(chunk_size=BATCH_SIZE):
+            quantities[product_id] = quantity
+        if earlier:
+            changes, sign = ledger.filter(
+                id__gt=watermark, created_at__gt=taken_at - IN_FLIGHT_GRACE, created_at__lte=moment
+            ), 1
+        else:
+            changes, sign = ledger.filter(id__lte=watermark, created_at__gt=moment, created_at__lte=taken_at), -1
+        for product_id, net in _net_per_product(changes):
+            if product_id in quantities:
+                quantities[product_id] += sign * net
+
+    current = dict(Product.objects.filter(business=business).values_list('id', 'current_quantity'))
+    missing = current.keys() - quantities.keys()
+    if missing:
+        undone = ledger.filter(created_at__gt=moment)
+        if len(missing) < len(current):
+            undone = undone.filter(product_id__in=missing)
+        for product_id, net in _net_per_product(undone):
+            if product_id in missing:
+                current[product_id] -= net
+        quantities.update((product_id, current[product_id]) for product_id in missing)
+
+    return taken_at, quantities
+
+
+def _net_per_product(transactions):
+    return transactions.order_by().values_list('product_id').annotate(net=NET_QUANTITY)
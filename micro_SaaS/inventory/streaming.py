@@ -0,0 +1,82 @@
+"""
+Streamed JSON arrays for full list dumps.
+
+``?stream=1`` on the product and ledger lists returns every matching row
+as one JSON array instead of a page. Rows come from a chunked values()
+iterator and each chunk is encoded and sent before the next is read, so
+memory stays at one chunk however long the list, and the opening bracket
+goes out before the query runs. Clients that accept gzip get the body
+compressed on the fly.
+"""
+from itertools import islice
+
+from django.http import StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
+
+from .exports import iter_gzip
+from .renderers import dumps
+
+
+STREAM_PARAM = 'stream'
+CHUNK_ROWS = 2000
+
+
+def accepts_gzip(accept_encoding):
+    """
+    Whether an Accept-Encoding header allows gzip: named (or x-gzip), or
+    covered by ``*``, with a q-value above zero; ``gzip;q=0`` refuses it.
+    """
+    qualities = {}
+    for coding in accept_encoding.split(','):
+        name, *params = coding.split(';')
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.strip().lower()] = quality
+    return qualities.get('gzip', qualities.get('x-gzip', qualities.get('*', 0))) > 0
+
+
+def wants_stream(request):
+    return request.query_params.get(STREAM_PARAM) in ('1', 'true')
+
+
+def iter_json_array(rows, render, chunk_rows=CHUNK_ROWS):
+    """
+    Yield the JSON array of ``render(chunk)`` for each chunk of ``rows``;
+    ``render`` turns a list of rows into a list of JSON-ready values.
+    """
+    rows = iter(rows)
+    # The first byte goes out on its own, before the query has run.
+    yield b'['
+    separator = b''
+    while True:
+        chunk = list(islice(rows, chunk_rows))
+        if not chunk:
+            break
+        # One orjson call per chunk; drop its brackets to splice it into the array.
+        yield separator + dumps(render(chunk))[1:-1]
+        separator = b','
+    yield b']'
+
+
+def streaming_json_response(request, queryset, render):
+    """
+    A StreamingHttpResponse of ``queryset`` as a JSON array, gzipped if the
+    client accepts it. The queryset is pinned to its database first,
+    because it is read after the view (and its routing context) has
+    returned.
+    """
+    rows = queryset.using(queryset.db).iterator(chunk_size=CHUNK_ROWS)
+    chunks = iter_json_array(rows, render)
+
+    gzip = accepts_gzip(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    response = StreamingHttpResponse(iter_gzip(chunks) if gzip else chunks, content_type='application/json')
+    if gzip:
+        response['Content-Encoding'] = 'gzip'
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
@@ -0,0 +1,114 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import BusinessSummary, Product
+from .sharding import tenant_db
+
+
+SUMMARY_FIELDS = ('total_products', 'total_units', 'low_stock_count', 'out_of_stock_count')
+
+
+def product_contribution(quantity, reorder_level):
+    """What one product adds to each summary field, or zeros for ``None``."""
+    if quantity is None:
+        return (0, 0, 0, 0)
+    return (1, quantity, int(quantity <= reorder_level), int(quantity == 0))
+
+
+def summary_delta(before, after):
+    """
+    Field deltas for a product going from ``before`` to ``after``, each a
+    (quantity, reorder_level, ...) state or ``None``.
+    """
+    old = product_contribution(*before[:2]) if before else product_contribution(None, None)
+    new = product_contribution(*after[:2]) if after else product_contribution(None, None)
+    return {name: n - o for name, o, n in zip(SUMMARY_FIELDS, old, new)}
+
+
+def apply_summary_delta(business_id, delta):
+    """
+    Add ``delta`` to the business's summary row and bump its version. Call
+    inside the same transaction as the product write it describes, even
+    with an all-zero delta. A missing row is rebuilt from the (already
+    updated) products instead.
+    """
+    changes = {name: F(name) + value for name, value in delta.items() if value}
+    updated = BusinessSummary.objects.filter(business_id=business_id).update(
+        version=F('version') + 1, updated_at=timezone.now(), **changes
+    )
+    if not updated:
+        rebuild_summary(business_id)
+    invalidate_version(business_id)
+
+
+def rebuild_summary(business_id):
+    """Recompute a business's summary from its products."""
+    totals = Product.objects.filter(business_id=business_id).aggregate(
+        total_products=Count('id'),
+        total_units=Coalesce(Sum('current_quantity'), 0),
+        low_stock_count=Count('id', filter=Q(reorder_shortfall__gte=0)),
+        out_of_stock_count=Count('id', filter=Q(current_quantity=0)),
+    )
+    summary, _ = BusinessSummary.objects.update_or_create(business_id=business_id, defaults=totals)
+    invalidate_version(business_id)
+    return summary
+
+
+def get_summary(business):
+    try:
+        return BusinessSummary.objects.get(business=business)
+    except BusinessSummary.DoesNotExist:
+        return rebuild_summary(business.id)
+
+
+async def aget_summary(business):
+    try:
+        return await BusinessSummary.objects.aget(business=business)
+    except BusinessSummary.DoesNotExist:
+        return await sync_to_async(rebuild_summary)(business.id)
+
+
+def version_cache_key(business_id):
+    return f'inventory:business-version:{business_id}'
+
+
+def get_version(business_id):
+    """
+    ``(version, updated_at)`` of a business's products and ledger, served
+    from cache. Only the writing process drops its cached version; other
+    processes keep theirs for settings.INVENTORY_VERSION_CACHE_TIMEOUT.
+    """
+    version = cache.get(version_cache_key(business_id))
+    if version is None:
+        version = BusinessSummary.objects.filter(business_id=business_id).values_list('version', 'updated_at').first()
+        if version is None:
+            summary = rebuild_summary(business_id)
+            version = (summary.version, summary.updated_at)
+        cache.set(version_cache_key(business_id), version, getattr(settings, 'INVENTORY_VERSION_CACHE_TIMEOUT', 5))
+    return version
+
+
+async def aget_version(business_id):
+    """get_version() for async views."""
+    version = await cache.aget(version_cache_key(business_id))
+    if version is None:
+        version = await BusinessSummary.objects.filter(business_id=business_id).values_list(
+            'version', 'updated_at'
+        ).afirst()
+        if version is None:
+            summary = await sync_to_async(rebuild_summary)(business_id)
+            version = (summary.version, summary.updated_at)
+        await cache.aset(version_cache_key(business_id), version, getattr(settings, 'INVENTORY_VERSION_CACHE_TIMEOUT', 5))
+    return version
+
+
+def invalidate_version(business_id):
+    # Drop the entry now and again after commit, so a read that cached the
+    # pre-commit version in between does not outlive the transaction.
+    cache.delete(version_cache_key(business_id))
+    transaction.on_commit(lambda: cache.delete(version_cache_key(business_id)), using=tenant_db())
@@ -0,0 +1,49 @@
+from django import template
+
+from ..fragments import cached_fragment
+
+
+register = template.Library()
+
+
+class VersionedCacheNode(template.Node):
+
+    def __init__(self, nodelist, name, business, vary_on):
+        self.nodelist = nodelist
+        self.name = name
+        self.business = business
+        self.vary_on = vary_on
+
+    def render(self, context):
+        name = self.name.resolve(context)
+        business = self.business.resolve(context)
+        business_id = getattr(business, 'pk', business)
+        if business_id is None:
+            return self.nodelist.render(context)
+        vary_on = [str(var.resolve(context)) for var in self.vary_on]
+        return cached_fragment(name, business_id, vary_on, lambda: self.nodelist.render(context))
+
+
+@register.tag
+def versioned_cache(parser, token):
+    """
+    Cache the enclosed HTML until the business's data changes::
+
+        {% versioned_cache 'product-table' current_business search cursor %}
+            ...
+        {% endversioned_cache %}
+
+    The first argument names the fragment, the second is the business (or
+    its id); any further ones are values the fragment varies on.
+    """
+    nodelist = parser.parse(('endversioned_cache',))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' takes a fragment name and a business.")
+    return VersionedCacheNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        parser.compile_filter(bits[2]),
+        [parser.compile_filter(bit) for bit in bits[3:]],
+    )
@@ -0,0 +1,203 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404
+from django.utils.functional import SimpleLazyObject
+
+from .authentication import business_claims
+from .models import Business
+from .sharding import use_business
+
+
+CACHE_TIMEOUT = 10 * 60
+SESSION_KEY = 'current_business_id'
+
+
+def cache_key(user_id):
+    return f'inventory:owned-businesses:{user_id}'
+
+
+def owned_businesses(user):
+    """``{id: Business}`` for every business the user owns, cached per user."""
+    if not user.is_authenticated:
+        return {}
+
+    businesses = cache.get(cache_key(user.pk))
+    if businesses is None:
+        businesses = {business.id: business for business in Business.objects.filter(owner=user).order_by('id')}
+        cache.set(cache_key(user.pk), businesses, CACHE_TIMEOUT)
+    for business in businesses.values():
+        # Cached without the owner; reattach the user we already have.
+        business.owner = user
+    return businesses
+
+
+async def aowned_businesses(user):
+    """owned_businesses() for async views; shares its cache entries."""
+    if not user.is_authenticated:
+        return {}
+
+    businesses = await cache.aget(cache_key(user.pk))
+    if businesses is None:
+        businesses = {business.id: business async for business in Business.objects.filter(owner=user).order_by('id')}
+        await cache.aset(cache_key(user.pk), businesses, CACHE_TIMEOUT)
+    for business in businesses.values():
+        business.owner = user
+    return businesses
+
+
+def owned_business(user, business_id):
+    """
+    The user's business ``business_id``, or ``None``. The cached list may
+    predate a business created by another process, so an id missing from
+    it is looked up in the database before it counts as not owned.
+    """
+    business = owned_businesses(user).get(business_id)
+    if business is None and user.is_authenticated:
+        business = Business.objects.filter(owner=user, id=business_id).first()
+        if business is not None:
+            cache.delete(cache_key(user.pk))
+    return business
+
+
+async def aowned_business(user, business_id):
+    """owned_business() for async views."""
+    business = (await aowned_businesses(user)).get(business_id)
+    if business is None and user.is_authenticated:
+        business = await Business.objects.filter(owner=user, id=business_id).afirst()
+        if business is not None:
+            await cache.adelete(cache_key(user.pk))
+    return business
+
+
+def business_key(business_id):
+    return f'inventory:business:{business_id}'
+
+
+def cached_business(business_id):
+    """One Business by id, cached whoever owns it; ``None`` if there is none."""
+    business = cache.get(business_key(business_id))
+    if business is None:
+        business = Business.objects.filter(id=business_id).first() or False
+        cache.set(business_key(business_id), business, CACHE_TIMEOUT)
+    return business or None
+
+
+async def acached_business(business_id):
+    business = await cache.aget(business_key(business_id))
+    if business is None:
+        business = await Business.objects.filter(id=business_id).afirst() or False
+        await cache.aset(business_key(business_id), business, CACHE_TIMEOUT)
+    return business or None
+
+
+def _claimed_business(business, user):
+    if business is None or business.owner_id != user.pk:
+        return None
+    business.owner = user
+    return business
+
+
+def get_owned_business(user, business_id, claimed=None):
+    """
+    The user's business with ``business_id``, or Http404. ``claimed`` is
+    the token's set of owned business ids (see inventory.authentication):
+    a claimed business is checked on its own instead of loading them all.
+    """
+    try:
+        business_id = int(business_id)
+    except (TypeError, ValueError):
+        raise Http404('No Business matches the given query.')
+
+    if claimed is not None and business_id in claimed:
+        business = _claimed_business(cached_business(business_id), user)
+        if business is not None:
+            return business
+    business = owned_business(user, business_id)
+    if business is None:
+        raise Http404('No Business matches the given query.')
+    return business
+
+
+async def aget_owned_business(user, business_id, claimed=None):
+    """get_owned_business() for async views, returning ``None`` instead of raising."""
+    if claimed is not None and business_id in claimed:
+        business = _claimed_business(await acached_business(business_id), user)
+        if business is not None:
+            return business
+    return await aowned_business(user, business_id)
+
+
+def invalidate_owner(sender, instance, **kwargs):
+    """post_save/post_delete receiver for Business."""
+    keys = [cache_key(instance.owner_id), business_key(instance.pk)]
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def resolve_current_business(request):
+    """The owned business selected in the session; a stale selection is dropped."""
+    business_id = request.session.get(SESSION_KEY)
+    if not business_id:
+        return None
+
+    business = owned_business(request.user, business_id)
+    if business is None:
+        del request.session[SESSION_KEY]
+    else:
+        use_business(business)
+    return business
+
+
+def select_business(request, business):
+    """
+    Make ``business`` the session's current business, saving the session
+    only if it changes, and route the rest of the request to its shard.
+    """
+    if request.session.get(SESSION_KEY) != business.id:
+        request.session[SESSION_KEY] = business.id
+    use_business(business)
+
+
+class CurrentBusinessMiddleware:
+    """
+    Set ``request.current_business`` for the HTML views, resolved at most
+    once per request and only if a view asks for it.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        request.current_business = SimpleLazyObject(lambda: resolve_current_business(request))
+        return self.get_response(request)
+
+
+def get_current_business(request):
+    """
+    ``request.current_business`` unwrapped to a plain Business or ``None``,
+    so views can pass it to the ORM and compare it with ``is None``.
+    """
+    business = request.current_business
+    return business._wrapped if business else None
+
+
+class BusinessScopedMixin:
+    """For API views routed under ``businesses/<business_id>/``."""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # Resolve the business before any serializer runs, so every query goes to its shard.
+        self.get_business()
+
+    def get_business(self):
+        if not hasattr(self, '_business'):
+            self._business = get_owned_business(
+                self.request.user, self.kwargs.get('business_id'), business_claims(self.request.auth)
+            )
+            use_business(self._business)
+        return self._business
@@ -1,3 +1,1271 @@
-from django.test import TestCase
+import gzip
+import hashlib
+import hmac
+import json
+import sqlite3
+import tempfile
+import threading
+from datetime import date, timedelta
+from io import StringIO
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import numpy as np
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.cache import cache, caches
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.db import connection
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from .authentication import users as auth_users
+from .forecasting import forecast
+from .fragments import counters as fragment_counters, stats as fragment_stats
+from .models import Business, BusinessSummary, DailyMovement, OutboxEvent, Product, StockSnapshot, StockTransaction, WebhookEndpoint
+from .services import apply_stock_transaction, apply_stock_transactions_bulk, InsufficientStock, save_product, delete_product
+from .summary import rebuild_summary, version_cache_key
+from .streaming import accepts_gzip
+from .snapshots import take_snapshots, stock_at, business_stock_at
+from .rollups import rebuild_movements
+from .outbox import endpoint_key
+from .querybudget import query_budget
+from .routing import PIN_COOKIE, is_pinned, reads_from, replica_reads
+from .serializers import ProductSerializer, StockTransactionSerializer
+from .sharding import ID_RANGE, check_shared_cache, tenant, tenant_db
+
+
+def bearer(user):
+    return f'Bearer {AccessToken.for_user(user)}'
+
+
+class InventoryTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        caches['fragments'].clear()
+        fragment_counters.clear()
+        auth_users.clear()
+        self.user = User.objects.create_user(username='owner', password='s3cret-pass')
+        self.business = Business.objects.create(name='Shop', address='Main St', owner=self.user)
+        self.product = save_product(Product(
+            business=self.business, name='Widget', sku='W1',
+            category='Tools', current_quantity=10, reorder_level=3, unit='pcs'
+        ))
+
+    def api_client(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        return client
+
+    def login(self, business=None):
+        self.client.force_login(self.user)
+        session = self.client.session
+        session['current_business_id'] = (business or self.business).id
+        session.save()
+
+
+class StockServiceTests(InventoryTestCase):
+
+    def test_in_and_out_update_quantity(self):
+        apply_stock_transaction(StockTransaction(product=self.product, type='In', quantity=5))
+        apply_stock_transaction(StockTransaction(product=self.product, type='Out', quantity=12))
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.current_quantity, 3)
+        self.assertEqual(StockTransaction.objects.count(), 2)
+
+    def test_oversell_is_rejected_without_writing(self):
+        with self.assertRaises(InsufficientStock) as raised:
+            apply_stock_transaction(StockTransaction(product=self.product, type='Out', quantity=11))
+
+        self.assertEqual(raised.exception.available, 10)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.current_quantity, 10)
+        self.assertFalse(StockTransaction.objects.exists())
+
+    def test_ledger_rows_carry_their_business(self):
+        apply_stock_transaction(StockTransaction(product=self.product, type='In', quantity=5))
+        self.assertEqual(StockTransaction.objects.get().business_id, self.business.id)
+
+        # Listing the ledger filters on the denormalized column, without joining products.
+        queryset = StockTransaction.objects.filter(business=self.business).order_by('-created_at', '-id')
+        self.assertNotIn('JOIN', str(queryset.query))
+
+    def test_api_create_applies_transaction(self):
+        response = self.api_client().post(
+            f'/api/businesses/{self.business.id}/transactions/',
+            {'product': self.product.id, 'type': 'Out', 'quantity': 4},
+        )
+
+        self.assertEqual(response.status_code, 201)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.current_quantity, 6)
+
+
+class BulkTransactionTests(InventoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.url = f'/api/businesses/{self.business.id}/transactions/bulk/'
+        self.other = save_product(Product(
+            business=self.business, name='Gadget', sku='G1',
+            category='Tools', current_quantity=0, unit='pcs'
+        ))
+
+    def test_atomic_batch_writes_nothing_when_an_item_fails(self):
+        response = self.api_client().post(self.url, {'transactions': [
+            {'product': self.product.id, 'type': 'Out', 'quantity': 4},
+            {'product': self.other.id, 'type': 'Out', 'quantity': 1},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([r['status'] for r in response.data['results']], ['skipped', 'rejected'])
+        self.assertNotIn('id', response.data['results'][0])
+        self.assertEqual([response.data[key] for key in ('created', 'rejected', 'skipped')], [0, 1, 1])
+        self.assertFalse(StockTransaction.objects.exists())
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.current_quantity, 10)
+
+    def test_best_effort_batch_nets_quantities_per_product(self):
+        # One of them looks up (and caches) the business's webhook endpoint.
+        with self.assertNumQueries(10):
+            response = self.api_client().post(self.url, {'atomic': False, 'transactions': [
+                {'product': self.product.id, 'type': 'Out', 'quantity': 8},
+                {'product': self.product.id, 'type': 'Out', 'quantity': 8},
+                {'product': self.product.id, 'type': 'In', 'quantity': 5},
+                {'product': self.other.id, 'type': 'Sideways', 'quantity': 1},
+            ]}, format='json')
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual([r['status'] for r in response.data['results']],
+                         ['created', 'rejected', 'created', 'rejected'])
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.current_quantity, 7)
+        self.assertEqual(StockTransaction.objects.count(), 2)
+
+
+class ExportTests(InventoryTestCase):
+
+    def test_streams_transaction_ledger_as_csv(self):
+        apply_stock_transaction(StockTransaction(product=self.product, type='In', quantity=5))
+
+        response = self.api_client().get(f'/api/businesses/{self.business.id}/export/transactions.csv')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'id,created_at,product_id,product_sku,product_name,type,quantity')
+        self.assertTrue(lines[1].endswith(',W1,Widget,In,5'))
+
+    def test_gzip_ndjson_products(self):
+        response = self.api_client().get(
+            f'/api/businesses/{self.business.id}/export/products.ndjson?gzip=1'
+        )
+
+        body = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(json.loads(body.splitlines()[0])['sku'], 'W1')
+        self.assertIn('products-', response['Content-Disposition'])
+
+
+class KeysetPaginationTests(InventoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        StockTransaction.objects.bulk_create([
+            StockTransaction(product=self.product, business=self.business, type='In', quantity=n) for n in range(7)
+        ])
+        # Identical timestamps force the id tie-breaker to do its job.
+        StockTransaction.objects.update(created_at=timezone.now())
+
+    def test_api_walks_ledger_forward_and_back(self):
+        client = self.api_client()
+        url = f'/api/businesses/{self.business.id}/transactions/?page_size=3'
+
+        seen = []
+        pages = []
+        while url:
+            response = client.get(url)
+            pages.append(response.data)
+            seen += [row['id'] for row in response.data['results']]
+            url = response.data['next']
+
+        expected = list(StockTransaction.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+        self.assertEqual(len(pages), 3)
+
+        previous = client.get(pages[-1]['previous']).data
+        self.assertEqual(previous['results'], pages[1]['results'])
+
+    def test_html_transaction_list_is_paginated(self):
+        self.login()
+
+        response = self.client.get('/business/transaction/list')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['transactions']), 7)
+        self.assertIsNone(response.context['next_url'])
+
+
+class BusinessSummaryTests(InventoryTestCase):
+
+    def assertSummaryMatchesRebuild(self):
+        summary = self.business.summary
+        summary.refresh_from_db()
+        current = (summary.total_products, summary.total_units,
+                   summary.low_stock_count, summary.out_of_stock_count)
+        rebuilt = rebuild_summary(self.business.id)
+        self.assertEqual(current, (rebuilt.total_products, rebuilt.total_units,
+                                   rebuilt.low_stock_count, rebuilt.out_of_stock_count))
+        return current
+
+    def test_summary_follows_product_and_stock_writes(self):
+        self.assertEqual(self.assertSummaryMatchesRebuild(), (1, 10, 0, 0))
+
+        apply_stock_transaction(StockTransaction(product=self.product, type='Out', quantity=8))
+        self.assertEqual(self.assertSummaryMatchesRebuild(), (1, 2, 1, 0))
+
+        client = self.api_client()
+        client.patch(f'/api/businesses/{self.business.id}/products/{self.product.id}/', {'reorder_level': 1})
+        created = client.post(f'/api/businesses/{self.business.id}/products/', {
+            'name': 'Gadget', 'sku': 'G1', 'category': 'Tools', 'unit': 'pcs'
+        })
+        self.assertEqual(self.assertSummaryMatchesRebuild(), (2, 2, 1, 1))
+
+        delete_product(Product.objects.get(pk=created.data['id']))
+        self.assertEqual(self.assertSummaryMatchesRebuild(), (1, 2, 0, 0))
+
+    def test_dashboard_reads_summary(self):
+        self.login()
+
+        response = self.client.get('/')
+
+        self.assertEqual(response.context['total_products'], 1)
+        self.assertEqual(response.context['total_stock_value'], 10)
+
+
+class LowStockTests(InventoryTestCase):
+
+    def test_feed_is_sorted_by_shortfall_and_follows_writes(self):
+        save_product(Product(business=self.business, name='Bolt', sku='B1', category='Tools',
+                             current_quantity=1, reorder_level=9, unit='pcs'))
+        apply_stock_transaction(StockTransaction(product=self.product, type='Out', quantity=8))
+
+        response = self.api_client().get(f'/api/businesses/{self.business.id}/low-stock/')
+
+        self.assertEqual([(row['sku'], row['shortfall']) for row in response.data['results']],
+                         [('B1', 8), ('W1', 1)])
+
+        self.api_client().patch(
+            f'/api/businesses/{self.business.id}/products/{self.product.id}/', {'reorder_level': 0}
+        )
+        response = self.api_client().get(f'/api/businesses/{self.business.id}/low-stock/')
+        self.assertEqual([row['sku'] for row in response.data['results']], ['B1'])
+
+    def test_shortfall_is_enforced_by_the_database(self):
+        with self.assertRaises(IntegrityError):
+            Product.objects.filter(pk=self.product.pk).update(current_quantity=0)
+
+
+class ProductSearchTests(InventoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        save_product(Product(business=self.business, name='Copper Pipe', sku='CP200', category='Plumbing',
+                             unit='m', supplier_name='Widgetworks'))
+
+    def search(self, query):
+        response = self.api_client().get(
+            f'/api/businesses/{self.business.id}/products/', {'search': query}
+        )
+        return sorted(row['sku'] for row in response.data['results'])
+
+    def test_list_search_matches_substrings_through_the_index(self):
+        self.assertEqual(self.search('idge'), ['CP200', 'W1'])
+        self.assertEqual(self.search('p20'), ['CP200'])
+
+        self.product.name = 'Sprocket'
+        save_product(self.product)
+        self.assertEqual(self.search('idge'), ['CP200'])
+
+        delete_product(Product.objects.get(sku='CP200'))
+        self.assertEqual(self.search('idge'), [])
+
+    def test_ranked_search_prefers_name_and_short_circuits_exact_sku(self):
+        url = f'/api/businesses/{self.business.id}/products/search/'
+
+        response = self.api_client().get(url, {'q': 'widget'})
+        self.assertEqual([row['sku'] for row in response.data], ['W1', 'CP200'])
+
+        with self.assertNumQueries(1):
+            response = self.api_client().get(url, {'q': 'CP200'})
+        self.assertEqual([row['sku'] for row in response.data], ['CP200'])
+
+
+class CategoryFacetTests(InventoryTestCase):
+
+    def facets(self):
+        response = self.api_client().get(f'/api/businesses/{self.business.id}/categories/')
+        return [(row['category'], row['product_count'], row['low_stock_count']) for row in response.data]
+
+    def test_facets_follow_product_and_stock_writes(self):
+        other_user = User.objects.create_user(username='other', password='s3cret-pass')
+        other_business = Business.objects.create(name='Elsewhere', owner=other_user)
+        save_product(Product(business=other_business, name='Secret', sku='S1', category='Hidden', unit='pcs'))
+
+        self.assertEqual(self.facets(), [('Tools', 1, 0)])
+
+        gadget = save_product(Product(business=self.business, name='Gadget', sku='G1',
+                                      category='Gizmos', unit='pcs'))
+        apply_stock_transaction(StockTransaction(product=self.product, type='Out', quantity=9))
+        self.assertEqual(self.facets(), [('Gizmos', 1, 1), ('Tools', 1, 1)])
+
+        gadget.category = 'Tools'
+        save_product(gadget)
+        self.assertEqual(self.facets(), [('Tools', 2, 2)])
+
+        delete_product(self.product)
+        self.assertEqual(self.facets(), [('Tools', 1, 1)])
+
+    def test_other_workers_see_new_categories_once_their_version_expires(self):
+        self.assertEqual(self.facets(), [('Tools', 1, 0)])
+        # Written by another worker: this one's cached version, and so its facets, are left alone...
+        with mock.patch('inventory.summary.invalidate_version'):
+            save_product(Product(business=self.business, name='Gadget', sku='G1', category='Gizmos', unit='pcs'))
+        self.assertEqual(self.facets(), [('Tools', 1, 0)])
+
+        # ...until the version entry expires, as deleting it simulates.
+        cache.delete(version_cache_key(self.business.id))
+        self.assertEqual(self.facets(), [('Gizmos', 1, 1), ('Tools', 1, 0)])
+
+
+class CurrentBusinessTests(InventoryTestCase):
+
+    def test_business_resolved_from_cache_after_first_request(self):
+        self.login()
+        self.client.get('/business/products/list')
+
+        # Only the user lookup remains; the session and Business come from cache.
+        with self.assertNumQueries(1):
+            response = self.client.get('/business/list')
+        self.assertEqual(response.context['current_business'], self.business)
+
+    def test_cache_is_invalidated_when_a_business_changes(self):
+        self.login()
+        self.client.get('/business/list')
+
+        self.business.name = 'Renamed'
+        self.business.save()
+
+        response = self.client.get('/business/list')
+        self.assertEqual(response.context['current_business'].name, 'Renamed')
+
+    def test_business_created_by_another_process_is_found(self):
+        self.login()
+        self.client.get('/business/list')
+        # bulk_create sends no post_save, like a write whose invalidation ran in another process.
+        [annex] = Business.objects.bulk_create([Business(name='Annex', address='Side St', owner=self.user)])
+
+        response = self.client.get(reverse('business-switch', args=[annex.id]))
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+        self.assertEqual(self.client.get('/business/list').context['current_business'], annex)
+        self.assertEqual(self.client.session['current_business_id'], annex.id)
+
+    def test_foreign_business_in_session_is_dropped(self):
+        other_user = User.objects.create_user(username='other', password='s3cret-pass')
+        other_business = Business.objects.create(name='Elsewhere', owner=other_user)
+        self.login(other_business)
+
+        response = self.client.get('/business/products/list')
+
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+        self.assertNotIn('current_business_id', self.client.session)
+
+    def test_api_rejects_products_from_another_business(self):
+        other_business = Business.objects.create(name='Second', address='', owner=self.user)
+
+        response = self.api_client().post(
+            f'/api/businesses/{other_business.id}/transactions/',
+            {'product': self.product.id, 'type': 'In', 'quantity': 1},
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(StockTransaction.objects.exists())
+
+
+
+class StockSnapshotTests(InventoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.start = timezone.now()
+        self.moves = []
+        for transaction_type, quantity in [('In', 5), ('Out', 8), ('In', 20), ('Out', 2)]:
+            self.moves.append(apply_stock_transaction(
+                StockTransaction(product=self.product, type=transaction_type, quantity=quantity)
+            ))
+        # Spread the ledger out an hour apart, starting from 10 on hand.
+        for hours, move in enumerate(self.moves, start=1):
+            StockTransaction.objects.filter(pk=move.pk).update(created_at=self.start + timedelta(hours=hours))
+        self.expected = {0: 10, 1: 15, 2: 7, 3: 27, 4: 25}
+
+    def at(self, hours):
+        return self.start + timedelta(hours=hours, minutes=30) if hours else self.start
+
+    def test_history_without_snapshots_unwinds_from_current_quantity(self):
+        for hours, quantity in self.expected.items():
+            self.assertEqual(stock_at(self.product, self.at(hours))[0], quantity)
+
+    def test_snapshot_plus_tail_matches_replay(self):
+        take_snapshots(self.business.id)
+        StockSnapshot.objects.update(taken_at=self.at(2), quantity=7, last_transaction_id=self.moves[1].pk)
+
+        for hours, quantity in self.expected.items():
+            with self.subTest(hours=hours):
+                self.assertEqual(stock_at(self.product, self.at(hours))[0], quantity)
+                self.assertEqual(business_stock_at(self.business, self.at(hours))[1], {self.product.id: quantity})
+
+        with self.assertNumQueries(2):
+            quantity, snapshot = stock_at(self.product, self.at(3))
+        self.assertEqual(snapshot.taken_at, self.at(2))
+
+    def test_api_answers_for_a_date_and_rejects_garbage(self):
+        url = f'/api/businesses/{self.business.id}/products/{self.product.id}/stock-at/'
+        response = self.api_client().get(url, {'ts': self.at(2).isoformat()})
+        self.assertEqual(response.json()['quantity'], 7)
+
+        response = self.api_client().get(f'/api/businesses/{self.business.id}/stock-at/', {'ts': '2000-01-01'})
+        self.assertEqual(response.json()['results'], [{'product': self.product.id, 'quantity': 10}])
+
+        self.assertEqual(self.api_client().get(url, {'ts': 'March 31'}).status_code, 400)
+
+
+class DailyMovementTests(InventoryTestCase):
+
+    def rollups(self):
+        return list(DailyMovement.objects.order_by('day').values_list(
+            'day', 'units_in', 'units_out', 'transaction_count'
+        ))
+
+    def test_rollups_follow_single_and_bulk_writes_and_match_a_rebuild(self):
+        today = timezone.localdate()
+        apply_stock_transaction(StockTransaction(product=self.product, type='In', quantity=5))
+        self.api_client().post(f'/api/businesses/{self.business.id}/transactions/bulk/', {'transactions': [
+            {'product': self.product.id, 'type': 'Out', 'quantity': 7},
+            {'product': self.product.id, 'type': 'Out', 'quantity': 1},
+        ]}, format='json')
+
+        self.assertEqual(self.rollups(), [(today, 5, 8, 3)])
+        self.assertEqual(rebuild_movements(self.business.id), 1)
+        self.assertEqual(self.rollups(), [(today, 5, 8, 3)])
+
+    def test_report_groups_rollups_by_interval(self):
+        for day, units_in, units_out in [(1, 10, 2), (3, 0, 3), (8, 4, 0)]:
+            DailyMovement.objects.create(
+                business=self.business, product=self.product, day=date(2026, 3, day),
+                units_in=units_in, units_out=units_out, transaction_count=2,
+            )
+        url = f'/api/businesses/{self.business.id}/movements/'
+
+        response = self.api_client().get(url, {'start': '2026-03-01', 'end': '2026-03-31', 'interval': 'week'})
+        self.assertEqual(response.data['results'], [
+            {'period': date(2026, 2, 23), 'units_in': 10, 'units_out': 2, 'transactions': 2, 'net': 8},
+            {'period': date(2026, 3, 2), 'units_in': 4, 'units_out': 3, 'transactions': 4, 'net': 1},
+        ])
+
+        response = self.api_client().get(url, {'start': '2026-03-02', 'end': '2026-03-01'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ReorderForecastTests(InventoryTestCase):
+
+    def test_forecast_ranks_products_by_days_of_stock_left(self):
+        slow = save_product(Product(business=self.business, name='Slow', sku='S1', category='Tools',
+                                    current_quantity=100, unit='pcs'))
+        idle = save_product(Product(business=self.business, name='Idle', sku='I1', category='Tools',
+                                    current_quantity=5, unit='pcs'))
+        today = timezone.localdate()
+        for days_ago in range(28):
+            # Widget: 2 units every day; Slow: 14 units once a week.
+            DailyMovement.objects.create(business=self.business, product=self.product,
+                                         day=today - timedelta(days=days_ago), units_out=2, transaction_count=1)
+            if days_ago % 7 == 0:
+                DailyMovement.objects.create(business=self.business, product=slow,
+                                             day=today - timedelta(days=days_ago), units_out=14, transaction_count=1)
+
+        response = self.api_client().get(f'/api/businesses/{self.business.id}/reorder-forecast/', {
+            'window_days': 28, 'lead_time_days': 7, 'cover_days': 7, 'service_level': 0.5,
+        })
+
+        self.assertEqual(response.data['products'], 3)
+        widget, slow_row, idle_row = response.data['results']
+        self.assertEqual((widget['product'], widget['avg_daily_out'], widget['days_until_stockout']),
+                         (self.product.id, 2.0, 5.0))
+        self.assertEqual((widget['reorder_point'], widget['suggested_quantity'], widget['needs_reorder']),
+                         (14.0, 18, True))
+        self.assertEqual((slow_row['days_until_stockout'], slow_row['needs_reorder']), (50.0, False))
+        self.assertEqual((idle_row['product'], idle_row['days_until_stockout']), (idle.id, None))
+
+    def test_movements_of_products_outside_the_extract_are_ignored(self):
+        # Products 1 and 9 were deleted, 3 created, between the product and movement extracts.
+        result = forecast(
+            np.array([2, 5]), np.array([10, 10]), np.array([1, 3, 5, 9]), np.array([7, 7, 4, 7]),
+            window_days=4, lead_time_days=1, cover_days=1, service_level=0.5,
+        )
+        self.assertEqual(result['avg_daily_out'].tolist(), [0.0, 1.0])
+        self.assertEqual(result['days_left'].tolist(), [float('inf'), 10.0])
+
+    def test_invalid_parameters_are_rejected(self):
+        response = self.api_client().get(f'/api/businesses/{self.business.id}/reorder-forecast/',
+                                         {'service_level': 2})
+        self.assertEqual(response.status_code, 400)
+
+
+class ConditionalGetTests(InventoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.api = self.api_client()
+        self.url = f'/api/businesses/{self.business.id}/products/'
+
+    def test_unchanged_list_is_304_then_served_from_cache(self):
+        first = self.api.get(self.url)
+        self.assertEqual(first['X-Response-Cache'], 'miss')
+        self.assertIn('Last-Modified', first)
+
+        with self.assertNumQueries(0):
+            not_modified = self.api.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+            cached = self.api.get(self.url)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], first['ETag'])
+        self.assertEqual((cached['X-Response-Cache'], cached.content), ('hit', first.content))
+
+        # A different page is a different representation.
+        self.assertNotEqual(self.api.get(self.url, {'search': 'Widget'})['ETag'], first['ETag'])
+
+    def test_other_workers_see_a_write_once_their_version_expires(self):
+        first = self.api.get(self.url)
+        # The write's invalidation runs in another worker; this one keeps its cached version...
+        with mock.patch('inventory.summary.invalidate_version'):
+            apply_stock_transaction(StockTransaction(product=self.product, type='In', quantity=5))
+        self.assertEqual(self.api.get(self.url, HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+        # ...only briefly: the entry expires within seconds, as clearing this process's cache simulates.
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            cache.clear()
+            response = self.api.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertEqual(response.data['results'][0]['current_quantity'], 15)
+        [timeout] = [call.args[2] for call in cache_set.call_args_list if 'business-version' in call.args[0]]
+        self.assertLessEqual(timeout, 5)
+
+    def test_browsable_api_pages_are_not_cached(self):
+        for _ in range(2):
+            page = self.api.get(self.url, HTTP_ACCEPT='text/html')
+            self.assertContains(page, 'csrfmiddlewaretoken')
+            self.assertNotIn('X-Response-Cache', page)
+            self.assertNotIn('ETag', page)
+        self.assertEqual(self.api.get(self.url)['X-Response-Cache'], 'miss')
+        self.assertEqual(self.api.get(self.url)['X-Response-Cache'], 'hit')
+
+    @override_settings(INVENTORY_VERSION_CACHE_TIMEOUT=60)
+    def test_version_cache_timeout_follows_the_setting(self):
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            self.api.get(self.url)
+        [timeout] = [call.args[2] for call in cache_set.call_args_list if 'business-version' in call.args[0]]
+        self.assertEqual(timeout, 60)
+
+    def test_stock_write_changes_etag_and_content(self):
+        detail = f'/api/businesses/{self.business.id}/products/{self.product.id}/'
+        etags = [self.api.get(url)['ETag'] for url in (self.url, detail)]
+
+        self.api.post(f'/api/businesses/{self.business.id}/transactions/',
+                      {'product': self.product.id, 'type': 'Out', 'quantity': 4})
+
+        response = self.api.get(detail, HTTP_IF_NONE_MATCH=etags[1])
+        self.assertEqual((response.status_code, response.data['current_quantity']), (200, 6))
+        self.assertEqual(self.api.get(self.url, HTTP_IF_NONE_MATCH=etags[0]).status_code, 200)
+
+    def test_other_owners_get_404_not_304(self):
+        etag = self.api.get(self.url)['ETag']
+        stranger = APIClient()
+        stranger.force_authenticate(User.objects.create_user(username='stranger', password='x-pass-123'))
+        self.assertEqual(stranger.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 404)
+
+
+class SparseFieldsetTests(InventoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for quantity in (4, 2):
+            apply_stock_transaction(StockTransaction(product=self.product, type='Out', quantity=quantity))
+        self.api = self.api_client()
+        self.base = f'/api/businesses/{self.business.id}'
+
+    def test_values_lists_match_the_serializers(self):
+        transactions = StockTransaction.objects.select_related('product').order_by('-created_at', '-id')
+        self.assertEqual(
+            self.api.get(f'{self.base}/transactions/').json()['results'],
+            json.loads(json.dumps(StockTransactionSerializer(transactions, many=True).data)),
+        )
+        self.assertEqual(
+            self.api.get(f'{self.base}/products/').json()['results'],
+            [dict(ProductSerializer(self.product).data)],
+        )
+
+    def test_fields_narrow_the_columns_and_the_output(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.api.get(f'{self.base}/transactions/', {'fields': 'quantity,product_name'})
+        self.assertEqual(response.json()['results'], [
+            {'product_name': 'Widget', 'quantity': 2}, {'product_name': 'Widget', 'quantity': 4},
+        ])
+        listing = queries.captured_queries[-1]['sql']
+        self.assertNotIn('"type"', listing)
+        self.assertNotIn('sku', listing)
+
+        response = self.api.get(f'{self.base}/products/{self.product.id}/', {'fields': 'id,sku'})
+        self.assertEqual(response.json(), {'id': self.product.id, 'sku': 'W1'})
+
+    def test_stream_returns_every_row_as_one_array(self):
+        url = f'{self.base}/transactions/'
+        first_page = self.api.get(url, {'page_size': 1, 'fields': 'id,quantity'}).json()['results']
+
+        response = self.api.get(url, {'stream': 1, 'fields': 'id,quantity'})
+        self.assertTrue(response.streaming)
+        rows = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(rows, [{'id': t.id, 'quantity': t.quantity}
+                                for t in StockTransaction.objects.order_by('-created_at', '-id')])
+        self.assertEqual(rows[:1], first_page)
+
+        response = self.api.get(url, {'stream': 1}, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(response['ETag'].startswith('W/'))
+        self.assertEqual(len(json.loads(gzip.decompress(b''.join(response.streaming_content)))), 2)
+
+        response = self.api.get(url, {'stream': 1}, HTTP_ACCEPT_ENCODING='gzip;q=0, deflate')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(len(json.loads(b''.join(response.streaming_content))), 2)
+
+    def test_gzip_is_only_sent_when_accepted(self):
+        for header, expected in [
+            ('gzip, deflate', True), ('br;q=1.0, gzip;q=0.8', True), ('*', True), ('x-gzip', True),
+            ('gzip;q=0', False), ('GZIP; Q=0.0', False), ('*;q=0', False), ('gzip;q=0, *', False), ('', False),
+        ]:
+            with self.subTest(header=header):
+                self.assertIs(accepts_gzip(header), expected)
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.api.get(f'{self.base}/products/', {'fields': 'id,secret'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('secret', response.json()['fields'][0])
+
+
+class AsyncReadTests(InventoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for n in range(3):
+            product = save_product(Product(business=self.business, name=f'Part {n}', sku=f'P{n}',
+                                           category='Parts', reorder_level=5, unit='pcs'))
+            apply_stock_transaction(StockTransaction(product=product, type='In', quantity=n + 1))
+        self.client.defaults['HTTP_AUTHORIZATION'] = bearer(self.user)
+
+    def test_async_endpoints_serve_the_same_json(self):
+        base = f'/businesses/{self.business.id}'
+        for path in [
+            f'{base}/products/?page_size=2',
+            f'{base}/products/?page_size=2&search=Part',
+            f'{base}/products/{self.product.id}/',
+            f'{base}/products/{self.product.id}/?fields=id,name',
+            f'{base}/transactions/?type=In',
+            f'{base}/transactions/?fields=id,product_name,created_at',
+            f'{base}/summary/',
+        ]:
+            with self.subTest(path=path):
+                sync = self.client.get(f'/api{path}')
+                async_ = self.client.get(f'/api/async{path}')
+                self.assertEqual(async_.status_code, 200)
+                self.assertEqual(
+                    json.loads(async_.content.replace(b'/api/async/', b'/api/')),
+                    json.loads(sync.content),
+                )
+
+        # Follow the async cursor to the last page.
+        page = self.client.get(f'/api/async{base}/products/?page_size=2').json()
+        last = self.client.get(page['next']).json()
+        self.assertEqual([p['name'] for p in last['results']], ['Part 1', 'Part 2'])
+
+    def test_async_endpoints_check_token_ownership_and_etag(self):
+        url = f'/api/async/businesses/{self.business.id}/products/'
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='').status_code, 401)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer nope').status_code, 401)
+
+        stranger = User.objects.create_user(username='stranger', password='x-pass-123')
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION=bearer(stranger)).status_code, 404)
+        self.assertEqual(self.client.post(url).status_code, 405)
+
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+
+@override_settings(INVENTORY_READ_REPLICA='replica')
+class ReplicaRoutingTests(InventoryTestCase):
+
+    def test_only_product_and_ledger_reads_use_the_replica(self):
+        with reads_from('replica'):
+            self.assertEqual(Product.objects.all().db, 'replica')
+            self.assertEqual(StockTransaction.objects.all().db, 'replica')
+            self.assertEqual(Business.objects.all().db, 'default')
+            self.assertEqual(Product.objects.all()._db or 'default', 'default')  # writes
+        self.assertEqual(Product.objects.all().db, 'default')
+
+    def test_api_reads_replica_until_the_user_writes(self):
+        api = self.api_client()
+        url = f'/api/businesses/{self.business.id}/products/'
+        read_from = []
+
+        def lagging(business_id, version):
+            read_from.append(Product.objects.all().db)
+            return True  # so the request falls back to the primary, the only test database
+
+        with mock.patch('inventory.conditional.replica_lags', side_effect=lagging):
+            self.assertEqual(api.get(url).status_code, 200)
+            self.assertNotIn(PIN_COOKIE, api.cookies)
+
+            api.post(f'/api/businesses/{self.business.id}/transactions/',
+                     {'product': self.product.id, 'type': 'In', 'quantity': 1})
+            self.assertIn(PIN_COOKIE, api.cookies)
+            self.assertEqual(api.get(url, {'page_size': 5}).status_code, 200)
+
+        self.assertEqual(read_from, ['replica', 'default'])
+
+    def test_pin_is_seen_by_other_workers(self):
+        self.login()
+        response = self.client.post(reverse('transaction_add'), {'product': self.product.id, 'type': 'In', 'quantity': 1})
+        self.assertEqual(response.status_code, 302)
+        # Nothing about the pin is kept in this process.
+        cache.clear()
+
+        request = RequestFactory().get('/products/')
+        request.user = self.user
+        request.COOKIES = {key: morsel.value for key, morsel in self.client.cookies.items()}
+        self.assertTrue(is_pinned(request))
+        self.assertEqual(replica_reads(lambda request: Product.objects.all().db)(request), 'default')
+
+        request.user = User.objects.create_user(username='other', password='s3cret-pass')
+        self.assertFalse(is_pinned(request))
+
+    def test_html_list_views_read_replica_for_safe_requests(self):
+        view = replica_reads(lambda request: Product.objects.all().db)
+        factory = RequestFactory()
+        get, post = factory.get('/products/'), factory.post('/products/')
+        get.user = post.user = self.user
+        self.assertEqual((view(get), view(post)), ('replica', 'default'))
+
+
+class ShardSettingsTests(InventoryTestCase):
+
+    @override_settings(INVENTORY_SHARDS=[])
+    def test_router_steps_aside_without_shards(self):
+        Business.objects.filter(pk=self.business.pk).update(shard='shard_1')
+        cache.clear()
+        with tenant(self.business.id) as shard, self.assertNumQueries(0):
+            self.assertEqual(shard, 'default')
+            self.assertEqual(Product.objects.all().db, 'default')
+            self.assertEqual(tenant_db(), 'default')
+
+    def test_shards_with_a_per_process_cache_are_flagged(self):
+        local = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with tempfile.TemporaryDirectory() as directory:
+            shared = {'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                                  'LOCATION': directory}}
+            for shards, caches_setting, issues in [
+                ([], local, []),
+                (['shard_1'], local, ['inventory.W001']),
+                (['shard_1'], shared, []),
+            ]:
+                with override_settings(INVENTORY_SHARDS=shards, CACHES=caches_setting):
+                    self.assertEqual([issue.id for issue in check_shared_cache(None)], issues)
+
+
+@skipUnless('shard_1' in settings.INVENTORY_SHARDS, "set INVENTORY_SHARDS=shard_1,shard_2 to test sharding")
+class ShardingTests(InventoryTestCase):
+    databases = {'default', *settings.INVENTORY_SHARDS}
+
+    def setUp(self):
+        super().setUp()
+        self.api = self.api_client()
+        self.base = f'/api/businesses/{self.business.id}'
+        self.api.post(f'{self.base}/transactions/', {'product': self.product.id, 'type': 'Out', 'quantity': 4})
+
+    def test_moved_business_is_served_from_its_shard(self):
+        before = [self.api.get(f'{self.base}{path}').json() for path in ('/products/', '/transactions/', '/summary/')]
+
+        call_command('move_business', self.business.id, 'shard_1', stdout=mock.Mock())
+        self.business.refresh_from_db()
+        self.assertEqual(self.business.shard, 'shard_1')
+        self.assertFalse(Product.objects.using('default').filter(business=self.business).exists())
+        self.assertEqual(StockTransaction.objects.using('shard_1').get().product_id, self.product.id)
+
+        after = [self.api.get(f'{self.base}{path}').json() for path in ('/products/', '/transactions/', '/summary/')]
+        self.assertEqual(after, before)
+
+        # New rows land on the shard, with ids from its own range.
+        response = self.api.post(f'{self.base}/products/', {
+            'name': 'Gadget', 'sku': 'G1', 'category': 'Tools', 'reorder_level': 1, 'unit': 'pcs',
+        })
+        self.assertGreater(response.data['id'], ID_RANGE)
+        self.api.post(f'{self.base}/transactions/', {'product': response.data['id'], 'type': 'In', 'quantity': 5})
+        self.assertEqual(StockTransaction.objects.using('shard_1').count(), 2)
+        self.assertEqual(self.api.get(f'{self.base}/summary/').data['total_units'], 11)
+
+        self.login()
+        page = self.client.get(reverse('product_list'))
+        self.assertEqual([p.name for p in page.context['products']], ['Widget', 'Gadget'])
+
+        call_command('move_business', self.business.id, 'default', stdout=mock.Mock())
+        self.assertEqual(Product.objects.using('default').filter(business=self.business).count(), 2)
+        self.assertFalse(Product.objects.using('shard_1').exists())
+        self.assertFalse(Business.objects.using('shard_1').exists())
+
+    def test_moving_back_to_a_lower_range_keeps_ids_unique(self):
+        annex = Business.objects.create(name='Annex', address='Side St', owner=self.user)
+        for business in (self.business, annex):
+            call_command('move_business', business.id, 'shard_1', stdout=mock.Mock())
+        with tenant(self.business.id):
+            gadget = save_product(Product(business=self.business, name='Gadget', sku='G1', unit='pcs'))
+            apply_stock_transaction(StockTransaction(product=gadget, type='In', quantity=5))
+            take_snapshots(self.business.id)
+        self.assertGreater(gadget.id, ID_RANGE)
+
+        call_command('move_business', self.business.id, 'default', stdout=mock.Mock())
+        gadget = Product.objects.using('default').get(sku='G1')
+        restock = StockTransaction.objects.using('default').get(product=gadget)
+        self.assertLess(gadget.id, ID_RANGE)
+        self.assertEqual(StockSnapshot.objects.using('default').get(product=gadget).last_transaction_id, restock.id)
+        with tenant(self.business.id):
+            self.assertEqual(stock_at(gadget, timezone.now())[0], 5)
+
+        # Each shard goes on allocating from its own range...
+        with tenant(self.business.id):
+            bolt = save_product(Product(business=self.business, name='Bolt', sku='B1', unit='pcs'))
+        with tenant(annex.id):
+            nut = save_product(Product(business=annex, name='Nut', sku='N1', unit='pcs'))
+        self.assertLess(bolt.id, ID_RANGE)
+        self.assertGreater(nut.id, ID_RANGE)
+
+        # ...so either business can move again.
+        call_command('move_business', annex.id, 'default', stdout=mock.Mock())
+        call_command('move_business', self.business.id, 'shard_1', stdout=mock.Mock())
+        self.assertLess(Product.objects.using('default').get(business=annex).id, ID_RANGE)
+        self.assertEqual(Product.objects.using('shard_1').filter(business=self.business).count(), 3)
+
+    def test_dashboard_without_a_selection_reads_the_shard(self):
+        call_command('move_business', self.business.id, 'shard_1', stdout=mock.Mock())
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['total_products'], 1)
+        self.assertEqual(len(response.context['recent_transactions']), 1)
+        self.assertFalse(BusinessSummary.objects.using('default').exists())
+
+    @override_settings(INVENTORY_SHARDS=['shard_1'], INVENTORY_SHARD_NEW_BUSINESSES=True)
+    def test_new_businesses_are_placed_on_shards(self):
+        business = Business.objects.create(name='Annex', address='Side St', owner=self.user)
+        self.assertEqual(business.shard, 'shard_1')
+        save_product(Product(business=business, name='Bolt', sku='B1', current_quantity=3, unit='pcs'))
+        self.assertEqual(Product.objects.using('shard_1').get().name, 'Bolt')
+
+        business.delete()
+        self.assertFalse(Product.objects.using('shard_1').exists())
+
+
+class WebhookReceiver(ThreadingHTTPServer):
+    """A local stand-in for a customer's webhook: records requests, failing the first ``failures``."""
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.received = []
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(handler):
+                body = handler.rfile.read(int(handler.headers['Content-Length']))
+                self.received.append((dict(handler.headers), json.loads(body), body))
+                status = 500 if self.failures else 204
+                self.failures = max(self.failures - 1, 0)
+                handler.send_response(status)
+                handler.send_header('Content-Length', '0')
+                handler.end_headers()
+
+            def log_message(handler, *args):
+                pass
+
+        super().__init__(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/hooks/stock'
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class OutboxTests(InventoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.receiver = WebhookReceiver()
+        self.addCleanup(self.receiver.stop)
+        WebhookEndpoint.objects.create(business=self.business, url=self.receiver.url, secret='shh')
+
+    def drain(self, **options):
+        call_command('drain_outbox', once=True, retries=0, databases=['default'], stdout=mock.Mock(), stderr=mock.Mock(), **options)
+
+    def test_events_are_written_with_the_transaction(self):
+        apply_stock_transaction(StockTransaction(product=self.product, type='Out', quantity=4))
+        with self.assertRaises(InsufficientStock):
+            apply_stock_transaction(StockTransaction(product=self.product, type='Out', quantity=99))
+
+        event = OutboxEvent.objects.get()
+        self.assertEqual((event.payload['type'], event.payload['quantity_after']), ('Out', 6))
+        self.assertEqual(self.receiver.received, [])
+
+    def test_an_endpoint_added_elsewhere_is_seen_within_seconds(self):
+        annex = Business.objects.create(name='Annex', address='Side St', owner=self.user)
+        bolt = save_product(Product(business=annex, name='Bolt', sku='B1', current_quantity=5, unit='pcs'))
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            apply_stock_transaction(StockTransaction(product=bolt, type='Out', quantity=1))
+        [timeout] = [call.args[2] for call in cache_set.call_args_list if call.args[0] == endpoint_key(annex.id)]
+        self.assertLessEqual(timeout, 5)
+
+        # Another worker adds the endpoint; its invalidation does not reach this cache...
+        WebhookEndpoint.objects.bulk_create([WebhookEndpoint(business=annex, url=self.receiver.url, secret='shh')])
+        apply_stock_transaction(StockTransaction(product=bolt, type='Out', quantity=1))
+        self.assertFalse(OutboxEvent.objects.filter(business=annex).exists())
+
+        # ...until the short-lived "no endpoint" entry expires, as clearing the cache simulates.
+        cache.clear()
+        apply_stock_transaction(StockTransaction(product=bolt, type='Out', quantity=1))
+        self.assertEqual(OutboxEvent.objects.get(business=annex).payload['quantity_after'], 2)
+
+    def test_events_are_coalesced_per_product_and_signed(self):
+        apply_stock_transactions_bulk(self.business, [
+            {'product': self.product.id, 'type': 'Out', 'quantity': 5},
+            {'product': self.product.id, 'type': 'Out', 'quantity': 3},
+            {'product': self.product.id, 'type': 'In', 'quantity': 1},
+        ])
+        self.drain()
+
+        [(headers, body, raw)] = self.receiver.received
+        expected = 'sha256=' + hmac.new(b'shh', raw, hashlib.sha256).hexdigest()
+        self.assertEqual(headers['X-Inventory-Signature'], expected)
+        [entry] = body['products']
+        self.assertEqual((entry['units_in'], entry['units_out'], entry['transactions']), (1, 8, 3))
+        self.assertEqual((entry['quantity'], entry['event']), (3, 'stock.low'))
+        self.assertFalse(OutboxEvent.objects.filter(delivered_at__isnull=True).exists())
+
+    def test_drain_uses_the_current_endpoint(self):
+        apply_stock_transaction(StockTransaction(product=self.product, type='In', quantity=2))
+        # Rotated by another process while this one still has the old endpoint cached.
+        rotated = WebhookReceiver()
+        self.addCleanup(rotated.stop)
+        WebhookEndpoint.objects.filter(business=self.business).update(url=rotated.url, secret='new')
+        self.drain()
+
+        self.assertEqual(self.receiver.received, [])
+        [(headers, _, raw)] = rotated.received
+        self.assertEqual(headers['X-Inventory-Signature'], 'sha256=' + hmac.new(b'new', raw, hashlib.sha256).hexdigest())
+
+    def test_failed_delivery_backs_off_and_retries(self):
+        self.receiver.failures = 1
+        apply_stock_transaction(StockTransaction(product=self.product, type='In', quantity=2))
+        self.drain()
+
+        event = OutboxEvent.objects.get()
+        self.assertEqual((event.attempts, event.delivered_at), (1, None))
+        self.assertIn('HTTP 500', event.last_error)
+        self.assertGreater(event.next_attempt_at, timezone.now())
+
+        self.drain()  # not due yet
+        self.assertEqual(len(self.receiver.received), 1)
+        OutboxEvent.objects.update(next_attempt_at=timezone.now())
+        self.drain()
+        self.assertEqual(len(self.receiver.received), 2)
+        # Retries of the same events carry the same delivery id.
+        self.assertEqual(len({headers['X-Inventory-Delivery'] for headers, _, _ in self.receiver.received}), 1)
+        self.assertIsNotNone(OutboxEvent.objects.get().delivered_at)
+
+    def test_no_events_without_an_endpoint(self):
+        WebhookEndpoint.objects.all().delete()
+        apply_stock_transaction(StockTransaction(product=self.product, type='In', quantity=2))
+        self.assertFalse(OutboxEvent.objects.exists())
+
+
+class CachedAuthenticationTests(InventoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.annex = Business.objects.create(name='Annex', address='Side St', owner=self.user)
+        response = self.client.post('/api/auth/token/', {'username': 'owner', 'password': 's3cret-pass'})
+        self.access = response.json()['access']
+        self.api = APIClient(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+        self.url = f'/api/businesses/{self.business.id}/products/'
+
+    def test_token_carries_owned_businesses(self):
+        self.assertEqual(AccessToken(self.access)['businesses'], [self.business.id, self.annex.id])
+
+    def test_user_and_claimed_business_skip_the_database(self):
+        self.assertEqual(self.api.get(self.url).status_code, 200)
+        cache.delete(f'inventory:owned-businesses:{self.user.id}')
+        # Only the page itself: no user row and no owned-business list.
+        with self.assertNumQueries(1):
+            response = self.api.get(self.url, {'page_size': 5})
+        self.assertEqual(response.status_code, 200)
+
+    def test_deactivation_and_password_change_evict_the_user(self):
+        self.assertEqual(self.api.get(self.url).status_code, 200)
+        self.assertIsNotNone(auth_users.get(str(self.user.id)))
+
+        self.user.set_password('n3w-secret-pass')
+        self.user.save()
+        self.assertIsNone(auth_users.get(str(self.user.id)))
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.api.get(self.url).status_code, 401)
+
+    def test_stale_claims_are_checked_against_the_owner(self):
+        stranger = User.objects.create_user(username='stranger', password='x-pass-123')
+        self.annex.owner = stranger
+        self.annex.save()
+        self.assertEqual(self.api.get(f'/api/businesses/{self.annex.id}/products/').status_code, 404)
+
+        # Businesses created after the token was issued are still found.
+        later = Business.objects.create(name='Depot', address='Dock Rd', owner=self.user)
+        self.assertEqual(self.api.get(f'/api/businesses/{later.id}/products/').status_code, 200)
+
+
+class SessionTests(InventoryTestCase):
+
+    def session_queries(self, url):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        return response, [query['sql'] for query in captured if 'django_session' in query['sql']]
+
+    def test_cached_db_pages_skip_the_session_table(self):
+        self.login()
+        self.client.get(reverse('dashboard'))
+        response, queries = self.session_queries(reverse('product_list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(queries, [])
+
+    def test_switching_to_the_current_business_does_not_save(self):
+        annex = Business.objects.create(name='Annex', address='Side St', owner=self.user)
+        self.login()
+        _, queries = self.session_queries(reverse('business-switch', args=[self.business.id]))
+        self.assertEqual(queries, [])
+        _, queries = self.session_queries(reverse('business-switch', args=[annex.id]))
+        self.assertTrue(queries)
+        self.assertEqual(self.client.session['current_business_id'], annex.id)
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies')
+    def test_signed_cookie_sessions_carry_the_business(self):
+        self.login()
+        response, queries = self.session_queries(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['current_business'], self.business)
+        self.assertEqual(queries, [])
+
+    def test_cleanup_deletes_only_expired_sessions(self):
+        now = timezone.now()
+        Session.objects.bulk_create(
+            [Session(session_key=f'old{n:029d}', session_data='', expire_date=now - timedelta(days=1)) for n in range(5)]
+            + [Session(session_key='live' + '0' * 28, session_data='', expire_date=now + timedelta(days=1))]
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(CACHES={**settings.CACHES, 'sessions': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory,
+            }}):
+                caches['sessions'].set('expired', 1, timeout=-1)
+                caches['sessions'].set('live', 1)
+                call_command('cleanup_sessions', batch_size=2, stdout=StringIO())
+                self.assertEqual(len(list(Path(directory).iterdir())), 1)
+        self.assertEqual(list(Session.objects.values_list('session_key', flat=True)), ['live' + '0' * 28])
+
+
+class FragmentCacheTests(InventoryTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.annex = Business.objects.create(name='Annex', address='Side St', owner=self.user)
+        save_product(Product(business=self.annex, name='Bolt', sku='B1', current_quantity=1, reorder_level=2, unit='pcs'))
+        apply_stock_transaction(StockTransaction(product=self.product, type='Out', quantity=8))
+
+    def fragments(self):
+        return {name: (row['hits'], row['misses']) for name, row in fragment_stats()['fragments'].items()}
+
+    def test_repeat_views_are_served_from_cache(self):
+        self.login()
+        first = self.client.get(reverse('dashboard'))
+        with CaptureQueriesContext(connection) as repeat:
+            second = self.client.get(reverse('dashboard'))
+
+        self.assertEqual(second.content, first.content)
+        self.assertContains(second, 'Widget')
+        self.assertEqual(self.fragments(), {'low-stock': (1, 1), 'recent-transactions': (1, 1)})
+        # The low-stock query does not run on a hit; the ledger query only for the count.
+        self.assertFalse([query for query in repeat if 'reorder_shortfall" >= ' in query['sql']])
+        self.assertEqual(len([query for query in repeat if 'inventory_stocktransaction' in query['sql']]), 1)
+
+        self.client.get(reverse('product_list'))
+        with CaptureQueriesContext(connection) as repeat:
+            self.client.get(reverse('product_list'))
+        self.assertFalse([query for query in repeat if 'FROM "inventory_product"' in query['sql']])
+        self.client.get(reverse('product_list'), {'search_query': 'widget'})
+        self.assertEqual(self.fragments()['product-table'], (1, 2))
+
+    def test_writes_invalidate_only_their_business(self):
+        for business in (self.business, self.annex):
+            self.login(business)
+            self.client.get(reverse('product_list'))
+
+        apply_stock_transaction(StockTransaction(product=self.product, type='In', quantity=4))
+
+        self.login(self.business)
+        self.assertContains(self.client.get(reverse('product_list')), '<strong>6</strong>')
+        self.login(self.annex)
+        self.client.get(reverse('product_list'))
+        self.assertEqual(self.fragments()['product-table'], (1, 3))
+
+        self.login(self.business)
+        save_product(Product(business=self.business, name='Gadget', sku='G1', current_quantity=0, unit='pcs'))
+        self.assertContains(self.client.get(reverse('dashboard')), 'Gadget')
+
+    def test_stats_are_staff_only(self):
+        self.login()
+        self.client.get(reverse('dashboard'))
+        url = reverse('fragment-cache-stats')
+        self.assertEqual(self.api_client().get(url).status_code, 403)
+
+        self.user.is_staff = True
+        self.user.save()
+        data = self.api_client().get(url).data
+        self.assertEqual((data['hits'], data['misses']), (0, 2))
+        self.assertEqual(data['fragments']['low-stock'], {'hits': 0, 'misses': 1, 'hit_rate': 0.0})
+
+
+class ReplicaSyncTests(TransactionTestCase):
+    # Committed data: SQLite cannot back up a database inside an open transaction.
+
+    def test_sync_replica_copies_the_primary(self):
+        user = User.objects.create_user(username='owner', password='s3cret-pass')
+        business = Business.objects.create(name='Shop', address='Main St', owner=user)
+        save_product(Product(business=business, name='Widget', sku='W1', current_quantity=10, unit='pcs'))
+
+        with tempfile.TemporaryDirectory() as directory:
+            target = Path(directory) / 'replica.sqlite3'
+            call_command('sync_replica', target=str(target), stdout=mock.Mock())
+            copy = sqlite3.connect(target)
+            try:
+                rows = copy.execute('SELECT name, current_quantity FROM inventory_product').fetchall()
+            finally:
+                copy.close()
+        self.assertEqual(rows, [('Widget', 10)])
+
+
+class QueryBudgetTests(InventoryTestCase):
+    """
+    Every named route declares a query budget and must stay within it on
+    a seeded business, so per-row (N+1) queries fail here first.
+    """
+
+    # URL name: (method, URL kwargs as attribute names on the test, budget)
+    BUDGETS = {
+        'dashboard': ('get', {}, 6),
+        'signup': ('get', {}, 2),
+        'login': ('get', {}, 2),
+        'logout': ('get', {}, 4),
+        'business_list': ('get', {}, 3),
+        'business-switch': ('get', {'business_id': 'business'}, 6),
+        'business_create': ('get', {}, 2),
+        'product_list': ('get', {}, 5),
+        'product_add': ('get', {}, 3),
+        'product_update': ('get', {'product_id': 'product'}, 4),
+        'product_delete': ('get', {'product_id': 'product'}, 4),
+        'transaction_add': ('get', {}, 5),
+        'transaction_list': ('get', {}, 4),
+        'api-register': ('options', {}, 0),
+        'token-obtain-pair': ('options', {}, 0),
+        'token-refresh': ('options', {}, 0),
+        'api-root': ('get', {}, 0),
+        'business-list': ('get', {}, 2),
+        'business-detail': ('get', {'pk': 'business'}, 2),
+        'business-products-list': ('get', {'business_id': 'business'}, 3),
+        'business-products-search': ('get', {'business_id': 'business'}, 1),
+        'business-products-detail': ('get', {'business_id': 'business', 'pk': 'product'}, 3),
+        'business-products-stock-at': ('get', {'business_id': 'business', 'pk': 'product'}, 5),
+        'business-stock-at': ('get', {'business_id': 'business'}, 5),
+        'business-movements': ('get', {'business_id': 'business'}, 2),
+        'business-reorder-forecast': ('get', {'business_id': 'business'}, 4),
+        'business-summary': ('get', {'business_id': 'business'}, 4),
+        'async-business-products-list': ('get', {'business_id': 'business'}, 4),
+        'async-business-products-detail': ('get', {'business_id': 'business', 'pk': 'product'}, 4),
+        'async-business-transactions-list': ('get', {'business_id': 'business'}, 4),
+        'async-business-summary': ('get', {'business_id': 'business'}, 5),
+        'business-categories': ('get', {'business_id': 'business'}, 3),
+        'business-low-stock': ('get', {'business_id': 'business'}, 2),
+        'business-transactions-list': ('get', {'business_id': 'business'}, 3),
+        'business-transactions-bulk': ('options', {'business_id': 'business'}, 1),
+        'business-transactions-detail': ('get', {'business_id': 'business', 'pk': 'transaction'}, 3),
+        'business-export': ('get', {'business_id': 'business'}, 2),
+        'fragment-cache-stats': ('get', {}, 0),
+    }
+
+    def setUp(self):
+        super().setUp()
+        for n in range(6):
+            product = save_product(Product(business=self.business, name=f'Part {n}', sku=f'P{n}',
+                                           category=f'Cat{n % 2}', reorder_level=5, unit='pcs'))
+            for _ in range(2):
+                apply_stock_transaction(StockTransaction(product=product, type='In', quantity=n))
+        self.transaction = StockTransaction.objects.first()
+
+    def routes(self):
+        from . import urls, api_urls
+        patterns = urls.urlpatterns + api_urls.urlpatterns + api_urls.router.urls
+        return {pattern.name for pattern in patterns if getattr(pattern, 'name', None)}
+
+    def test_every_route_declares_a_budget(self):
+        self.assertEqual(self.routes() - set(self.BUDGETS), set())
+
+    def test_routes_stay_within_budget(self):
+        api = self.api_client()
+        for name, (method, kwargs, budget) in self.BUDGETS.items():
+            kwargs = {key: getattr(self, attr).pk for key, attr in kwargs.items()}
+            if name == 'business-export':
+                kwargs.update(dataset='transactions', export_format='csv')
+            url = reverse(name, kwargs=kwargs)
+            client = api if url.startswith('/api/') else self.client
+            self.login()
+            cache.clear()
+
+            # Async views authenticate the token themselves, including the user lookup.
+            headers = {'HTTP_AUTHORIZATION': bearer(self.user)} if name.startswith('async-') else {}
+
+            with self.subTest(route=name), query_budget(budget):
+                response = getattr(client, method)(url, {'ts': '2030-01-01'} if 'stock-at' in name else {}, **headers)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                self.assertLess(response.status_code, 500)
@@ -2,10 +2,17 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login,logout,authenticate
 from django.contrib import messages 
 from .forms import SignUpForm, BusinessForm, ProductForm, StockTransactionForm
-from django.http import HttpResponse
+from django.http import Http404
 from django.contrib.auth.decorators import login_required
-from .models import Business, Product, StockTransaction
-from django.db.models import Q, F
+from .models import Product, StockTransaction
+from .services import apply_stock_transaction, InsufficientStock, save_product, delete_product
+from .summary import get_summary
+from .search import filter_products
+from .facets import get_facets
+from .tenancy import owned_business, owned_businesses, get_current_business, select_business
+from .pagination import lazy_keyset, paginate_keyset, page_links
+from .routing import replica_reads
+from django.utils.functional import SimpleLazyObject
 
 # Create your views here.
 
@@ -57,8 +64,11 @@ def logout_view(request):
 
 @login_required
 def business_list_view(request):
-    businesses = Business.objects.filter(owner=request.user)
-    return render(request, 'inventory/business_list.html',{'businesses':businesses})
+    businesses = list(owned_businesses(request.user).values())
+    return render(request, 'inventory/business_list.html',{
+        'businesses': businesses,
+        'current_business': get_current_business(request),
+    })
 
 @login_required
 def business_create_view(request):
@@ -69,7 +79,7 @@ def business_create_view(request):
             business = form.save(commit=False)
             business.owner = request.user
             business.save()
-            request.session['current_business_id'] = business.id
+            select_business(request, business)
             messages.success(request, f'Business "{business.name}" created!')
             return redirect('dashboard')
             
@@ -81,56 +91,45 @@ def business_create_view(request):
     })
 @login_required
 def business_switch_view(request, business_id):
-    business = get_object_or_404(Business, id=business_id, owner=request.user)
-    request.session['current_business_id'] = business.id
+    business = owned_business(request.user, business_id)
+    if business is None:
+        raise Http404("No Business matches the given query.")
+    select_business(request, business)
     messages.success(request, f'Switched to business: {business.name}')
     return redirect('dashboard')
 
 @login_required
 def dashboard_view(request):
 
-    business_id = request.session.get("current_business_id")
+    current_business = get_current_business(request)
 
-    if not business_id:
-        businesses = Business.objects.filter(owner=request.user)
-        if businesses.exists():
-            request.session["current_business_id"] = businesses.first().id
-            business_id = businesses.first().id
-        else:
+    if current_business is None:
+        businesses = owned_businesses(request.user)
+        if not businesses:
             return redirect('business_create')
-    
-    try:
-        current_business = Business.objects.get(
-            id=business_id,
-            owner=request.user
-        )
-    except Business.DoesNotExist:
-        del request.session['current_business_id']
-        return redirect('dashboard')
+        current_business = next(iter(businesses.values()))
+        select_business(request, current_business)
     
     products = Product.objects.filter(business=current_business)
 
     low_stock_products = products.filter(
-        current_quantity__lte = F('reorder_level')
-    ) 
+        reorder_shortfall__gte = 0
+    ).order_by('-reorder_shortfall', '-id')[:5]
 
     recent_transactions = StockTransaction.objects.filter(
-        product__business = current_business
+        business = current_business
     ).select_related('product').order_by('-created_at')[:10]
 
-    total_products = products.count()
-    low_stock_count = low_stock_products.count()
-    total_stock_value = 0
-    for each in products:
-        total_stock_value += each.current_quantity
+    summary = get_summary(current_business)
 
     context = {
 
         'current_business': current_business,
         'low_stock_products': low_stock_products,
-        'total_products': total_products, 
-        'low_stock_count': low_stock_count,
-        'total_stock_value': total_stock_value,
+        'total_products': summary.total_products, 
+        'low_stock_count': summary.low_stock_count,
+        'out_of_stock_count': summary.out_of_stock_count,
+        'total_stock_value': summary.total_units,
         'recent_transactions': recent_transactions, 
     }
 
@@ -138,37 +137,38 @@ def dashboard_view(request):
 
 
 @login_required
-
+@replica_reads
 def product_list_view(request):
-    business_id = request.session.get('current_business_id')
+    current_business = get_current_business(request)
 
-    if not business_id:
+    if current_business is None:
         messages.warning(request, "Please select or create a business first.")
         return redirect('dashboard')
 
-    current_business = get_object_or_404(Business,id=business_id,owner=request.user)
-
     products = Product.objects.filter(business=current_business)
 
     search_query = request.GET.get('search_query','')
     category_query = request.GET.get('category_query','')
 
     if search_query:
-        products = products.filter(
-            Q(name__icontains=search_query) |
-            Q(sku__icontains=search_query) |
-            Q(supplier_name__icontains=search_query)
-        )
+        products = filter_products(products, search_query)
 
     if category_query: 
         products = products.filter(
             category=category_query
         )
 
-    categories = Product.objects.values_list('category',flat=True).distinct()
+    try:
+        # Unevaluated until the product table fragment misses the cache.
+        page = lazy_keyset(products, ('id',), request.GET.get('cursor'))
+    except ValueError:
+        return redirect('product_list')
+
+    categories = get_facets(current_business.id)
     context = {
         'current_business': current_business,
-        'products':products,
+        'products': page,
+        'links': SimpleLazyObject(lambda: page_links(request, page)),
         'search': search_query,
         'categories': categories,
         'category_query': category_query
@@ -179,11 +179,10 @@ def product_list_view(request):
 @login_required
 def product_create_view(request):
 
-    business_id = request.session.get("current_business_id")
-    if not business_id:
+    current_business = get_current_business(request)
+    if current_business is None:
         messages.warning(request, "Please select or create a business first.")
         return redirect('dashboard')
-    current_business = get_object_or_404(Business,id=business_id,owner=request.user)
 
     if request.method == "POST":
 
@@ -191,7 +190,7 @@ def product_create_view(request):
         if form.is_valid():
             product = form.save(commit=False)
             product.business = current_business
-            product.save()
+            save_product(product)
             messages.success(request, f'{product.name} added successfully!')
             return redirect('product_list')
     else:
@@ -207,20 +206,18 @@ def product_create_view(request):
 
 @login_required
 def product_update_view(request,product_id):
-    business_id = request.session.get("current_business_id")
+    current_business = get_current_business(request)
 
-    if not business_id:
+    if current_business is None:
         messages.error(request,"Please select a business first")
         return redirect('dashboard')
-    
-    current_business = get_object_or_404(Business,id=business_id,owner=request.user)
 
-    product = Product.objects.get(id=product_id,business=current_business)
+    product = get_object_or_404(Product, id=product_id, business=current_business)
 
     if request.method == "POST":
         form = ProductForm(request.POST, instance=product)
         if form.is_valid():
-            product = form.save()
+            product = save_product(form.save(commit=False))
             messages.success(request, f'{product.name} successfully updated!')
             return redirect('dashboard')
     else:
@@ -230,7 +227,7 @@ def product_update_view(request,product_id):
         'action': 'Update',
         'product': product,
         'current_business': current_business,
-        'business_id': business_id,
+        'business_id': current_business.id,
         'form': form
     }
 
@@ -239,18 +236,16 @@ def product_update_view(request,product_id):
 @login_required
 def product_delete_view(request, product_id):
 
-    business_id = request.session.get("current_business_id")
+    current_business = get_current_business(request)
 
-    if not business_id:
+    if current_business is None:
         messages.warning(request,"Please create or select a business first")
         return redirect('dashboard')
-    
-    current_business = get_object_or_404(Business,id=business_id,owner=request.user)
 
     product = get_object_or_404(Product, id=product_id, business=current_business)
 
     if request.method == "POST":
-        product.delete()
+        delete_product(product)
         messages.success(request, "Product deleted successfully!")
         return redirect('product_list')
     
@@ -267,13 +262,11 @@ def product_delete_view(request, product_id):
 @login_required
 def stock_transaction_create_view(request):
 
-    business_id = request.session.get("current_business_id")
+    current_business = get_current_business(request)
 
-    if not business_id:
+    if current_business is None:
         messages.error(request, "Please select or create a business first!")
         return redirect('dashboard')
-    
-    current_business = get_object_or_404(Business, id=business_id, owner=request.user)
 
     if request.method == "POST":
 
@@ -282,37 +275,21 @@ def stock_transaction_create_view(request):
         if form.is_valid():
 
             transaction = form.save(commit=False)
-            product = transaction.product
-            quantity = transaction.quantity
-            transaction_type = transaction.type
-
-            if transaction_type == "In":
 
-                product.current_quantity += quantity
-                product.save()
-                transaction.save()
-                all_transactions = StockTransaction.objects.filter(product__business=current_business).order_by('-created_at')[:5]
+            try:
+                apply_stock_transaction(transaction)
                 return redirect('transaction_add')
-
-            elif transaction_type == "Out":
-
-                if product.current_quantity >= quantity:
-
-                    product.current_quantity -= quantity
-                    product.save()
-                    transaction.save()
-                    all_transactions = StockTransaction.objects.filter(product__business=current_business).order_by('-created_at')[:5]
-                    return redirect('transaction_add')
-                    
-                else:
-                    messages.error(request, f'current product quantity is {product.current_quantity}')
+            except InsufficientStock as error:
+                messages.error(request, f'current product quantity is {error.available}')
 
 
 
             # return HttpResponse(f'{transaction_type}')
 
     form = StockTransactionForm(business=current_business)
-    all_transactions = StockTransaction.objects.filter(product__business=current_business).order_by('-created_at')[:5]
+    all_transactions = StockTransaction.objects.filter(
+        business=current_business
+    ).select_related('product').order_by('-created_at')[:5]
 
     context = {
         'form': form, 
@@ -322,19 +299,20 @@ def stock_transaction_create_view(request):
     return render(request, 'inventory/transaction_add.html', context)
 
 @login_required
+@replica_reads
 def stock_transaction_list(request):
-    business_id = request.session.get("current_business_id")
+    current_business = get_current_business(request)
 
-    if not business_id:
+    if current_business is None:
         messages.error(request, "Please create or select a business!")
         return redirect('dashboard')
 
-    current_business = get_object_or_404(Business,id=business_id,owner=request.user)
-
     search_query = request.GET.get('search','')
     type_query = request.GET.get('type','')
 
-    transactions = StockTransaction.objects.filter(product__business=current_business).order_by('-created_at')
+    transactions = StockTransaction.objects.filter(
+        business=current_business
+    ).select_related('product').order_by('-created_at')
 
     if search_query:
         transactions = transactions.filter(product__name__icontains=search_query)
@@ -342,8 +320,14 @@ def stock_transaction_list(request):
     if type_query:
         transactions = transactions.filter(type=type_query)
 
+    try:
+        page = paginate_keyset(transactions, ('-created_at', '-id'), request.GET.get('cursor'))
+    except ValueError:
+        return redirect('transaction_list')
+
     return render(request, 'inventory/transaction_list.html', {
-        'transactions': transactions,
+        'transactions': page.object_list,
+        **page_links(request, page),
         'search': search_query,
         'type': type_query,
     })
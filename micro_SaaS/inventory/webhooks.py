@@ -0,0 +1,107 @@
+"""
+Webhook delivery over pooled keep-alive connections.
+
+ConnectionPool keeps idle HTTP/1.1 connections per origin, so a worker
+posting many batches to the same receiver pays for TCP (and TLS) setup
+once. deliver() signs the body, retries connection errors and retryable
+statuses with exponential backoff, and reports the final outcome instead
+of raising.
+"""
+import hashlib
+import hmac
+import http.client
+import queue
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+RETRYABLE_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class ConnectionPool:
+    """Idle keep-alive connections per (scheme, host, port), shared by threads."""
+
+    def __init__(self, size=8, timeout=5.0):
+        self.size = size
+        self.timeout = timeout
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def _queue(self, origin):
+        with self._lock:
+            return self._idle.setdefault(origin, queue.LifoQueue(self.size))
+
+    def _connect(self, scheme, host, port):
+        connection_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        return connection_class(host, port, timeout=self.timeout)
+
+    def post(self, url, body, headers):
+        """POST ``body`` to ``url``; returns ``(status, response body)``."""
+        parts = urlsplit(url)
+        origin = (parts.scheme, parts.hostname, parts.port)
+        idle = self._queue(origin)
+        try:
+            connection = idle.get_nowait()
+        except queue.Empty:
+            connection = self._connect(*origin)
+
+        path = parts.path or '/'
+        if parts.query:
+            path += f'?{parts.query}'
+        try:
+            connection.request('POST', path, body=body, headers=headers)
+            response = connection.getresponse()
+            content = response.read()
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            raise
+
+        if response.will_close:
+            connection.close()
+        else:
+            try:
+                idle.put_nowait(connection)
+            except queue.Full:
+                connection.close()
+        return response.status, content
+
+    def close(self):
+        with self._lock:
+            queues, self._idle = list(self._idle.values()), {}
+        for idle in queues:
+            while not idle.empty():
+                idle.get_nowait().close()
+
+
+def sign(secret, body):
+    return 'sha256=' + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+def deliver(pool, url, secret, body, delivery_id, retries=3, backoff=0.25, sleep=time.sleep):
+    """
+    POST a signed JSON ``body``; connection errors and retryable statuses
+    are retried ``retries`` times, waiting ``backoff`` seconds, doubling.
+    Returns ``None`` on a 2xx, else a description of the last failure.
+    """
+    headers = {
+        'Content-Type': 'application/json',
+        'X-Inventory-Delivery': delivery_id,
+        'X-Inventory-Signature': sign(secret, body),
+    }
+    error = None
+    for attempt in range(retries + 1):
+        if attempt:
+            sleep(backoff * 2 ** (attempt - 1))
+        try:
+            status, content = pool.post(url, body, headers)
+        except (OSError, http.client.HTTPException) as exc:
+            # A reused connection may have been closed by the receiver while idle.
+            error = f'{type(exc).__name__}: {exc}'
+            continue
+        if 200 <= status < 300:
+            return None
+        error = f'HTTP {status}: {content[:200].decode(errors="replace")}'
+        if status not in RETRYABLE_STATUSES:
+            break
+    return error
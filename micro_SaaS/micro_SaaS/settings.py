@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -44,10 +45,14 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'inventory.sharding.TenantContextMiddleware',
+    'inventory.querybudget.QueryInstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'inventory.routing.ReplicaPinMiddleware',
+    'inventory.tenancy.CurrentBusinessMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -82,6 +87,36 @@ DATABASES = {
     }
 }
 
+# Optional read replica (inventory.routing): a copy of db.sqlite3 kept
+# current by `manage.py sync_replica`. Set INVENTORY_REPLICA_DB to its path.
+INVENTORY_REPLICA_PATH = os.environ.get('INVENTORY_REPLICA_DB')
+if INVENTORY_REPLICA_PATH:
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{INVENTORY_REPLICA_PATH}?mode=ro',
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Optional tenant shards (inventory.sharding): set INVENTORY_SHARDS to their
+# aliases, comma-separated (e.g. "shard_1,shard_2"). Each is a SQLite file
+# beside db.sqlite3 holding the products, ledger and derived tables of the
+# businesses placed on it; `migrate --database <alias>` each one. Never
+# reorder: a shard's position fixes its primary key range.
+INVENTORY_SHARDS = [alias.strip() for alias in os.environ.get('INVENTORY_SHARDS', '').split(',') if alias.strip()]
+for alias in INVENTORY_SHARDS:
+    DATABASES[alias] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'{alias}.sqlite3',
+    }
+# Spread new businesses over the shards by id; otherwise they start on default
+# until `manage.py move_business` moves them.
+INVENTORY_SHARD_NEW_BUSINESSES = False
+
+DATABASE_ROUTERS = ['inventory.sharding.ShardRouter', 'inventory.routing.ReplicaRouter']
+INVENTORY_READ_REPLICA = 'replica' if 'replica' in DATABASES else None
+# How long a user who just wrote reads from the primary; keep it above the sync interval.
+INVENTORY_REPLICA_PIN_SECONDS = 30
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -124,14 +159,99 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Sessions (inventory.sessions). The HTML app keeps only the login and the
+# selected business there. INVENTORY_SESSION_BACKEND picks the store:
+#   cached_db       database rows read through the 'sessions' cache (default)
+#   signed_cookies  the session in a signed cookie; no server-side state
+#   cache           the 'sessions' cache only
+#   db              database rows only (Django's default)
+# The 'sessions' cache is per process unless INVENTORY_SESSION_CACHE_DIR
+# names a directory for a file cache; with several worker processes, set it
+# (or use signed_cookies) so a logout or business switch is seen by all.
+INVENTORY_SESSION_BACKEND = os.environ.get('INVENTORY_SESSION_BACKEND', 'cached_db')
+SESSION_ENGINE = {
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'db': 'django.contrib.sessions.backends.db',
+}[INVENTORY_SESSION_BACKEND]
+SESSION_CACHE_ALIAS = 'sessions'
+INVENTORY_SESSION_CACHE_DIR = os.environ.get('INVENTORY_SESSION_CACHE_DIR')
+
+# The 'default' cache holds each business's shard, the owned businesses per
+# user and the data versions. It is per process unless INVENTORY_CACHE_DIR
+# names a directory for a file cache shared by every worker; with shards
+# configured, set it, or other workers keep reading a moved business from
+# its old shard (see inventory.sharding).
+INVENTORY_CACHE_DIR = os.environ.get('INVENTORY_CACHE_DIR')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sessions',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    # Rendered HTML fragments (inventory.fragments), kept apart so they do
+    # not evict the small entries in 'default'.
+    'fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fragments',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+if INVENTORY_CACHE_DIR:
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': INVENTORY_CACHE_DIR,
+    }
+if INVENTORY_SESSION_CACHE_DIR:
+    CACHES['sessions'] = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': INVENTORY_SESSION_CACHE_DIR,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+
+# How long a cached fragment may go unread before it expires. Writes do
+# not wait for this: they move the business to a new version and key.
+INVENTORY_FRAGMENT_CACHE_TIMEOUT = 600
+
 LOGIN_URL = 'login'
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'login'
 
+# Seconds a process may serve a business version (ETags, response and
+# fragment cache keys) after another process's write. The writing process
+# sees its own writes at once; with a cache shared by every process this
+# can be raised.
+INVENTORY_VERSION_CACHE_TIMEOUT = 5
+
+# Per-request query count/time headers and N+1 warnings (inventory.querybudget).
+# Set INVENTORY_QUERY_LOG_LEVEL=DEBUG to also log every request's totals.
+INVENTORY_QUERY_INSTRUMENTATION = DEBUG
+INVENTORY_QUERY_LOG_LEVEL = os.environ.get('INVENTORY_QUERY_LOG_LEVEL', 'WARNING')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'inventory.queries': {
+            'handlers': ['console'],
+            'level': INVENTORY_QUERY_LOG_LEVEL,
+            'propagate': False,
+        },
+    },
+}
+
 # Django REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'inventory.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -145,4 +265,11 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
     'ROTATE_REFRESH_TOKENS': True,
+    # Adds the owned business ids claim; see inventory.authentication.
+    'TOKEN_OBTAIN_SERIALIZER': 'inventory.authentication.TokenObtainPairSerializer',
 }
+
+# In-process cache of token-authenticated users: how many, and for how
+# long another process's deactivation or password change can go unseen.
+INVENTORY_AUTH_CACHE_SIZE = 10000
+INVENTORY_AUTH_CACHE_TTL = 60